@@ -0,0 +1,91 @@
+'''Throughput of ProofSession.branch: a branch at a random line k of a long proof, with
+and without one new line, against adding the lines before k again to a new session and
+against checking the text of the lines before k. Usage: python benchmarks/branching.py'''
+import random
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+from nadia.nadia_pt_fo import ParserNadia, warm_up
+from nadia.nadia_pt_session import ProofSession
+
+SIZES = (20, 80, 320, 1280)
+BRANCHES = 2000
+# Replaying a prefix is slow, so fewer lines are sampled
+REPLAYS = 20
+
+def long_proof(blocks):
+    # Alternates a box with a hypothesis and a box with a variable. Returns the text and the
+    # steps ('line', number, formula, rule, references), ('box', number, variable,
+    # hypothesis) and ('close',) of the proof.
+    lines = ['1. A&B pre', '2. Ax (P(x)->Q(x)) pre']
+    steps = [('line', 1, 'A&B', 'pre', ()), ('line', 2, 'Ax (P(x)->Q(x))', 'pre', ())]
+    n = 3
+    for k in range(blocks):
+        if k % 2 == 0:
+            lines += ['{}. {{ C{} hip'.format(n, k), '{}. A &e 1'.format(n + 1), '{}. C{}&A &i {},{}'.format(n + 2, k, n, n + 1), '}',
+                      '{}. C{}->C{}&A ->i {}-{}'.format(n + 3, k, k, n, n + 2)]
+            steps += [('box', n, None, 'C{}'.format(k)), ('line', n + 1, 'A', '&e', (1,)),
+                      ('line', n + 2, 'C{}&A'.format(k), '&i', (n, n + 1)), ('close',),
+                      ('line', n + 3, 'C{}->C{}&A'.format(k, k), '->i', (n, n + 2))]
+            n += 4
+        else:
+            lines += ['{}. {{ a'.format(n), '{}. P(a)->Q(a) Ae 2'.format(n + 1), '}',
+                      '{}. Ax (P(x)->Q(x)) Ai {}-{}'.format(n + 2, n, n + 1)]
+            steps += [('box', n, 'a', None), ('line', n + 1, 'P(a)->Q(a)', 'Ae', (2,)), ('close',),
+                      ('line', n + 2, 'Ax (P(x)->Q(x))', 'Ai', (n, n + 1))]
+            n += 3
+    return '\n'.join(lines), steps
+
+def replay(steps):
+    session = ProofSession()
+    for step in steps:
+        if step[0] == 'box':
+            session.open_box(step[2], step[3])
+        elif step[0] == 'close':
+            session.close_box()
+        else:
+            session.add_line(*step[2:])
+    return session
+
+def timed(function, arguments):
+    start = time.perf_counter()
+    for argument in arguments:
+        function(argument)
+    return (time.perf_counter() - start) / len(arguments)
+
+def main():
+    warm_up()
+    rnd = random.Random(1)
+    print('lines  branch(us)  branch+line(us)  replay prefix(ms)  check prefix text(ms)  memory/branch(KB)')
+    for blocks in SIZES:
+        text, steps = long_proof(blocks)
+        session = replay(steps)
+        lines = session.next_line - 1
+        ks = [rnd.randint(2, lines) for i in range(BRANCHES)]
+        # Position of each line in the steps and in the text
+        positions = {}
+        for i, step in enumerate(steps):
+            if step[0] != 'close':
+                positions[step[1]] = i
+        text_lines = text.split('\n')
+        text_positions = {int(line.split('.')[0]): i for i, line in enumerate(text_lines) if line[0].isdigit()}
+        branch = timed(session.branch, ks)
+        branch_line = timed(lambda k: session.branch(k).add_line('A', '&e', (1,)), ks)
+        replayed = timed(lambda k: replay(steps[:positions[k]]).add_line('A', '&e', (1,)), ks[:REPLAYS])
+        checked = timed(lambda k: ParserNadia.getProof('\n'.join(text_lines[:text_positions[k]] + ['{}. A &e 1'.format(k)])), ks[:REPLAYS])
+        tracemalloc.start()
+        kept = []
+        for k in ks:
+            new = session.branch(k)
+            new.add_line('A', '&e', (1,))
+            kept.append(new.state)
+        memory = tracemalloc.get_traced_memory()[0] / len(ks)
+        tracemalloc.stop()
+        print('{:5} {:11.1f} {:16.1f} {:18.1f} {:22.1f} {:18.1f}'.format(
+            len(text_lines), branch * 1e6, branch_line * 1e6, replayed * 1e3, checked * 1e3, memory / 1024))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+'''CDCL (decide_sequent) against the truth table (evaluate_sequent) on growing random
+sequents and on pigeonhole sequents. The truth table is only run up to TRUTH_TABLE_ATOMS
+atoms. Usage: python benchmarks/sat.py'''
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+from nadia.nadia_pt_fo import ParserTheorem
+from nadia.nadia_pt_sat import decide_sequent
+from nadia.nadia_pt_semantics import evaluate_sequent
+
+ATOMS = (10, 15, 20, 22, 24, 50, 100, 200, 400)
+TRUTH_TABLE_ATOMS = 24
+REPEAT = 5
+HOLES = (3, 4, 5, 6, 7)
+
+def random_formula(rnd, size, atoms):
+    if size <= 1:
+        return rnd.choice(atoms) if rnd.random() < 0.7 else '~' + rnd.choice(atoms)
+    left = rnd.randint(1, size - 1)
+    return '({}{}{})'.format(random_formula(rnd, left, atoms), rnd.choice(['&', '|', '->', '<->']), random_formula(rnd, size - left, atoms))
+
+def atom_name(i):
+    return 'P' + chr(65 + i // 26) + chr(65 + i % 26)
+
+def timed(function, *arguments):
+    start = time.perf_counter()
+    result = function(*arguments)
+    return result, (time.perf_counter() - start) * 1000
+
+def random_sequents():
+    rnd = random.Random(7)
+    print('random sequents: 5 premisses of 2n leaves, conclusion of 4n leaves; median of {}'.format(REPEAT))
+    print('atoms  valid  truth table(ms)  sat(ms)')
+    for n in ATOMS:
+        atoms = [atom_name(i) for i in range(n)]
+        rows = []
+        for i in range(REPEAT):
+            theorem = ', '.join(random_formula(rnd, 2 * n, atoms) for j in range(5)) + ' |- ' + random_formula(rnd, 4 * n, atoms)
+            premisses, conclusion = ParserTheorem.getTheorem(theorem)
+            sat, sat_time = timed(decide_sequent, premisses, conclusion)
+            table_time = None
+            if n <= TRUTH_TABLE_ATOMS:
+                table, table_time = timed(evaluate_sequent, premisses, conclusion)
+                assert table.valid == sat.valid
+            rows.append((sat_time, table_time, sat.valid))
+        rows.sort(key=lambda row: row[0])
+        sat_time, table_time, valid = rows[REPEAT // 2]
+        print('{:5} {:6} {:>16} {:8.1f}'.format(n, sum(row[2] for row in rows), '-' if table_time is None else '{:.1f}'.format(table_time), sat_time))
+
+def pigeonhole():
+    # n+1 pigeons in n holes: valid, and hard for resolution
+    print('pigeonhole: n+1 pigeons in n holes')
+    print('holes  atoms  truth table(ms)  sat(ms)  conflicts')
+    for n in HOLES:
+        atom = lambda pigeon, hole: 'H{}{}'.format(chr(65 + pigeon), chr(65 + hole))
+        premisses = ['(' + '|'.join(atom(p, h) for h in range(n)) + ')' for p in range(n + 1)]
+        conclusion = '|'.join('({}&{})'.format(atom(p, h), atom(q, h)) for h in range(n) for p in range(n + 1) for q in range(p + 1, n + 1))
+        premisses, conclusion = ParserTheorem.getTheorem(', '.join(premisses) + ' |- ' + conclusion)
+        sat, sat_time = timed(decide_sequent, premisses, conclusion)
+        assert sat.valid
+        table_time = None
+        if n * (n + 1) <= TRUTH_TABLE_ATOMS:
+            table, table_time = timed(evaluate_sequent, premisses, conclusion)
+            assert table.valid
+        print('{:5} {:6} {:>16} {:8.1f} {:10}'.format(n, n * (n + 1), '-' if table_time is None else '{:.1f}'.format(table_time), sat_time, sat.conflicts))
+
+if __name__ == '__main__':
+    random_sequents()
+    pigeonhole()
@@ -22,6 +22,7 @@ setup(
         'rply',
         'ipywidgets',
       ],
+    extras_require={'semantics': ['numpy']},
     entry_points={'console_scripts': ['nadia=nadia.__main__:main', ], },    
     
 )
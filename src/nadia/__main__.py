@@ -1,16 +1,156 @@
 import argparse
-from nadia.nadia_pt_fo import check_proof
 import os
+import sys
+import time
+
+
+def serve_main(argv):
+    from nadia.nadia_pt_server import serve
+    parser = argparse.ArgumentParser(prog='nadia serve', description='NADIA - Servidor de verificação de demonstrações.')
+    parser.add_argument("--host", type=str, default='127.0.0.1', help="Endereço do servidor HTTP.")
+    parser.add_argument("--port", type=int, default=8000, help="Porta do servidor HTTP.")
+    parser.add_argument("--unix", type=str, help="Arquivo do socket Unix, no lugar do servidor HTTP.")
+    parser.add_argument("-j", type=int, help="Número de processos que verificam as demonstrações.")
+    parser.add_argument("--queue", type=int, default=64, help="Número máximo de verificações pendentes.")
+    parser.add_argument("--timeout", type=float, default=10.0, help="Tempo limite em segundos de cada verificação.")
+    args = parser.parse_args(argv)
+    serve(host=args.host, port=args.port, unix_socket=args.unix, workers=args.j, max_queue=args.queue, timeout=args.timeout)
+
+
+def daemon_main(argv):
+    from nadia.nadia_pt_daemon import run_daemon, IDLE_TIMEOUT
+    parser = argparse.ArgumentParser(prog='nadia daemon', description='NADIA - Verificador em segundo plano usado por nadia -i --daemon.')
+    parser.add_argument("--socket", type=str, help="Arquivo do socket Unix.")
+    parser.add_argument("-j", type=int, default=2, help="Número de processos que verificam as demonstrações.")
+    parser.add_argument("--idle", type=float, default=IDLE_TIMEOUT, help="Segundos sem verificações até o verificador terminar.")
+    args = parser.parse_args(argv)
+    run_daemon(path=args.socket, workers=args.j, idle_timeout=args.idle)
+
+
+def batch_main(argv):
+    from nadia.nadia_pt_batch import file_submissions, manifest_submissions, stream_submissions, run_batch, DELIMITER
+    parser = argparse.ArgumentParser(prog='nadia batch', description='NADIA - Verificação de várias demonstrações em paralelo, com um resultado JSON por linha.')
+    parser.add_argument("paths", nargs='*', help="Arquivos, diretórios ou padrões (glob) com as demonstrações.")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("-t", type=str, help="Teorema que todas as demonstrações devem provar.")
+    group.add_argument("--manifest", type=str, help="Arquivo CSV com as colunas file, theorem e (opcional) id.")
+    parser.add_argument("--id-pattern", type=str, help="Expressão regular que extrai o id do aluno do caminho dos arquivos dentro dos arquivos zip/tar (o grupo id ou o primeiro grupo).")
+    parser.add_argument("--stream", type=str, help="Arquivo com várias demonstrações (- para a entrada padrão), em JSON por linha ou separadas por linhas com o delimitador.")
+    parser.add_argument("--format", choices=['auto', 'jsonl', 'delimited'], default='auto', help="Formato do --stream.")
+    parser.add_argument("--delimiter", type=str, default=DELIMITER, help="Início das linhas que separam as demonstrações do --stream.")
+    parser.add_argument("-j", type=int, help="Número de processos que verificam as demonstrações.")
+    parser.add_argument("--timeout", type=float, default=10.0, help="Tempo limite em segundos de cada demonstração.")
+    parser.add_argument("--memory", type=int, help="Limite de memória em MB de cada processo.")
+    parser.add_argument("--cache", type=str, help="Arquivo SQLite com os resultados já verificados.")
+    parser.add_argument("--ordered", action='store_true', help="Escreve os resultados na ordem das demonstrações.")
+    parser.add_argument("--db", type=str, help="Arquivo SQLite com a situação de cada submissão. Ao executar de novo, só as submissões pendentes ou com falha são verificadas.")
+    parser.add_argument("-o", type=str, help="Arquivo de saída (a saída padrão, se omitido).")
+    args = parser.parse_args(argv)
+    stream = None
+    if args.stream is not None:
+        stream = sys.stdin if args.stream == '-' else open(args.stream, 'r', encoding='utf-8')
+        submissions = stream_submissions(stream, args.format, args.t, args.delimiter)
+    elif args.manifest is not None:
+        submissions = manifest_submissions(args.manifest)
+    elif args.paths:
+        submissions = file_submissions(args.paths, args.t, args.id_pattern)
+    else:
+        parser.error('informe as demonstrações, o --manifest ou o --stream.')
+    cache = None
+    if args.cache is not None:
+        from nadia.nadia_pt_cache import ProofCache
+        cache = ProofCache(args.cache)
+    run = None
+    if args.db is not None:
+        from nadia.nadia_pt_jobs import GradingRun
+        run = GradingRun(args.db)
+    output = open(args.o, 'w', encoding='utf-8') if args.o is not None else sys.stdout
+    memory_limit = args.memory * 1024 * 1024 if args.memory is not None else None
+    start = time.perf_counter()
+    try:
+        summary = run_batch(submissions, output, processes=args.j, timeout=args.timeout, memory_limit=memory_limit, cache=cache, ordered=args.ordered, run=run)
+    except BrokenPipeError:
+        # The reader of the results (e.g. head) has finished
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
+    except KeyboardInterrupt:
+        print('Verificação interrompida.' + (' Execute de novo com --db {} para continuar.'.format(args.db) if run is not None else ''), file=sys.stderr)
+        sys.exit(130)
+    finally:
+        if run is not None:
+            run.close()
+        if output is not sys.stdout:
+            output.close()
+        if stream is not None and stream is not sys.stdin:
+            stream.close()
+    elapsed = time.perf_counter() - start
+    total = sum(summary.values())
+    print('{} demonstrações verificadas em {:.1f}s ({:.0f} por segundo): {}'.format(total, elapsed, total / elapsed if elapsed else 0,
+          ', '.join('{} {}'.format(count, status) for status, count in sorted(summary.items()))), file=sys.stderr)
+    if run is not None and run.skipped:
+        print('{} submissões já verificadas foram puladas.'.format(run.skipped), file=sys.stderr)
+    if cache is not None:
+        stats = cache.stats()
+        print('Cache: {} acertos, {} falhas ({:.0%}).'.format(stats['hits'], stats['misses'], stats['hit_rate']), file=sys.stderr)
+        cache.close()
+
+
+def report_main(argv):
+    import json
+    from nadia.nadia_pt_jobs import GradingRun, print_report
+    parser = argparse.ArgumentParser(prog='nadia report', description='NADIA - Resumo de uma correção feita com nadia batch --db, por teorema e código de erro.')
+    parser.add_argument("db", type=str, help="Arquivo SQLite da correção.")
+    parser.add_argument("--json", action='store_true', help="Escreve o resumo em JSON.")
+    args = parser.parse_args(argv)
+    if not os.path.isfile(args.db):
+        parser.error('arquivo não encontrado: ' + args.db)
+    run = GradingRun(args.db)
+    try:
+        report = run.report()
+    finally:
+        run.close()
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print_report(report, sys.stdout)
+
+
+def watch_main(argv):
+    from nadia.nadia_pt_watch import ProofWatcher, INTERVAL
+    parser = argparse.ArgumentParser(prog='nadia watch', description='NADIA - Verifica as demonstrações de novo sempre que os arquivos são salvos.')
+    parser.add_argument("paths", nargs='+', help="Arquivos, diretórios ou padrões (glob) com as demonstrações.")
+    parser.add_argument("-t", type=str, help="Teorema que as demonstrações devem provar.")
+    parser.add_argument("--interval", type=float, default=INTERVAL, help="Segundos entre as verificações dos arquivos.")
+    args = parser.parse_args(argv)
+    try:
+        ProofWatcher(args.paths, args.t).run(args.interval)
+    except KeyboardInterrupt:
+        pass
 
 
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] == 'batch':
+        return batch_main(sys.argv[2:])
+    if len(sys.argv) > 1 and sys.argv[1] == 'report':
+        return report_main(sys.argv[2:])
+    if len(sys.argv) > 1 and sys.argv[1] == 'watch':
+        return watch_main(sys.argv[2:])
+    if len(sys.argv) > 1 and sys.argv[1] == 'serve':
+        return serve_main(sys.argv[2:])
+    if len(sys.argv) > 1 and sys.argv[1] == 'daemon':
+        return daemon_main(sys.argv[2:])
     parser = argparse.ArgumentParser(description='NADIA - Natural Deduction Proof Assistant.')
     parser.add_argument("-i", type=str, required=True, help="Arquivo de entrada com a prova em NADIA.")
     parser.add_argument("-t", type=str, help="Entre com o teorema a ser analisado.")
     parser.add_argument("-dg", type=int, default=0, help="Digite 1 para exibir o código LaTeX no estilo de Gentzen.")
     parser.add_argument("-df", type=int, default=0, help="Digite 1 para exibir o código LaTeX no estilo de Fitch.")
     parser.add_argument("-dt", type=int, default=0, help="Digite 1 para exibir o teorema.")
+    parser.add_argument("--daemon", action='store_true', help="Usa um verificador em segundo plano, iniciado na primeira chamada, para as próximas chamadas serem mais rápidas (ou defina NADIA_DAEMON=1).")
     args = parser.parse_args()
+    if args.daemon or os.environ.get('NADIA_DAEMON') == '1':
+        from nadia.nadia_pt_daemon import check_proof
+    else:
+        from nadia.nadia_pt_fo import check_proof
     input_theorem = None
     input_display_gentzen = False
     input_display_fitch = False
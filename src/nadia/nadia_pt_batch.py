@@ -0,0 +1,523 @@
+import csv
+import glob
+import json
+import os
+import re
+import signal
+import tarfile
+import zipfile
+import sys
+import time
+import traceback
+import multiprocessing
+from collections import namedtuple, deque
+from itertools import islice, chain
+from multiprocessing.connection import wait
+from nadia.nadia_pt_fo import verify_proof, warm_up, check_status
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Result of the check of one proof of a batch. The index is the position of the proof
+# in the input, the status is a value of check_status, the sequent is the one proved
+# (None when the proof has errors), the errors are the messages found, the codes are their
+# constants and the time is the number of seconds taken by the check (0 if it was cached).
+ProofResult = namedtuple('ProofResult', ['index', 'status', 'sequent', 'errors', 'codes', 'time'])
+
+STATUS_NAMES = {
+    check_status.CORRECT: 'correct',
+    check_status.DIFFERENT_THEOREM: 'different_theorem',
+    check_status.INVALID_THEOREM: 'invalid_theorem',
+    check_status.INVALID_PROOF: 'invalid_proof',
+    check_status.TIMEOUT: 'timeout',
+    check_status.MEMORY_LIMIT: 'memory_limit',
+    check_status.CRASHED: 'crashed',
+}
+
+# Jobs read from the input at a time and scheduled longest first
+BLOCK_SIZE = 1024
+
+# Statuses that depend on the proof alone, and not on the limits of the batch
+CACHEABLE_STATUS = (check_status.CORRECT, check_status.DIFFERENT_THEOREM, check_status.INVALID_THEOREM, check_status.INVALID_PROOF)
+
+def check_one(index, input_proof, input_theorem=None):
+    # A proof that crashes the checker is recorded as CRASHED, as in the workers
+    return to_result(*verify_inline(index, input_proof, input_theorem))
+
+def to_result(index, value, elapsed=0.0):
+    status, sequent, errors, _, codes = value
+    return ProofResult(index, status, sequent, errors, codes, elapsed)
+
+def estimate_size(input_proof):
+    # Cheap estimate of the cost of checking a proof. The Gentzen proof of a rule contains
+    # the proofs of the rules it references, so nested boxes cost more than their lines.
+    lines = 0
+    depth = 0
+    max_depth = 0
+    for line in input_proof.splitlines():
+        lines += 1
+        depth += line.count('{')
+        max_depth = max(max_depth, depth)
+        depth -= line.count('}')
+    return lines * (1 + max_depth)
+
+def default_chunksize(proofs, processes):
+    # Sends a few chunks to each worker, so that the cost of the IPC is amortized
+    # without leaving workers idle at the end of the batch
+    if not hasattr(proofs, '__len__'):
+        return 16
+    return max(1, min(64, len(proofs) // (processes * 4)))
+
+class ProofTimeout(Exception):
+    pass
+
+def raise_timeout(signum, frame):
+    raise ProofTimeout()
+
+def limit_error(status, timeout=None):
+    if status == check_status.TIMEOUT:
+        error = 'A verificação da demonstração excedeu o tempo limite de {} segundos.'.format(timeout)
+    elif status == check_status.MEMORY_LIMIT:
+        error = 'A verificação da demonstração excedeu o limite de memória.'
+    else:
+        error = 'A verificação da demonstração terminou inesperadamente.'
+    return (status, None, (error,), error, ())
+
+def verify_limited(input_proof, input_theorem, timeout=None):
+    # Returns the result of verify_proof (with the errors as a tuple) and whether the
+    # worker must be replaced
+    try:
+        if timeout is not None:
+            signal.setitimer(signal.ITIMER_REAL, timeout)
+        try:
+            status, sequent, errors, message, codes = verify_proof(input_proof, input_theorem, display_theorem=False, display_fitch=False, display_gentzen=False)
+        finally:
+            if timeout is not None:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+        return (status, sequent, tuple(errors), message, tuple(codes)), False
+    except ProofTimeout:
+        return limit_error(check_status.TIMEOUT, timeout), False
+    except MemoryError:
+        return limit_error(check_status.MEMORY_LIMIT), True
+    except Exception:
+        error = traceback.format_exc()
+        return (check_status.CRASHED, None, (error,), error, ()), False
+
+def worker_main(connection, timeout, memory_limit):
+    # Checks the chunks of jobs sent by the parent and sends back the result of each job
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    warm_up()
+    if timeout is not None and hasattr(signal, 'setitimer'):
+        signal.signal(signal.SIGALRM, raise_timeout)
+    else:
+        timeout = None
+    if memory_limit is not None and resource is not None:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+    while True:
+        try:
+            jobs = connection.recv()
+        except EOFError:
+            return
+        if jobs is None:
+            return
+        for index, input_proof, input_theorem in jobs:
+            start = time.perf_counter()
+            value, recycle = verify_limited(input_proof, input_theorem, timeout)
+            connection.send((index, value, time.perf_counter() - start, recycle))
+            if recycle:
+                return
+
+class Worker():
+    def __init__(self, context, timeout, memory_limit):
+        self.connection, child = context.Pipe()
+        self.process = context.Process(target=worker_main, args=(child, timeout, memory_limit), daemon=True)
+        self.process.start()
+        child.close()
+        # Jobs sent to the worker and not finished, and when the first of them started
+        self.jobs = deque()
+        self.started = None
+
+    def send(self, jobs):
+        self.jobs.extend(jobs)
+        self.started = time.monotonic()
+        try:
+            self.connection.send(jobs)
+        except OSError:
+            pass
+
+    def stop(self):
+        try:
+            self.connection.send(None)
+        except OSError:
+            pass
+        self.connection.close()
+        self.process.join(1)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+
+    def kill(self):
+        self.connection.close()
+        self.process.kill()
+        self.process.join()
+
+def run_jobs(jobs, processes, chunksize=16, timeout=None, memory_limit=None):
+    '''Checks the jobs (index, proof, theorem) on processes workers and yields
+    (index, result, time) as the jobs are finished, where result is the tuple returned by
+    verify_proof. The jobs are read in blocks and the longest of a block are started first.
+    A proof that takes more than timeout seconds, or makes its worker use more than
+    memory_limit bytes of address space, is recorded with the status TIMEOUT or
+    MEMORY_LIMIT. A worker that dies is replaced and its proof is recorded as CRASHED.'''
+    context = multiprocessing.get_context()
+    # A worker stuck out of the reach of its alarm is killed after this time
+    hard_timeout = timeout * 1.5 + 1 if timeout is not None else None
+    jobs = iter(jobs)
+    pending = deque()
+    exhausted = False
+    workers = [Worker(context, timeout, memory_limit) for i in range(processes)]
+    try:
+        while True:
+            if not pending and not exhausted:
+                block = list(islice(jobs, BLOCK_SIZE))
+                exhausted = len(block) < BLOCK_SIZE
+                block.sort(key=lambda job: estimate_size(job[1]), reverse=True)
+                pending.extend(block)
+            for i, worker in enumerate(workers):
+                if not worker.jobs and pending:
+                    if not worker.process.is_alive():
+                        worker.kill()
+                        worker = workers[i] = Worker(context, timeout, memory_limit)
+                    worker.send([pending.popleft() for _ in range(min(chunksize, len(pending)))])
+            busy = [worker for worker in workers if worker.jobs]
+            if not busy:
+                if exhausted and not pending:
+                    return
+                continue
+            wait_time = None
+            if hard_timeout is not None:
+                wait_time = max(0, min(worker.started + hard_timeout for worker in busy) - time.monotonic())
+            wait([worker.connection for worker in busy] + [worker.process.sentinel for worker in busy], wait_time)
+            for i, worker in enumerate(workers):
+                if not worker.jobs:
+                    continue
+                recycle = False
+                try:
+                    while worker.jobs and worker.connection.poll():
+                        index, value, elapsed, recycle = worker.connection.recv()
+                        worker.jobs.popleft()
+                        worker.started = time.monotonic()
+                        yield index, value, elapsed
+                        if recycle:
+                            break
+                except (EOFError, OSError):
+                    pass
+                if recycle:
+                    failed = None
+                elif not worker.process.is_alive():
+                    failed = limit_error(check_status.CRASHED)
+                elif hard_timeout is not None and worker.jobs and time.monotonic() - worker.started > hard_timeout:
+                    failed = limit_error(check_status.TIMEOUT, timeout)
+                else:
+                    continue
+                if failed is not None and worker.jobs:
+                    index, _, _ = worker.jobs.popleft()
+                    yield index, failed, time.monotonic() - worker.started
+                # The jobs of the chunk that were not started are checked by the new worker
+                pending.extendleft(reversed(worker.jobs))
+                worker.jobs.clear()
+                worker.kill()
+                workers[i] = Worker(context, timeout, memory_limit)
+    finally:
+        for worker in workers:
+            worker.stop()
+
+def check_proofs(proofs, ordered=True, processes=None, chunksize=None, cache=None, timeout=None, memory_limit=None):
+    '''Checks the pairs (proof, theorem) of proofs, where the theorem may be None, and
+    yields a ProofResult for each one. The results are yielded in the order of the input
+    or, if ordered is False, as they are completed. The proofs are checked by processes
+    workers that build the parsers once when they start (see run_jobs for the limits of
+    timeout seconds and memory_limit bytes per proof). If a ProofCache is given, only the
+    proofs that are not in the cache are checked.'''
+    if processes is None:
+        processes = os.cpu_count() or 1
+    if chunksize is None:
+        chunksize = default_chunksize(proofs, processes)
+    if cache is not None:
+        yield from check_proofs_cached(proofs, ordered, processes, chunksize, cache, timeout, memory_limit)
+        return
+    if processes == 1 and timeout is None and memory_limit is None:
+        for index, (input_proof, input_theorem) in enumerate(proofs):
+            yield check_one(index, input_proof, input_theorem)
+        return
+    jobs = ((index, input_proof, input_theorem) for index, (input_proof, input_theorem) in enumerate(proofs))
+    results = {}
+    next_index = 0
+    for index, value, elapsed in run_jobs(jobs, processes, chunksize, timeout, memory_limit):
+        result = to_result(index, value, elapsed)
+        if not ordered:
+            yield result
+            continue
+        results[index] = result
+        while next_index in results:
+            yield results.pop(next_index)
+            next_index += 1
+
+def check_proofs_cached(proofs, ordered, processes, chunksize, cache, timeout, memory_limit):
+    # The proofs are read in blocks, so that the memory does not depend on the size of the batch
+    proofs = enumerate(proofs)
+    while True:
+        block = list(islice(proofs, BLOCK_SIZE))
+        if not block:
+            return
+        yield from check_block_cached(block, ordered, processes, chunksize, cache, timeout, memory_limit)
+
+def check_block_cached(block, ordered, processes, chunksize, cache, timeout, memory_limit):
+    # Looks up every proof in the cache and checks the missing proofs that have the same
+    # normalized text only once. The result of a proof with errors depends on its text, so
+    # the other proofs of its group are checked in a second round.
+    found = {}
+    groups = {}
+    for index, (input_proof, input_theorem) in block:
+        value, exact_key, normal_key = cache.lookup(input_proof, input_theorem, (False, False, False))
+        if value is not None:
+            found[index] = to_result(index, value)
+        else:
+            groups.setdefault(normal_key or exact_key, []).append((index, input_proof, input_theorem, exact_key, normal_key))
+    if not ordered:
+        yield from found.values()
+        found.clear()
+    next_index = block[0][0]
+    end_index = block[-1][0] + 1
+    while groups:
+        missing = list(groups.values())
+        groups = {}
+        jobs = [(i, group[0][1], group[0][2]) for i, group in enumerate(missing)]
+        if processes == 1 and timeout is None and memory_limit is None:
+            results = (verify_inline(i, input_proof, input_theorem) for i, input_proof, input_theorem in jobs)
+        else:
+            results = run_jobs(jobs, min(processes, len(jobs)), chunksize, timeout, memory_limit)
+        for i, value, elapsed in results:
+            _, _, _, exact_key, normal_key = missing[i][0]
+            status = value[0]
+            if status in CACHEABLE_STATUS:
+                cache.store(value, exact_key, normal_key)
+            for index, input_proof, input_theorem, other_exact_key, _ in missing[i]:
+                if status == check_status.INVALID_PROOF and other_exact_key != exact_key:
+                    groups.setdefault(other_exact_key, []).append((index, input_proof, input_theorem, other_exact_key, None))
+                    continue
+                if not ordered:
+                    yield to_result(index, value, elapsed)
+                else:
+                    found[index] = to_result(index, value, elapsed)
+            while ordered and next_index in found:
+                yield found.pop(next_index)
+                next_index += 1
+    while ordered and next_index < end_index:
+        yield found.pop(next_index)
+        next_index += 1
+
+def verify_inline(index, input_proof, input_theorem):
+    start = time.perf_counter()
+    value, _ = verify_limited(input_proof, input_theorem)
+    return index, value, time.perf_counter() - start
+
+
+# CHECK OF SUBMISSIONS
+# A submission is a tuple (info, proof, theorem), where info is a dict written in the line
+# of its result (e.g. the file of the proof). The proof is None if it could not be read,
+# and info['error'] tells why.
+
+def find_files(paths):
+    # Yields the files of paths, which may be files, directories or glob patterns
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if not name.startswith('.'):
+                        yield os.path.join(root, name)
+        elif os.path.isfile(path):
+            yield path
+        else:
+            for name in glob.iglob(path, recursive=True):
+                if os.path.isfile(name):
+                    yield name
+
+def read_file(info, file_name, input_theorem):
+    try:
+        with open(file_name, 'r', encoding='utf-8', errors='replace') as f:
+            return info, f.read(), input_theorem
+    except OSError as e:
+        info['error'] = str(e)
+        return info, None, input_theorem
+
+def file_submissions(paths, input_theorem=None, id_pattern=None):
+    # The members of the archives (zip and tar) in paths are read as files
+    for file_name in find_files(paths):
+        if is_archive(file_name):
+            yield from archive_submissions(file_name, input_theorem, id_pattern)
+        else:
+            yield read_file({'file': file_name}, file_name, input_theorem)
+
+ARCHIVE_EXTENSIONS = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')
+
+# Larger members of an archive are not proofs, and are not read
+MAX_MEMBER_SIZE = 1024 * 1024
+
+def is_archive(file_name):
+    return file_name.lower().endswith(ARCHIVE_EXTENSIONS)
+
+def member_info(archive, name, id_pattern):
+    # The id of the member is the group id (or the first group) of id_pattern found in its
+    # path, e.g. r'_(\d+)_assignsubmission' for the files exported by Moodle
+    info = {'file': archive + ':' + name}
+    if id_pattern is not None:
+        match = re.search(id_pattern, name)
+        if match is not None:
+            groups = match.groupdict()
+            info['id'] = groups['id'] if 'id' in groups else (match.group(1) if match.groups() else match.group(0))
+    return info
+
+def is_proof_member(name):
+    parts = name.split('/')
+    return not any(part.startswith('.') or part == '__MACOSX' for part in parts)
+
+def archive_submissions(archive, input_theorem=None, id_pattern=None):
+    '''Reads the files of a zip or tar archive one at a time, without extracting it.'''
+    try:
+        if archive.lower().endswith('.zip'):
+            yield from zip_submissions(archive, input_theorem, id_pattern)
+        else:
+            yield from tar_submissions(archive, input_theorem, id_pattern)
+    except (OSError, zipfile.BadZipFile, tarfile.TarError) as e:
+        yield {'file': archive, 'error': str(e)}, None, input_theorem
+
+def zip_submissions(archive, input_theorem, id_pattern):
+    with zipfile.ZipFile(archive) as z:
+        for member in z.infolist():
+            if member.is_dir() or not is_proof_member(member.filename):
+                continue
+            info = member_info(archive, member.filename, id_pattern)
+            if member.file_size > MAX_MEMBER_SIZE:
+                info['error'] = 'O arquivo tem mais de {} bytes.'.format(MAX_MEMBER_SIZE)
+                yield info, None, input_theorem
+                continue
+            yield info, z.read(member).decode('utf-8', errors='replace'), input_theorem
+
+def tar_submissions(archive, input_theorem, id_pattern):
+    # The archive is read as a stream, member after member
+    with tarfile.open(archive, 'r|*') as t:
+        for member in t:
+            if not member.isfile() or not is_proof_member(member.name):
+                continue
+            info = member_info(archive, member.name, id_pattern)
+            if member.size > MAX_MEMBER_SIZE:
+                info['error'] = 'O arquivo tem mais de {} bytes.'.format(MAX_MEMBER_SIZE)
+                yield info, None, input_theorem
+                continue
+            yield info, t.extractfile(member).read().decode('utf-8', errors='replace'), input_theorem
+
+def manifest_submissions(manifest):
+    # The manifest is a CSV file with the columns file and theorem, and optionally id.
+    # The files are relative to the directory of the manifest.
+    directory = os.path.dirname(os.path.abspath(manifest))
+    with open(manifest, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            info = {'id': row['id']} if row.get('id') else {}
+            info['file'] = row['file']
+            yield read_file(info, os.path.join(directory, row['file']), row.get('theorem') or None)
+
+# Line that separates the proofs of a stream; the rest of the line is the id of the next proof
+DELIMITER = '---'
+
+def stream_submissions(f, format='auto', input_theorem=None, delimiter=DELIMITER):
+    '''Reads the proofs of the stream f one at a time. In the format jsonl, each line is a
+    JSON object with the fields proof and, optionally, id and theorem. In the format
+    delimited, the proofs are separated by lines that start with the delimiter, followed by
+    the id of the next proof. The format auto is jsonl if the stream starts with {. The
+    theorem of the proofs without one is input_theorem.'''
+    lines = iter(f)
+    first = ''
+    for first in lines:
+        if first.strip():
+            break
+    if format == 'auto':
+        format = 'jsonl' if first.lstrip().startswith('{') else 'delimited'
+    lines = chain([first], lines)
+    if format == 'jsonl':
+        yield from jsonl_submissions(lines, input_theorem)
+    else:
+        yield from delimited_submissions(lines, input_theorem, delimiter)
+
+def jsonl_submissions(lines, input_theorem):
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            input_proof = record['proof']
+        except (ValueError, TypeError, KeyError):
+            yield {'id': number, 'error': 'A linha {} não é um JSON com o campo proof.'.format(number)}, None, None
+            continue
+        yield {'id': record.get('id', number)}, input_proof, record.get('theorem') or input_theorem
+
+def delimited_submissions(lines, input_theorem, delimiter):
+    number = 1
+    proof_id = number
+    proof_lines = []
+    for line in lines:
+        if line.startswith(delimiter):
+            if ''.join(proof_lines).strip():
+                yield {'id': proof_id}, ''.join(proof_lines), input_theorem
+                number += 1
+            proof_id = line[len(delimiter):].strip() or number
+            proof_lines = []
+        else:
+            proof_lines.append(line)
+    if ''.join(proof_lines).strip():
+        yield {'id': proof_id}, ''.join(proof_lines), input_theorem
+
+def run_batch(submissions, output=None, processes=None, timeout=None, memory_limit=None, cache=None, ordered=False, run=None):
+    '''Checks the submissions and writes a JSON line for each one to output (stdout by
+    default) as soon as it is checked. If a GradingRun is given, the submissions already
+    done in it are skipped and the status of the others is saved in it. Returns the number
+    of submissions by status.'''
+    output = output or sys.stdout
+    infos = {}
+    unreadable = deque()
+    summary = {}
+    def proofs():
+        # Only the infos of the submissions being checked are kept
+        index = 0
+        for info, input_proof, input_theorem in submissions:
+            if run is not None:
+                if run.is_done(info, input_proof, input_theorem):
+                    run.skipped += 1
+                    continue
+                run.add(info, input_proof, input_theorem)
+            if input_proof is None:
+                unreadable.append((info, input_proof, input_theorem))
+                continue
+            infos[index] = (info, input_proof, input_theorem)
+            index += 1
+            yield input_proof, input_theorem
+    def write(record, submission):
+        summary[record['status']] = summary.get(record['status'], 0) + 1
+        if run is not None:
+            run.save(*submission, record)
+        output.write(json.dumps(record, ensure_ascii=False) + '\n')
+        output.flush()
+    def write_unreadable():
+        while unreadable:
+            submission = unreadable.popleft()
+            write(dict(submission[0], status='unreadable'), submission)
+    for result in check_proofs(proofs(), ordered=ordered, processes=processes, cache=cache, timeout=timeout, memory_limit=memory_limit):
+        write_unreadable()
+        submission = infos.pop(result.index)
+        record = dict(submission[0])
+        record.update(status=STATUS_NAMES[result.status], sequent=result.sequent, codes=list(result.codes),
+                      errors=list(result.errors), time=round(result.time, 6))
+        write(record, submission)
+    write_unreadable()
+    return summary
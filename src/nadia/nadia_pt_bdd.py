@@ -0,0 +1,251 @@
+from collections import namedtuple
+from nadia.nadia_pt_fo import ParserFormula, AtomFormula, NegationFormula, AndFormula, OrFormula, ImplicationFormula, BiImplicationFormula, PredicateFormula, QuantifierFormula
+from nadia.nadia_pt_models import search_countermodel
+
+FALSE = 0
+TRUE = 1
+# Largest domain and seconds of the search of a model that distinguishes two first-order
+# formulas that are not equivalent as propositional formulas
+MODEL_SIZE = 3
+MODEL_TIMEOUT = 0.2
+
+class equivalence_status:
+  EQUIVALENT = 0 # A fórmula é equivalente à de referência
+  NOT_EQUIVALENT = 1 # A fórmula não é equivalente à de referência
+  INVALID_FORMULA = 2 # A fórmula não foi reconhecida pelo parser
+  UNKNOWN = 3 # Fórmulas de primeira ordem que não foi possível decidir
+
+# Result of the comparison of a submission with the reference: the index of the submission,
+# a value of equivalence_status, the formula parsed (None if invalid) and what
+# distinguishes them: a valuation (atom -> bool) or a FiniteModel of the first-order
+# formulas that is a model of one of them only.
+FormulaGrade = namedtuple('FormulaGrade', ['index', 'status', 'formula', 'countermodel'])
+
+def formula_atoms(formula, atoms, sizes):
+    # Atoms and predicates of the formula, out of the quantifiers, the heaviest subformula first
+    if isinstance(formula, NegationFormula):
+        formula_atoms(formula.formula, atoms, sizes)
+    elif isinstance(formula, (AndFormula, OrFormula, ImplicationFormula, BiImplicationFormula)):
+        children = sorted([formula.left, formula.right], key=lambda f: -formula_size(f, sizes))
+        for child in children:
+            formula_atoms(child, atoms, sizes)
+    elif isinstance(formula, (AtomFormula, PredicateFormula)) and formula.toString() != '@':
+        atoms.setdefault(formula.toString(), formula)
+    return atoms
+
+def formula_size(formula, sizes):
+    size = sizes.get(id(formula))
+    if size is None:
+        if isinstance(formula, (NegationFormula, QuantifierFormula)):
+            size = 1 + formula_size(formula.formula, sizes)
+        elif isinstance(formula, (AndFormula, OrFormula, ImplicationFormula, BiImplicationFormula)):
+            size = 1 + formula_size(formula.left, sizes) + formula_size(formula.right, sizes)
+        else:
+            size = 1
+        sizes[id(formula)] = size
+    return size
+
+def quantifier_height(formula):
+    # Largest number of nested quantifiers of the formula
+    if isinstance(formula, QuantifierFormula):
+        return 1 + quantifier_height(formula.formula)
+    if isinstance(formula, NegationFormula):
+        return quantifier_height(formula.formula)
+    if isinstance(formula, (AndFormula, OrFormula, ImplicationFormula, BiImplicationFormula)):
+        return max(quantifier_height(formula.left), quantifier_height(formula.right))
+    return 0
+
+def order_variables(formulas):
+    '''Order of the atoms of the formulas for the BDD: depth first, the heaviest subformula
+    first, so that the atoms that are near in the formulas are near in the order. The
+    quantified formulas are added to the order when they are compiled.'''
+    atoms = {}
+    sizes = {}
+    for formula in formulas:
+        formula_atoms(formula, atoms, sizes)
+    return list(atoms)
+
+class BDD():
+    '''Reduced ordered binary decision diagrams. The nodes are ints (FALSE and TRUE are the
+    terminals) and the unique table keeps one node for each (variable, low, high), so the
+    BDDs of equivalent formulas compiled by the same manager are the same node. ite keeps
+    its results in the computed table. The variables are ordered by their creation (see
+    order_variables); a new atom is added after the others.'''
+    def __init__(self, variables=()):
+        self.variables = []
+        self.levels = {}
+        # Node -> (level, low, high); the terminals are below all the variables
+        self.nodes = [(float('inf'), None, None), (float('inf'), None, None)]
+        self.unique = {}
+        self.computed = {}
+        self.abstractions = {}
+        for name in variables:
+            self.add_variable(name)
+
+    def add_variable(self, name):
+        if name not in self.levels:
+            self.levels[name] = len(self.variables)
+            self.variables.append(name)
+        return self.make(self.levels[name], FALSE, TRUE)
+
+    def make(self, level, low, high):
+        if low == high:
+            return low
+        key = (level, low, high)
+        node = self.unique.get(key)
+        if node is None:
+            node = len(self.nodes)
+            self.nodes.append(key)
+            self.unique[key] = node
+        return node
+
+    def ite(self, f, g, h):
+        # If f then g else h
+        if f == TRUE:
+            return g
+        if f == FALSE:
+            return h
+        if g == h:
+            return g
+        if g == TRUE and h == FALSE:
+            return f
+        key = (f, g, h)
+        result = self.computed.get(key)
+        if result is not None:
+            return result
+        nodes = self.nodes
+        level = min(nodes[f][0], nodes[g][0], nodes[h][0])
+        f0, f1 = self.cofactors(f, level)
+        g0, g1 = self.cofactors(g, level)
+        h0, h1 = self.cofactors(h, level)
+        result = self.make(level, self.ite(f0, g0, h0), self.ite(f1, g1, h1))
+        self.computed[key] = result
+        return result
+
+    def cofactors(self, f, level):
+        node = self.nodes[f]
+        if node[0] == level:
+            return node[1], node[2]
+        return f, f
+
+    def negate(self, f):
+        return self.ite(f, FALSE, TRUE)
+
+    def compile(self, formula):
+        '''Node of the formula (a result of ParserFormula.getFormula). The predicates and the
+        universal formulas are atoms of the BDD.'''
+        # The connectives are shared by the computed table, the atoms by their names
+        if isinstance(formula, AtomFormula) and formula.key == '@':
+            return FALSE
+        if isinstance(formula, (AtomFormula, PredicateFormula)):
+            key = formula.toString()
+            if isinstance(formula, PredicateFormula):
+                self.abstractions[key] = formula
+            return self.add_variable(key)
+        if isinstance(formula, NegationFormula):
+            return self.negate(self.compile(formula.formula))
+        if isinstance(formula, QuantifierFormula):
+            # Ax F is an atom given by the node of F, with x renamed by the height of F, so
+            # that Ax P(x) and Ay P(y) are the same atom; Ex F is ~Ax ~F
+            name = '_{}'.format(quantifier_height(formula.formula))
+            body = self.compile(formula.formula.substitution(formula.variable, name))
+            if not formula.forAll:
+                body = self.negate(body)
+            if body in (FALSE, TRUE):
+                node = body
+            else:
+                atom = 'A{} {}'.format(name, body)
+                self.abstractions[atom] = formula
+                node = self.add_variable(atom)
+            return node if formula.forAll else self.negate(node)
+        left = self.compile(formula.left)
+        right = self.compile(formula.right)
+        if isinstance(formula, AndFormula):
+            return self.ite(left, right, FALSE)
+        if isinstance(formula, OrFormula):
+            return self.ite(left, TRUE, right)
+        if isinstance(formula, ImplicationFormula):
+            return self.ite(left, right, TRUE)
+        return self.ite(left, right, self.negate(right))
+
+    def satisfying(self, f):
+        # Valuation (variable -> bool) of a path of f to TRUE, or None if f is FALSE
+        if f == FALSE:
+            return None
+        valuation = {}
+        while f != TRUE:
+            level, low, high = self.nodes[f]
+            value = low == FALSE
+            valuation[self.variables[level]] = value
+            f = high if value else low
+        return valuation
+
+    def reachable(self, f):
+        # Nodes of f, without the terminals
+        seen = set()
+        stack = [f]
+        while stack:
+            node = stack.pop()
+            if node > TRUE and node not in seen:
+                seen.add(node)
+                stack += self.nodes[node][1:]
+        return seen
+
+    def is_first_order(self, f):
+        # True if f depends on a predicate or a quantified formula
+        return any(self.variables[self.nodes[node][0]] in self.abstractions for node in self.reachable(f))
+
+def grade_formulas(reference, submissions, bdd=None):
+    '''Compares each formula of submissions (strings) with the reference formula and returns a
+    FormulaGrade for each one, in order. All the formulas are compiled in the same BDD, so
+    each comparison is a comparison of nodes, and the repeated submissions are parsed and
+    compared once. When first-order formulas are not equivalent as propositional formulas
+    (their predicates and universal formulas are atoms), a finite model that distinguishes
+    them is searched.'''
+    reference_formula = ParserFormula.getFormula(reference)
+    if reference_formula is None:
+        raise ValueError('A fórmula de referência {} não está correta.'.format(reference))
+    parsed = {}
+    for submission in submissions:
+        if submission.strip() not in parsed:
+            parsed[submission.strip()] = ParserFormula.getFormula(submission)
+    formulas = [parsed[submission.strip()] for submission in submissions]
+    if bdd is None:
+        bdd = BDD(order_variables([reference_formula] + [f for f in parsed.values() if f is not None]))
+    target = bdd.compile(reference_formula)
+    grades = []
+    verdicts = {}
+    for index, formula in enumerate(formulas):
+        if formula is None:
+            grades.append(FormulaGrade(index, equivalence_status.INVALID_FORMULA, None, None))
+            continue
+        node = bdd.compile(formula)
+        if node not in verdicts:
+            verdicts[node] = compare(bdd, reference_formula, target, formula, node)
+        status, countermodel = verdicts[node]
+        grades.append(FormulaGrade(index, status, formula, countermodel))
+    return grades
+
+def compare(bdd, reference_formula, target, formula, node):
+    if node == target:
+        return equivalence_status.EQUIVALENT, None
+    difference = bdd.ite(target, bdd.negate(node), node)
+    if not bdd.is_first_order(difference):
+        return equivalence_status.NOT_EQUIVALENT, bdd.satisfying(difference)
+    # As propositional formulas they are not equivalent, but they may be as first-order ones
+    try:
+        for premisse, conclusion in ((reference_formula, formula), (formula, reference_formula)):
+            model = search_countermodel([premisse], conclusion, MODEL_SIZE, MODEL_TIMEOUT).countermodel
+            if model is not None:
+                return equivalence_status.NOT_EQUIVALENT, model
+    except ValueError:
+        pass
+    return equivalence_status.UNKNOWN, None
+
+def equivalent_formulas(formula1, formula2):
+    '''Returns True if the formulas (strings) are equivalent, False if not and None when it was
+    not possible to decide (first-order formulas).'''
+    status = grade_formulas(formula1, [formula2])[0].status
+    if status == equivalence_status.INVALID_FORMULA:
+        raise ValueError('A fórmula {} não está correta.'.format(formula2))
+    return {equivalence_status.EQUIVALENT: True, equivalence_status.NOT_EQUIVALENT: False}.get(status)
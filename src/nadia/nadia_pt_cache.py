@@ -0,0 +1,137 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from rply.errors import LexingError
+from nadia.nadia_pt_fo import verify_proof, get_warm_lexer, check_status
+from nadia.nadia_pt_daemon import CHECKER_MODULES
+
+def checker_version():
+    # Results are only valid for the checker that computed them
+    digest = hashlib.sha256()
+    for name in CHECKER_MODULES:
+        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), name), 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+CACHE_VERSION = checker_version()
+
+def normalize_proof(input_proof):
+    '''Returns the proof without comments and with the whitespace collapsed, or None if it
+    can not be lexed. The numbers written at the beginning of the lines are kept, since the
+    sequence of the lines is checked on the text of the proof.'''
+    numbers = []
+    for p in input_proof.splitlines():
+        x = p.split('.')[0]
+        if x.isdigit():
+            numbers.append(x)
+    try:
+        tokens = [token.name + ' ' + token.value for token in get_warm_lexer().lex(input_proof)]
+    except LexingError:
+        return None
+    return ' '.join(numbers) + '\n' + '\t'.join(tokens)
+
+class ProofCache():
+    '''Results of verify_proof addressed by the hash of the proof and of the theorem. A proof
+    without errors is addressed by its normalized text, so proofs that differ only in comments
+    and whitespace share the result. A proof with errors is addressed by its exact text, since
+    the messages show its lines. The results are kept in memory (the max_entries most recently
+    used) and, if path is given, in a SQLite file shared by the runs.'''
+    def __init__(self, path=None, max_entries=4096):
+        self.max_entries = max_entries
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.db = None
+        if path is not None:
+            self.db = sqlite3.connect(path, check_same_thread=False)
+            self.db.execute('PRAGMA journal_mode=WAL')
+            self.db.execute('PRAGMA synchronous=NORMAL')
+            self.db.execute('CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, version TEXT, value TEXT)')
+            self.db.execute('DELETE FROM results WHERE version != ?', (CACHE_VERSION,))
+            self.db.commit()
+
+    @staticmethod
+    def key(text, input_theorem, display):
+        h = hashlib.sha256()
+        for part in (CACHE_VERSION, repr(display), input_theorem if input_theorem is not None else '\0', text):
+            h.update(part.encode('utf-8'))
+            h.update(b'\0')
+        return h.hexdigest()
+
+    def get(self, key):
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                self.memory_hits += 1
+                return self.memory[key]
+            if self.db is not None:
+                row = self.db.execute('SELECT value FROM results WHERE key = ?', (key,)).fetchone()
+                if row is not None:
+                    status, sequent, errors, message, codes = json.loads(row[0])
+                    value = (status, sequent, tuple(errors), message, tuple(codes))
+                    self.store_memory(key, value)
+                    self.disk_hits += 1
+                    return value
+        return None
+
+    def put(self, key, value):
+        with self.lock:
+            self.store_memory(key, value)
+            if self.db is not None:
+                self.db.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?)', (key, CACHE_VERSION, json.dumps(value, ensure_ascii=False)))
+                self.db.commit()
+
+    def store_memory(self, key, value):
+        self.memory[key] = value
+        self.memory.move_to_end(key)
+        if len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    def lookup(self, input_proof, input_theorem=None, display=(True, True, True)):
+        # Returns the cached result and the keys of the proof
+        exact_key = self.key(input_proof, input_theorem, display)
+        value = self.get(exact_key)
+        if value is not None:
+            return value, exact_key, None
+        normalized = normalize_proof(input_proof)
+        normal_key = self.key(normalized, input_theorem, display) if normalized is not None else None
+        value = self.get(normal_key) if normal_key is not None else None
+        if value is None:
+            with self.lock:
+                self.misses += 1
+        return value, exact_key, normal_key
+
+    def store(self, value, exact_key, normal_key):
+        if value[0] != check_status.INVALID_PROOF and normal_key is not None:
+            self.put(normal_key, value)
+        else:
+            self.put(exact_key, value)
+
+    def verify_proof(self, input_proof, input_theorem=None, display_theorem=True, display_fitch=True, display_gentzen=True):
+        display = (display_theorem, display_fitch, display_gentzen)
+        value, exact_key, normal_key = self.lookup(input_proof, input_theorem, display)
+        if value is None:
+            status, sequent, errors, message, codes = verify_proof(input_proof, input_theorem, display_theorem, display_fitch, display_gentzen)
+            value = (status, sequent, tuple(errors), message, tuple(codes))
+            self.store(value, exact_key, normal_key)
+        return value
+
+    def check_proof(self, input_proof, input_theorem=None, display_theorem=True, display_fitch=True, display_gentzen=True):
+        return self.verify_proof(input_proof, input_theorem, display_theorem, display_fitch, display_gentzen)[3]
+
+    def stats(self):
+        with self.lock:
+            hits = self.memory_hits + self.disk_hits
+            total = hits + self.misses
+            return {'hits': hits, 'memory_hits': self.memory_hits, 'disk_hits': self.disk_hits, 'misses': self.misses,
+                    'hit_rate': hits / total if total else 0.0, 'entries': len(self.memory)}
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
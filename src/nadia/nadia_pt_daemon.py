@@ -0,0 +1,97 @@
+import hashlib
+import json
+import os
+import socket
+import sys
+import tempfile
+
+# This module is imported by every `nadia -i` that uses the daemon, so it must not import
+# the checker (rply and the grammar are what the daemon saves).
+
+IDLE_TIMEOUT = 600
+REQUEST_TIMEOUT = 30
+# Modules whose code changes the messages of check_proof (the Gentzen proofs of the derived
+# rules and the countermodels of the theorems that are not valid)
+CHECKER_MODULES = ('nadia_pt_fo.py', 'nadia_pt_derived.py', 'nadia_pt_semantics.py', 'nadia_pt_sat.py', 'nadia_pt_models.py')
+
+def socket_path():
+    # The socket depends on the interpreter and on the version of the checker, so that
+    # a daemon started by another installation is never used
+    directory = os.path.dirname(os.path.abspath(__file__))
+    key = '|'.join([sys.executable, directory] + [str(os.stat(os.path.join(directory, name)).st_mtime_ns) for name in CHECKER_MODULES])
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:12]
+    directory = os.environ.get('XDG_RUNTIME_DIR') or tempfile.gettempdir()
+    uid = os.getuid() if hasattr(os, 'getuid') else 0
+    return os.path.join(directory, f'nadia-{uid}-{digest}.sock')
+
+def request_check(input_proof, input_theorem=None, display_theorem=True, display_fitch=True, display_gentzen=True, path=None):
+    '''Sends the proof to the daemon and returns the message of check_proof, or None if
+    the daemon is not available.'''
+    if not hasattr(socket, 'AF_UNIX'):
+        return None
+    body = json.dumps({'proof': input_proof, 'theorem': input_theorem, 'display_theorem': display_theorem,
+                       'display_fitch': display_fitch, 'display_gentzen': display_gentzen}).encode('utf-8')
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+            s.settimeout(REQUEST_TIMEOUT)
+            s.connect(path or socket_path())
+            s.sendall(b'POST /check HTTP/1.1\r\nHost: nadia\r\nConnection: close\r\nContent-Length: %d\r\n\r\n' % len(body) + body)
+            response = b''
+            while True:
+                chunk = s.recv(65536)
+                if not chunk:
+                    break
+                response += chunk
+    except OSError:
+        return None
+    head, _, payload = response.partition(b'\r\n\r\n')
+    if not head.startswith(b'HTTP/1.1 200 '):
+        return None
+    try:
+        return json.loads(payload.decode('utf-8'))['message']
+    except (ValueError, KeyError):
+        return None
+
+def start_daemon():
+    # Starts the daemon in background, detached from the terminal
+    import subprocess
+    package_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join([package_dir] + ([env['PYTHONPATH']] if env.get('PYTHONPATH') else []))
+    try:
+        subprocess.Popen([sys.executable, '-m', 'nadia', 'daemon'], stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                         stderr=subprocess.DEVNULL, cwd=package_dir, env=env, start_new_session=True)
+    except OSError:
+        pass
+
+def check_proof(input_proof, input_theorem=None, display_theorem=True, display_fitch=True, display_gentzen=True):
+    '''Same as nadia_pt_fo.check_proof, but checked by the daemon when it is running. If it
+    is not, the daemon is started for the next calls and the proof is checked here.'''
+    message = request_check(input_proof, input_theorem, display_theorem, display_fitch, display_gentzen)
+    if message is None:
+        start_daemon()
+        from nadia.nadia_pt_fo import check_proof
+        message = check_proof(input_proof, input_theorem=input_theorem, display_theorem=display_theorem,
+                              display_fitch=display_fitch, display_gentzen=display_gentzen)
+    return message
+
+def run_daemon(path=None, workers=2, idle_timeout=IDLE_TIMEOUT):
+    import asyncio
+    import fcntl
+    from nadia.nadia_pt_server import ProofServer
+    path = path or socket_path()
+    # Only one daemon may listen on the socket, even if many calls start it at once
+    lock = open(path + '.lock', 'w')
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        return
+    try:
+        server = ProofServer(workers=workers)
+        asyncio.run(server.serve(unix_socket=path, idle_timeout=idle_timeout))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+        lock.close()
@@ -0,0 +1,167 @@
+import copy
+from functools import lru_cache
+from nadia.nadia_pt_fo import AtomFormula, NegationFormula, BinaryFormula, ModusTollensDef, DoubleNegationDef, ExcludedMiddleDef
+from nadia.nadia_pt_session import ProofSession
+
+# Templates of the derived rules: proofs in the primitive rules with the atoms A and B in
+# place of any formulas. The premisses are the references of the rule, in order, and the
+# last line is its conclusion. Each line is (formula, rule, references), ('{', hypothesis)
+# or ('}',).
+DERIVED_TEMPLATES = {
+    # A->B, ~B |- ~A
+    'mt': (('A->B', 'pre', ()), ('~B', 'pre', ()),
+           ('{', 'A'), ('B', '->e', (3, 1)), ('@', '~e', (4, 2)), ('}',),
+           ('~A', '~i', (3, 5))),
+    # A |- ~~A
+    'dni': (('A', 'pre', ()),
+            ('{', '~A'), ('@', '~e', (1, 2)), ('}',),
+            ('~~A', '~i', (2, 3))),
+    # ~~A |- A
+    'dne': (('~~A', 'pre', ()),
+            ('{', '~A'), ('@', '~e', (2, 1)), ('}',),
+            ('A', 'raa', (2, 3))),
+    # |- A|~A
+    'lem': (('{', '~(A|~A)'),
+            ('{', 'A'), ('A|~A', '|i', (2,)), ('@', '~e', (3, 1)), ('}',),
+            ('~A', '~i', (2, 4)), ('A|~A', '|i', (5,)), ('@', '~e', (6, 1)), ('}',),
+            ('A|~A', 'raa', (1, 7))),
+}
+
+DERIVED_RULES = (ModusTollensDef, DoubleNegationDef, ExcludedMiddleDef)
+
+@lru_cache(maxsize=None)
+def derived_template(name):
+    '''Checks the template of a derived rule (once) and returns its symbol table, the lines
+    of its premisses and the line of its conclusion.'''
+    session = ProofSession()
+    errors = []
+    premisses = []
+    for step in DERIVED_TEMPLATES[name]:
+        if step[0] == '{':
+            errors += session.open_box(hyp=step[1])
+        elif step[0] == '}':
+            errors += session.close_box()
+        else:
+            if step[1] == 'pre':
+                premisses.append(session.next_line)
+            errors += session.add_line(*step)
+    if errors or session.depth or session.state.pending:
+        raise ValueError('O modelo da regra derivada {} não está correto.'.format(name))
+    return session.state.table, tuple(premisses), session.next_line - 1
+
+def instantiate(formula, mapping):
+    # The formula of a template with its atoms replaced by the formulas of the mapping
+    if isinstance(formula, AtomFormula):
+        return mapping.get(formula.key, formula)
+    if isinstance(formula, NegationFormula):
+        return NegationFormula(instantiate(formula.formula, mapping))
+    left, right = instantiate(formula.left, mapping), instantiate(formula.right, mapping)
+    if type(formula) is BinaryFormula:
+        return BinaryFormula(formula.key, left, right)
+    return type(formula)(left, right)
+
+class TemplateHypotheses():
+    # Numbers of the hypotheses of a template in the Gentzen proof, numbered after the
+    # ones of the proof (the lines of the template and of the proof are not the same)
+    def __init__(self, hypothesis, key):
+        self.hypothesis = hypothesis
+        self.key = key
+
+    def __len__(self):
+        return len(self.hypothesis)
+
+    def __contains__(self, line):
+        return (self.key, line) in self.hypothesis
+
+    def __getitem__(self, line):
+        return self.hypothesis[(self.key, line)]
+
+    def __setitem__(self, line, number):
+        self.hypothesis[(self.key, line)] = number
+
+class ReferencedProof():
+    # A premisse of a template: the Gentzen proof of the line referenced by the rule
+    def __init__(self, context, line):
+        self.context = context
+        self.line = line
+
+    def toLatex(self, context):
+        return self.context.symbol_table.get_rule(self.line).toLatex(self.context)
+
+class TemplateContext():
+    # Context of the Gentzen proof of an instance of a template inside a proof: its symbol
+    # table returns the rules of the template with the formulas of the instance
+    def __init__(self, context, table, mapping, premisses):
+        self.context = context
+        self.table = table
+        self.mapping = mapping
+        self.premisses = premisses
+        self.symbol_table = self
+        self.hypothesis = TemplateHypotheses(context.hypothesis, self)
+
+    def get_rule(self, line):
+        if line in self.premisses:
+            return ReferencedProof(self.context, self.premisses[line])
+        rule = copy.copy(self.table.get_rule(line))
+        rule.formula = instantiate(rule.formula, self.mapping)
+        return rule
+
+def expand_latex(rule, context):
+    '''Gentzen proof (Latex) of a line of a derived rule, expanded into the primitive rules.'''
+    name, mapping, references = rule.template(context.symbol_table)
+    table, premisses, conclusion = derived_template(name)
+    template_context = TemplateContext(context, table, mapping, dict(zip(premisses, references)))
+    return template_context.get_rule(conclusion).toLatex(template_context)
+
+def expand_derived_rules(input_proof):
+    '''Returns the proof with each line of a derived rule (mt, dn and lem) replaced by the
+    lines of its template, in the primitive rules, pbc replaced by raa and the lines
+    renumbered (e.g. to show the Fitch proof in the primitive rules). Raises ValueError if
+    a line of a derived rule is not correct.'''
+    from nadia.nadia_pt_repair import parse_steps
+    session = ProofSession()
+    numbers = {}
+    for step in parse_steps(input_proof):
+        if step[0] == 'box':
+            numbers[step[1]] = session.next_line
+            session.open_box(step[2], step[3])
+        elif step[0] == 'close':
+            session.close_box()
+        else:
+            kind, number, formula, rule, references = step
+            if rule == 'pbc':
+                rule = 'raa'
+            references = tuple(numbers.get(reference, reference) for reference in references)
+            line = session.next_line
+            errors = session.add_line(formula, rule, references)
+            new_rule = session.state.table.get_rule(line)
+            if isinstance(new_rule, DERIVED_RULES):
+                if errors:
+                    raise ValueError('A linha {} da regra {} não está correta.'.format(number, rule))
+                session.rollback(session.state.history.get(line))
+                line = expand_template(session, new_rule)
+            numbers[number] = line
+    return session.text()
+
+def expand_template(session, rule):
+    # Adds the lines of the template of the rule and returns the line of its conclusion
+    name, mapping, references = rule.template(session.state.table)
+    # Line of the template -> line of the proof
+    lines = {}
+    premisses = iter(references)
+    number = 0
+    for step in DERIVED_TEMPLATES[name]:
+        if step[0] == '}':
+            session.close_box()
+            continue
+        number += 1
+        if step[0] == '{':
+            lines[number] = session.next_line
+            session.open_box(hyp=instantiate(session.parse_formula(step[1])[2], mapping))
+        elif step[1] == 'pre':
+            lines[number] = next(premisses)
+        else:
+            lines[number] = session.next_line
+            formula = instantiate(session.parse_formula(step[0])[2], mapping)
+            session.add_line(formula, step[1], tuple(lines[reference] for reference in step[2]))
+    return session.next_line - 1
@@ -379,6 +379,13 @@ class Lexer():
         self.lexer.add('BOTTOM_ELIM', r'@e')
         self.lexer.add('COPY', r'copie')
 
+        # Derived rules (not followed by a letter or digit, so as not to take a variable; see
+        # derived_rule_names for the names of variables)
+        self.lexer.add('MODUS_TOLLENS', r'mt(?![a-z0-9])')
+        self.lexer.add('DOUBLE_NEGATION', r'dn(?![a-z0-9])')
+        self.lexer.add('EXCLUDED_MIDDLE', r'lem(?![a-z0-9])')
+        self.lexer.add('PBC', r'pbc(?![a-z0-9])')
+
         # Connectives
         self.lexer.add('BOTTOM', r'@')
         self.lexer.add('NOT', r'~')
@@ -431,7 +438,31 @@ class Lexer():
 
     def get_lexer(self):
         self._add_tokens()
-        return self.lexer.build()
+        return ProofLexer(self.lexer.build())
+
+# Tokens of the derived rules, whose names are also valid names of variables
+DERIVED_RULE_TOKENS = ('MODUS_TOLLENS', 'DOUBLE_NEGATION', 'EXCLUDED_MIDDLE', 'PBC')
+# Tokens after which a name is a variable (of a predicate or of a box)
+VARIABLE_CONTEXT = ('OPEN_PAREN', 'COMMA', 'OPEN_BRACKET')
+
+def derived_rule_names(tokens):
+    # The names of the derived rules are justifications only after a formula: first, after
+    # (, a comma or { they are variables (e.g. P(dn) and { mt)
+    previous = None
+    for token in tokens:
+        if token.name in DERIVED_RULE_TOKENS and (previous is None or previous.name in VARIABLE_CONTEXT):
+            token = rply.Token('VAR', token.value, token.source_pos)
+        previous = token
+        yield token
+
+class ProofLexer():
+    # The lexer built by rply, with the names of the derived rules taken as variables where
+    # a justification is not expected
+    def __init__(self, lexer):
+        self.lexer = lexer
+
+    def lex(self, text):
+        return derived_rule_names(self.lexer.lex(text))
 
 
 ## File symbol_table.py
@@ -450,16 +481,13 @@ class SymbolTable:
       return r
 
     def find_token(self, line):
-      for i in range(len(self.symbol_table)):
-        for j in range(len(self.symbol_table['scope_{}'.format(i)]['rules'])):
-          if (self.symbol_table['scope_{}'.format(i)]['rules'][j].line==line):
-            return self.symbol_table['scope_{}'.format(i)]['lines'][j]
-      return None
+      entry = self.rule_index.get(line)
+      return entry[3] if entry is not None else None
 
 
     def check_is_visible(self, formula1_line, formula2_line):
       #Find formula1_line scope.
-      if (int(formula1_line) <= int(formula2_line)): return False
+      if (formula1_line <= formula2_line): return False
       current_scope = None
       for i in range(len(self.symbol_table)):
         for rule in self.symbol_table['scope_{}'.format(i)]['rules']:
@@ -476,16 +504,13 @@ class SymbolTable:
       return False
 
     def find_scope(self, line):
-        for key, scope in self.symbol_table.items():
-            for rule in scope['rules']:
-                if rule and (rule.line == line):
-                    return key 
+        entry = self.rule_index.get(line)
+        if entry is not None:
+            return entry[4]
         #Verifica se a linha não tem fórmula (introdução do universal)
-        for key, scope in self.symbol_table.items():
-          if(int(scope['start_line'])==int(line)):
-            return key
-
-        return None
+        scopes = self.scope_starts.get(line)
+        # The box of the line, not the proof (scope_0 also starts at the line 1)
+        return scopes[-1] if scopes else None
 
     # Returns True if the scope variable of the line is a fresh variable, i.e., it did not occur before this scope. 
     def is_fresh_variable(self, line):
@@ -500,11 +525,11 @@ class SymbolTable:
       scope = self.symbol_table[scope]['parent'] if scope in self.symbol_table else None
       while scope != None:
           for rule in self.symbol_table[scope]['rules']:
-            if (int(rule.line) < int(line)):
+            if (rule.line < line):
               free_variables = free_variables.union(rule.formula.free_variables())
-            #Adds the variable for the universal introduction rule, i.e., if the line does not have a formula
-            if (int(self.symbol_table[scope]['start_line'])<int(line) and self.symbol_table[scope]['variable']):
-              free_variables = free_variables.union(set(self.symbol_table[scope]['variable']))
+          #Adds the variable for the universal introduction rule, i.e., if the line does not have a formula
+          if (self.symbol_table[scope]['start_line']<line and self.symbol_table[scope]['variable']):
+            free_variables = free_variables.union(set(self.symbol_table[scope]['variable']))
           scope = self.symbol_table[scope]['parent']
       return free_variables
 
@@ -521,7 +546,7 @@ class SymbolTable:
       #Check if formula2_line in formula1_line scope 
       while current_scope != None:
         for rule in current_scope['rules']:
-          if rule and (int(rule.line) < int(formula1_line)):
+          if rule and (rule.line < formula1_line):
             lines.append(rule.line)
         current_scope = self.symbol_table[current_scope['parent']] if current_scope['parent'] else None
       return lines
@@ -565,12 +590,18 @@ class SymbolTable:
         self.line_visible_lines = {}
         n = self.len_symbol_table()
         for i in range(1,n):
-          self.line_visible_lines[str(i)] = self.get_visible_lines(str(i))
+          self.line_visible_lines[i] = self.get_visible_lines(i)
 
 
 
     def __init__(self):
         self.line_visible_lines = {}
+        # Source tokens of the references of each line (side table, the rules keep only the line numbers).
+        self.reference_tokens = {}
+        # Scope, position, rule, token and scope name of each line, so that the rules are found without
+        # searching the scopes. The lines inserted more than once are searched as before.
+        self.rule_index = {}
+        self.repeated_lines = set()
         self.symbol_table = {
             'scope_0': {
                 'name': 'scope_0',
@@ -578,15 +609,29 @@ class SymbolTable:
                 'rules': [],
                 'lines': [],
                 'variable': None,
-                'start_line': '1', #Robson Não estava presente
-                'end_line': '1'
+                'start_line': 1, #Robson Não estava presente
+                'end_line': 1
             }
         }
         self.current_scope = 'scope_0'
-
-    def insert(self, symbol, line):
-        self.symbol_table[self.current_scope]['rules'].append(symbol)
+        # Scopes by their start line, in the order they were created
+        self.scope_starts = {1: ['scope_0']}
+
+    def insert(self, symbol, line, references=()):
+        rules = self.symbol_table[self.current_scope]['rules']
+        # A repeated line is found in the first scope, as if the scopes were searched in order
+        position = (int(self.current_scope[len('scope_'):]), len(rules))
+        entry = self.rule_index.get(symbol.line)
+        if entry is not None:
+            self.repeated_lines.add(symbol.line)
+        if entry is None or position < entry[:2]:
+            self.rule_index[symbol.line] = position + (symbol, line, self.current_scope)
+        rules.append(symbol)
         self.symbol_table[self.current_scope]['lines'].append(line)
+        self.reference_tokens[symbol.line] = references
+
+    def find_reference_token(self, line, reference):
+        return self.reference_tokens[line][reference-1]
 
     def start_scope(self, scope):
         self.current_scope = scope
@@ -607,6 +652,7 @@ class SymbolTable:
             'start_line': start_line,
             'end_line': start_line#Robson, não ser start_line        
             }
+        self.scope_starts.setdefault(start_line, []).append(scope)
         self.start_scope(scope)
 
 #    def find_scope(self, line):
@@ -628,11 +674,6 @@ class SymbolTable:
         scope = self.find_scope(line)
         if scope != None:
           return self.symbol_table[scope]['variable']
-        #Verifica se a linha não tem fórmula (introdução do universal)
-        for key, scope in self.symbol_table.items():
-          if(int(scope['start_line'])==int(line)):
-#            print("find_scope_variable(self, line)",scope['variable'])
-            return scope['variable']          
         return None
 
     def check_scope_is_valid(self, scope):
@@ -645,15 +686,26 @@ class SymbolTable:
 
     def lookup_formula_by_line(self, symbol_line, line):
         scope = self.find_scope(symbol_line)
+        if line in self.repeated_lines:
+            while scope != None:
+                for rule in self.symbol_table[scope]['rules']:
+                    if rule.line == line:
+                        return rule.formula
+                scope = self.symbol_table[scope]['parent']
+            return None
+        # The line is in a single scope, which must enclose the symbol line
+        entry = self.rule_index.get(line)
+        if entry is None:
+            return None
         while scope != None:
-            for rule in self.symbol_table[scope]['rules']:
-                if rule.line == line:
-                    return rule.formula
+            if scope == entry[4]:
+                return entry[2].formula
             scope = self.symbol_table[scope]['parent']
         return None
 
     def check_scope_delimiter(self, line1, line2):
-        for key, scope in self.symbol_table.items():
+        for key in self.scope_starts.get(line1, ()):
+            scope = self.symbol_table[key]
             if key != 'scope_0':
                 if(scope['start_line'] == line1 and scope['end_line'] == line2):
                     start_rule = scope['rules'][0].formula if scope['rules'][0] is not None else None
@@ -687,17 +739,14 @@ class SymbolTable:
         return self.symbol_table[self.current_scope]['rules'][-1]
 
     def get_rule(self, rule_line):
-        for key, scope in self.symbol_table.items():
-            for key, line in enumerate(scope['lines']):
-                if line.value == rule_line:
-                    return scope['rules'][key]
-        return None
+        entry = self.rule_index.get(rule_line)
+        return entry[2] if entry is not None else None
 
     def count_formulas_by_end_box(self, line):
         for key, scope in self.symbol_table.items():
             if key != 'scope_0':
                 if(scope['end_line'] == line):
-                    return (line - int(scope['start_line']))
+                    return (line - scope['start_line'])
         return 0
 
 ## dados_json.py
@@ -707,12 +756,35 @@ class natural_deduction_return:
     def __init__(self):
         self.premisses = []
         self.conclusion = None
-        self.gentzen = ""
         self.fitch = ""
         self.errors = []
-
-    def add_error(self, error):
+        self.error_codes = []
+        self._gentzen = ""
+        # Last rule and context of a correct proof: the Gentzen proof is only built when it
+        # is read (e.g. not when check_proof does not display it)
+        self.gentzen_rule = None
+        self.gentzen_context = None
+
+    @property
+    def gentzen(self):
+        if self.gentzen_rule is not None:
+            try:
+                self._gentzen = '\\[' + self.gentzen_rule.toLatex(self.gentzen_context) + '\\]\n'
+            except RecursionError:
+                self._gentzen = 'A demonstração é muito profunda para gerar o código no estilo Gentzen.\n'
+            self.gentzen_rule = None
+            self.gentzen_context = None
+        return self._gentzen
+
+    @gentzen.setter
+    def gentzen(self, gentzen):
+        self._gentzen = gentzen
+        self.gentzen_rule = None
+        self.gentzen_context = None
+
+    def add_error(self, error, code=None):
         self.errors.append(error)
+        self.error_codes.append(code)
 
  #   def to_json(self):
  #       result = {
@@ -769,35 +841,44 @@ class constants:
   BOX_MUST_HAVE_ONLY_A_VARIABLE = 41
   INVALID_RULE = 42
   INVALID_RULE_ONE_REFERENCE = 43
+  SYNTAX_ERROR = 44
+  SCOPE_NOT_FOUND = 45
 
 
 ## File ast.py
-hypothesis = {}
 
-def limpaHipotese():
-    global hypothesis
-    hypothesis = {}
+class CheckContext():
+    # State of a single proof check, passed explicitly to the rules so that
+    # proofs can be checked concurrently.
+    def __init__(self, symbol_table):
+        self.symbol_table = symbol_table
+        self.deduction_result = natural_deduction_return()
+        # Numbers of the hypotheses discharged in the Gentzen proof
+        self.hypothesis = {}
 
 
 class PremisseDef():
+    __slots__ = ('line', 'formula')
+    is_copied = False
+
     def __init__(self,line, formula):
         self.line = line
         self.formula = formula
-        self.is_copied = False
 
     def evaluation(self,parser,deduction_result):
         return
 
-    def toLatex(self, symbol_table):
+    def toLatex(self, context):
         latex = '{'+self.formula.toLatex()+'}'
         return latex
 
 class HypothesisDef():
+    __slots__ = ('line', 'formula')
+    is_copied = False
+
     def __init__(self,line, formula):
         self.line = line
         self.formula = formula
-        self.copied = None
-        self.is_copied = False
 
     def evaluation(self,parser,deduction_result):
         return
@@ -808,20 +889,20 @@ class HypothesisDef():
 #            return (constants.HYPOTHESIS_WITHOUT_CLOSED_BOX,formula_reference)
 #        return (constants.SUCCESS, None)
 
-    def toLatex(self, symbol_table):
-        line = self.copied if self.copied else self.line
-        if line not in hypothesis:
-            hypothesis[line] = str(len(hypothesis) + 1)
-        latex = '\\big['+self.formula.toLatex()+'\\big]^{_{'+hypothesis[line]+'}}'
+    def toLatex(self, context):
+        if self.line not in context.hypothesis:
+            context.hypothesis[self.line] = str(len(context.hypothesis) + 1)
+        latex = '\\big['+self.formula.toLatex()+'\\big]^{_{'+context.hypothesis[self.line]+'}}'
         return latex
 
 class HypothesisFirstOrderDef():
+    __slots__ = ('line', 'formula', 'variable')
+    is_copied = False
+
     def __init__(self,line, var, formula):
         self.line = line
         self.formula = formula
         self.variable = var
-        self.copied = None
-        self.is_copied = False
 
     def evaluation(self,parser,deduction_result):
       return
@@ -832,20 +913,21 @@ class HypothesisFirstOrderDef():
 #            return (constants.HYPOTHESIS_WITHOUT_CLOSED_BOX,formula_reference)
 #        return (constants.SUCCESS, None)
 
-    def toLatex(self, symbol_table):
-        line = self.copied if self.copied else self.line
-        if line not in hypothesis:
-            hypothesis[line] = str(len(hypothesis) + 1)
-        latex = '\\big['+self.formula.toLatex()+'\\big]^{_{'+hypothesis[line]+'}}'
+    def toLatex(self, context):
+        if self.line not in context.hypothesis:
+            context.hypothesis[self.line] = str(len(context.hypothesis) + 1)
+        latex = '\\big['+self.formula.toLatex()+'\\big]^{_{'+context.hypothesis[self.line]+'}}'
         return latex
 
 class ImplicationEliminationDef():
+    __slots__ = ('line', 'formula', 'reference1', 'reference2')
+    is_copied = False
+
     def __init__(self,line, formula, reference1, reference2):
         self.line = line
         self.formula = formula
         self.reference1 = reference1
         self.reference2 = reference2
-        self.is_copied = False
 
     def evaluation(self,parser,deduction_result):
       # If the references lines occur before the rule line 
@@ -855,26 +937,28 @@ class ImplicationEliminationDef():
         parser.check_line_scope_reference_error(deduction_result,self, reference1=True, reference2=True)      
 
       formula_reference = parser.symbol_table.find_token(self.line)
-      formula1 = parser.symbol_table.lookup_formula_by_line(self.line, self.reference1.value)
-      formula2 = parser.symbol_table.lookup_formula_by_line(self.line, self.reference2.value)
+      formula1 = parser.symbol_table.lookup_formula_by_line(self.line, self.reference1)
+      formula2 = parser.symbol_table.lookup_formula_by_line(self.line, self.reference2)
       if(formula1==None or formula2==None or formula_reference==None):
         return
 
       if(BinaryFormula(key='->', left = formula1, right=self.formula) != formula2
       and BinaryFormula(key='->', left = formula2, right=self.formula) != formula1):
-          deduction_result.add_error(parser.get_error(constants.INVALID_RESULT, self.reference1, self))
+          deduction_result.add_error(parser.get_error(constants.INVALID_RESULT, parser.symbol_table.find_reference_token(self.line, 1), self), constants.INVALID_RESULT)
 
-    def toLatex(self, symbol_table):
-        latex = '\\infer[\\!\\!{\\rightarrow\\text{e}}]{'+self.formula.toLatex()+'}{{'+symbol_table.get_rule(self.reference1.value).toLatex(symbol_table)+'}&{'+symbol_table.get_rule(self.reference2.value).toLatex(symbol_table)+'}}'
+    def toLatex(self, context):
+        latex = '\\infer[\\!\\!{\\rightarrow\\text{e}}]{'+self.formula.toLatex()+'}{{'+context.symbol_table.get_rule(self.reference1).toLatex(context)+'}&{'+context.symbol_table.get_rule(self.reference2).toLatex(context)+'}}'
         return latex
 
 class ImplicationIntroductionDef():
+    __slots__ = ('line', 'formula', 'reference1', 'reference2')
+    is_copied = False
+
     def __init__(self,line, formula, reference1, reference2):
         self.line = line
         self.formula = formula
         self.reference1 = reference1
         self.reference2 = reference2
-        self.is_copied = False
 
     def evaluation(self,parser,deduction_result):
       # If the references lines occur before the rule line 
@@ -883,37 +967,39 @@ class ImplicationIntroductionDef():
       valid_box = parser.check_scope_reference_error(deduction_result,self)
 
       formula_reference = parser.symbol_table.find_token(self.line)
-      formula1, formula2 = parser.symbol_table.check_scope_delimiter(self.reference1.value, self.reference2.value)
+      formula1, formula2 = parser.symbol_table.check_scope_delimiter(self.reference1, self.reference2)
       if(formula1==None or formula2==None or formula_reference==None):
         return
 
       # If the formula is not an implicaton formula
       if(not isinstance(self.formula, BinaryFormula) or (isinstance(self.formula, BinaryFormula) and not self.formula.is_implication())):
           parser.has_error = True
-          deduction_result.add_error(parser.get_error(constants.INVALID_RESULT, formula_reference, self))
+          deduction_result.add_error(parser.get_error(constants.INVALID_RESULT, formula_reference, self), constants.INVALID_RESULT)
       else:
           # If the hypothese (reference1) is the left formula of the conclusion
           if(self.formula.left != formula1):
               parser.has_error = True
-              deduction_result.add_error(parser.get_error(constants.INVALID_HYPOTHESIS, self.reference1, self))
+              deduction_result.add_error(parser.get_error(constants.INVALID_HYPOTHESIS, parser.symbol_table.find_reference_token(self.line, 1), self), constants.INVALID_HYPOTHESIS)
           # If the conclusion of the box (reference2) is the right formula of the conclusion
           if(self.formula.right != formula2):
               parser.has_error = True
-              deduction_result.add_error(parser.get_error(constants.INVALID_BOX_RESULT, self.reference2, self))
+              deduction_result.add_error(parser.get_error(constants.INVALID_BOX_RESULT, parser.symbol_table.find_reference_token(self.line, 2), self), constants.INVALID_BOX_RESULT)
 
 
-    def toLatex(self, symbol_table):
-        hypothesis_number = str(len(hypothesis) + 1)
-        hypothesis[self.reference1.value] = hypothesis_number
-        latex = '\\infer[\\!\\!{\\rightarrow\\text{i}^{_'+ hypothesis_number +'}}]{'+self.formula.toLatex()+'}{'+symbol_table.get_rule(self.reference2.value).toLatex(symbol_table)+'}'
+    def toLatex(self, context):
+        hypothesis_number = str(len(context.hypothesis) + 1)
+        context.hypothesis[self.reference1] = hypothesis_number
+        latex = '\\infer[\\!\\!{\\rightarrow\\text{i}^{_'+ hypothesis_number +'}}]{'+self.formula.toLatex()+'}{'+context.symbol_table.get_rule(self.reference2).toLatex(context)+'}'
         return latex
 
 class DisjunctionIntroductionDef():
+    __slots__ = ('line', 'formula', 'reference1')
+    is_copied = False
+
     def __init__(self, line, formula, reference1):
         self.line = line
         self.formula = formula
         self.reference1 = reference1
-        self.is_copied = False
 
     def evaluation(self,parser,deduction_result):
       # If the references lines occur before the rule line 
@@ -923,31 +1009,33 @@ class DisjunctionIntroductionDef():
         parser.check_line_scope_reference_error(deduction_result,self, reference1=True)      
 
       formula_reference = parser.symbol_table.find_token(self.line)
-      formula1 = parser.symbol_table.lookup_formula_by_line(self.line, self.reference1.value)
+      formula1 = parser.symbol_table.lookup_formula_by_line(self.line, self.reference1)
       if(formula1==None):
         return
 
       # If the formula (reference 1) is not a disjunction formula
       if(not isinstance(self.formula, BinaryFormula) or (isinstance(self.formula, BinaryFormula) and not self.formula.is_disjunction())):
           parser.has_error = True
-          deduction_result.add_error(parser.get_error(constants.IS_NOT_DISJUNCTION, formula_reference, self))
+          deduction_result.add_error(parser.get_error(constants.IS_NOT_DISJUNCTION, formula_reference, self), constants.IS_NOT_DISJUNCTION)
       else:
           # If the left formula of conclusion (the conjunction) is one of the references 
           if(not (self.formula.left == formula1 or self.formula.right == formula1)):
               parser.has_error = True
-              deduction_result.add_error(parser.get_error(constants.INVALID_LEFT_OR_RIGHT_DISJUNCTION, self.reference1, self))
+              deduction_result.add_error(parser.get_error(constants.INVALID_LEFT_OR_RIGHT_DISJUNCTION, parser.symbol_table.find_reference_token(self.line, 1), self), constants.INVALID_LEFT_OR_RIGHT_DISJUNCTION)
 
-    def toLatex(self, symbol_table):
-        latex = '\\infer[\\!\\!{\\lor\\text{i}}]{'+self.formula.toLatex()+'}{'+symbol_table.get_rule(self.reference1.value).toLatex(symbol_table)+'}'
+    def toLatex(self, context):
+        latex = '\\infer[\\!\\!{\\lor\\text{i}}]{'+self.formula.toLatex()+'}{'+context.symbol_table.get_rule(self.reference1).toLatex(context)+'}'
         return latex
         
 class AndIntroductionDef():
+    __slots__ = ('line', 'formula', 'reference1', 'reference2')
+    is_copied = False
+
     def __init__(self,line, formula, reference1, reference2):
         self.line = line
         self.formula = formula
         self.reference1 = reference1
         self.reference2 = reference2
-        self.is_copied = False
 
     def evaluation(self,parser,deduction_result):
       # If the references lines occur before the rule line 
@@ -957,35 +1045,37 @@ class AndIntroductionDef():
         parser.check_line_scope_reference_error(deduction_result,self, reference1=True, reference2=True)      
 
       formula_reference = parser.symbol_table.find_token(self.line)
-      formula1 = parser.symbol_table.lookup_formula_by_line(self.line, self.reference1.value)
-      formula2 = parser.symbol_table.lookup_formula_by_line(self.line, self.reference2.value)
+      formula1 = parser.symbol_table.lookup_formula_by_line(self.line, self.reference1)
+      formula2 = parser.symbol_table.lookup_formula_by_line(self.line, self.reference2)
       if(formula1==None or formula2==None or formula_reference==None):
         return
 
       # If the formula (reference 1) is not a conjunction formula
       if(not isinstance(self.formula, BinaryFormula) or (isinstance(self.formula, BinaryFormula) and not self.formula.is_conjunction())):
           parser.has_error = True
-          deduction_result.add_error(parser.get_error(constants.IS_NOT_CONJUNCTION, self.reference1, self))
+          deduction_result.add_error(parser.get_error(constants.IS_NOT_CONJUNCTION, parser.symbol_table.find_reference_token(self.line, 1), self), constants.IS_NOT_CONJUNCTION)
       else:
           # If the left formula of conclusion (the conjunction) is one of the references 
           if(not (self.formula.left == formula1 or self.formula.left == formula2)):
               parser.has_error = True
-              deduction_result.add_error(parser.get_error(constants.INVALID_LEFT_CONJUNCTION, formula_reference, self))
+              deduction_result.add_error(parser.get_error(constants.INVALID_LEFT_CONJUNCTION, formula_reference, self), constants.INVALID_LEFT_CONJUNCTION)
           # If the right formula of conclusion (the conjunction) is one of the references 
           if(not (self.formula.right == formula1 or self.formula.right == formula2)):
               parser.has_error = True
-              deduction_result.add_error(parser.get_error(constants.INVALID_RIGHT_CONJUNCTION, formula_reference, self))
+              deduction_result.add_error(parser.get_error(constants.INVALID_RIGHT_CONJUNCTION, formula_reference, self), constants.INVALID_RIGHT_CONJUNCTION)
 
-    def toLatex(self, symbol_table):
-        latex = '\\infer[\\!\\!{\\land\\text{i}}]{'+self.formula.toLatex()+'}{{'+symbol_table.get_rule(self.reference1.value).toLatex(symbol_table)+'}&{'+symbol_table.get_rule(self.reference2.value).toLatex(symbol_table)+'}}'
+    def toLatex(self, context):
+        latex = '\\infer[\\!\\!{\\land\\text{i}}]{'+self.formula.toLatex()+'}{{'+context.symbol_table.get_rule(self.reference1).toLatex(context)+'}&{'+context.symbol_table.get_rule(self.reference2).toLatex(context)+'}}'
         return latex
 
 class AndEliminationDef():
+    __slots__ = ('line', 'formula', 'reference1')
+    is_copied = False
+
     def __init__(self, line, formula, reference1):
         self.line = line
         self.formula = formula
         self.reference1 = reference1
-        self.is_copied = False
 
     def evaluation(self,parser,deduction_result):
       # If the references lines occur before the rule line 
@@ -995,25 +1085,28 @@ class AndEliminationDef():
         parser.check_line_scope_reference_error(deduction_result,self, reference1=True)      
 
       formula_reference = parser.symbol_table.find_token(self.line)
-      formula1 = parser.symbol_table.lookup_formula_by_line(self.line, self.reference1.value)
+      formula1 = parser.symbol_table.lookup_formula_by_line(self.line, self.reference1)
       if(formula1==None):
         return
 
       # If the formula (reference 1) is not a conjunction formula
       if(not isinstance(formula1, BinaryFormula) or (isinstance(formula1, BinaryFormula) and not formula1.is_conjunction())):
           parser.has_error = True
-          deduction_result.add_error(parser.get_error(constants.IS_NOT_CONJUNCTION, formula_reference, self))
+          deduction_result.add_error(parser.get_error(constants.IS_NOT_CONJUNCTION, formula_reference, self), constants.IS_NOT_CONJUNCTION)
       else:
           # If the left formula of conclusion (the conjunction) is one of the references 
           if(not (formula1.left == self.formula or formula1.right == self.formula)):
               parser.has_error = True
-              deduction_result.add_error(parser.get_error(constants.INVALID_LEFT_OR_RIGHT_CONJUNCTION, self.reference1, self))
+              deduction_result.add_error(parser.get_error(constants.INVALID_LEFT_OR_RIGHT_CONJUNCTION, parser.symbol_table.find_reference_token(self.line, 1), self), constants.INVALID_LEFT_OR_RIGHT_CONJUNCTION)
 
-    def toLatex(self, symbol_table):
-        latex = '\\infer[\\!\\!{\\land\\text{e}}]{'+self.formula.toLatex()+'}{'+symbol_table.get_rule(self.reference1.value).toLatex(symbol_table)+'}'
+    def toLatex(self, context):
+        latex = '\\infer[\\!\\!{\\land\\text{e}}]{'+self.formula.toLatex()+'}{'+context.symbol_table.get_rule(self.reference1).toLatex(context)+'}'
         return latex
 
 class DisjunctionEliminationDef():
+    __slots__ = ('line', 'formula', 'reference1', 'reference2', 'reference3', 'reference4', 'reference5')
+    is_copied = False
+
     def __init__(self,line, formula, reference1, reference2, reference3, reference4, reference5):
         self.line = line
         self.formula = formula
@@ -1022,7 +1115,6 @@ class DisjunctionEliminationDef():
         self.reference3 = reference3
         self.reference4 = reference4
         self.reference5 = reference5
-        self.is_copied = False
 
     def evaluation(self,parser,deduction_result):
       # If the references lines occur before the rule line 
@@ -1034,51 +1126,53 @@ class DisjunctionEliminationDef():
         parser.check_line_scope_reference_error(deduction_result,self, reference1=True)      
 
       formula_reference = parser.symbol_table.find_token(self.line)
-      formula1 = parser.symbol_table.lookup_formula_by_line(self.line, self.reference1.value)
+      formula1 = parser.symbol_table.lookup_formula_by_line(self.line, self.reference1)
       if(formula1==None):
         return
-      formula2, formula3 = parser.symbol_table.check_scope_delimiter(self.reference2.value, self.reference3.value)
-      formula4, formula5 = parser.symbol_table.check_scope_delimiter(self.reference4.value, self.reference5.value)
+      formula2, formula3 = parser.symbol_table.check_scope_delimiter(self.reference2, self.reference3)
+      formula4, formula5 = parser.symbol_table.check_scope_delimiter(self.reference4, self.reference5)
       if(formula1==None or formula2==None or formula3==None or formula4==None or formula_reference==None):
         return
 
       # If the formula (reference 1) is not a disjunction formula
       if(not isinstance(formula1, BinaryFormula) or (isinstance(formula1, BinaryFormula) and not formula1.is_disjunction())):
           parser.has_error = True
-          deduction_result.add_error(parser.get_error(constants.IS_NOT_DISJUNCTION, self.reference1, self))
+          deduction_result.add_error(parser.get_error(constants.IS_NOT_DISJUNCTION, parser.symbol_table.find_reference_token(self.line, 1), self), constants.IS_NOT_DISJUNCTION)
       else:
           # If the hypothese (reference1) is the left formula of the disjunction formula
           if(formula1.left != formula2):
               parser.has_error = True
-              deduction_result.add_error(parser.get_error(constants.INVALID_HYPOTHESIS, self.reference2, self))
+              deduction_result.add_error(parser.get_error(constants.INVALID_HYPOTHESIS, parser.symbol_table.find_reference_token(self.line, 2), self), constants.INVALID_HYPOTHESIS)
           # If the conclusion of the box (reference2) is the right formula of the conclusion
           if(formula1.right != formula4):
               parser.has_error = True
-              deduction_result.add_error(parser.get_error(constants.INVALID_HYPOTHESIS, self.reference4, self))
+              deduction_result.add_error(parser.get_error(constants.INVALID_HYPOTHESIS, parser.symbol_table.find_reference_token(self.line, 4), self), constants.INVALID_HYPOTHESIS)
           # If the conclusion of the box (reference3) it the same of the conclusion
           if(self.formula != formula3):
               parser.has_error = True
-              deduction_result.add_error(parser.get_error(constants.INVALID_BOX_RESULT, self.reference3, self))
+              deduction_result.add_error(parser.get_error(constants.INVALID_BOX_RESULT, parser.symbol_table.find_reference_token(self.line, 3), self), constants.INVALID_BOX_RESULT)
           # If the conclusion of the box (reference5) it the same of the conclusion
           if(self.formula != formula5):
               parser.has_error = True
-              deduction_result.add_error(parser.get_error(constants.INVALID_BOX_RESULT, self.reference5, self))
-
-    def toLatex(self, symbol_table):
-        hypothesis_number1 = str(len(hypothesis) + 1)
-        hypothesis[self.reference2.value] = hypothesis_number1
-        hypothesis_number2 = str(len(hypothesis) + 1)
-        hypothesis[self.reference4.value] = hypothesis_number2
-        latex = '\\infer[\\!\\!{\\lor\\text{e}^{_{'+ hypothesis_number1 + ', ' + hypothesis_number2 +'} } }]{'+self.formula.toLatex()+'}{{'+symbol_table.get_rule(self.reference1.value).toLatex(symbol_table)+'}&{'+symbol_table.get_rule(self.reference3.value).toLatex(symbol_table)+'}&{'+symbol_table.get_rule(self.reference5.value).toLatex(symbol_table)+'}}'
+              deduction_result.add_error(parser.get_error(constants.INVALID_BOX_RESULT, parser.symbol_table.find_reference_token(self.line, 5), self), constants.INVALID_BOX_RESULT)
+
+    def toLatex(self, context):
+        hypothesis_number1 = str(len(context.hypothesis) + 1)
+        context.hypothesis[self.reference2] = hypothesis_number1
+        hypothesis_number2 = str(len(context.hypothesis) + 1)
+        context.hypothesis[self.reference4] = hypothesis_number2
+        latex = '\\infer[\\!\\!{\\lor\\text{e}^{_{'+ hypothesis_number1 + ', ' + hypothesis_number2 +'} } }]{'+self.formula.toLatex()+'}{{'+context.symbol_table.get_rule(self.reference1).toLatex(context)+'}&{'+context.symbol_table.get_rule(self.reference3).toLatex(context)+'}&{'+context.symbol_table.get_rule(self.reference5).toLatex(context)+'}}'
         return latex
 
 class NegationIntroductionDef():
+    __slots__ = ('line', 'formula', 'reference1', 'reference2')
+    is_copied = False
+
     def __init__(self,line, formula, reference1, reference2):
         self.line = line
         self.formula = formula
         self.reference1 = reference1
         self.reference2 = reference2
-        self.is_copied = False
 
     def evaluation(self,parser,deduction_result):
       # If the references lines occur before the rule line 
@@ -1087,37 +1181,39 @@ class NegationIntroductionDef():
       valid_box = parser.check_scope_reference_error(deduction_result,self)
 
       formula_reference = parser.symbol_table.find_token(self.line)
-      formula1, formula2 = parser.symbol_table.check_scope_delimiter(self.reference1.value, self.reference2.value)
+      formula1, formula2 = parser.symbol_table.check_scope_delimiter(self.reference1, self.reference2)
       if(formula1==None or formula2==None or formula_reference==None):
         return
 
       # If the formula is not a negation formula
       if(not isinstance(self.formula, NegationFormula)):
           parser.has_error = True
-          deduction_result.add_error(parser.get_error(constants.INVALID_RESULT, formula_reference, self))
+          deduction_result.add_error(parser.get_error(constants.INVALID_RESULT, formula_reference, self), constants.INVALID_RESULT)
       else:
           # If the hypothese (reference1) is the left formula of the conclusion
           if(self.formula != NegationFormula(formula1)):
               parser.has_error = True
-              deduction_result.add_error(parser.get_error(constants.INVALID_HYPOTHESIS, self.reference1, self))
+              deduction_result.add_error(parser.get_error(constants.INVALID_HYPOTHESIS, parser.symbol_table.find_reference_token(self.line, 1), self), constants.INVALID_HYPOTHESIS)
           # If the conclusion of the box (reference2) is the @
           if(formula2.toString() != '@'):
               parser.has_error = True
-              deduction_result.add_error(parser.get_error(constants.INVALID_BOX_RESULT, self.reference2, self))
+              deduction_result.add_error(parser.get_error(constants.INVALID_BOX_RESULT, parser.symbol_table.find_reference_token(self.line, 2), self), constants.INVALID_BOX_RESULT)
 
-    def toLatex(self, symbol_table):
-        hypothesis_number = str(len(hypothesis) + 1)
-        hypothesis[self.reference1.value] = hypothesis_number
-        latex = '\\infer[\\!\\!{\\lnot\\text{i}^{_'+ hypothesis_number +'}}]{'+self.formula.toLatex()+'}{'+symbol_table.get_rule(self.reference2.value).toLatex(symbol_table)+'}'
+    def toLatex(self, context):
+        hypothesis_number = str(len(context.hypothesis) + 1)
+        context.hypothesis[self.reference1] = hypothesis_number
+        latex = '\\infer[\\!\\!{\\lnot\\text{i}^{_'+ hypothesis_number +'}}]{'+self.formula.toLatex()+'}{'+context.symbol_table.get_rule(self.reference2).toLatex(context)+'}'
         return latex
 
 class NegationEliminationDef():
+    __slots__ = ('line', 'formula', 'reference1', 'reference2')
+    is_copied = False
+
     def __init__(self,line, formula, reference1, reference2):
         self.line = line
         self.formula = formula
         self.reference1 = reference1
         self.reference2 = reference2
-        self.is_copied = False
 
     def evaluation(self,parser,deduction_result):
       # If the references lines occur before the rule line 
@@ -1127,31 +1223,33 @@ class NegationEliminationDef():
         parser.check_line_scope_reference_error(deduction_result,self, reference1=True, reference2=True)      
 
       formula_reference = parser.symbol_table.find_token(self.line)
-      formula1 = parser.symbol_table.lookup_formula_by_line(self.line, self.reference1.value)
-      formula2 = parser.symbol_table.lookup_formula_by_line(self.line, self.reference2.value)
+      formula1 = parser.symbol_table.lookup_formula_by_line(self.line, self.reference1)
+      formula2 = parser.symbol_table.lookup_formula_by_line(self.line, self.reference2)
       if(formula1==None or formula2==None or formula_reference==None):
         return
 
       # If the formula (reference 1) is not a contradiction
       if(self.formula.toString()!='@'):
           parser.has_error = True
-          deduction_result.add_error(parser.get_error(constants.INVALID_RESULT, formula_reference, self))
+          deduction_result.add_error(parser.get_error(constants.INVALID_RESULT, formula_reference, self), constants.INVALID_RESULT)
       else:
           # If the left formula of conclusion (the conjunction) is one of the references 
           if(not (NegationFormula(formula2) == formula1 or NegationFormula(formula1) == formula2)):
               parser.has_error = True
-              deduction_result.add_error(parser.get_error(constants.INVALID_NEGATION, self.reference1, self))
+              deduction_result.add_error(parser.get_error(constants.INVALID_NEGATION, parser.symbol_table.find_reference_token(self.line, 1), self), constants.INVALID_NEGATION)
 
-    def toLatex(self, symbol_table):
-        latex = '\\infer[\\!\\!{\\lnot\\text{e}}]{'+self.formula.toLatex()+'}{{'+symbol_table.get_rule(self.reference1.value).toLatex(symbol_table)+'}&{'+symbol_table.get_rule(self.reference2.value).toLatex(symbol_table)+'}}'
+    def toLatex(self, context):
+        latex = '\\infer[\\!\\!{\\lnot\\text{e}}]{'+self.formula.toLatex()+'}{{'+context.symbol_table.get_rule(self.reference1).toLatex(context)+'}&{'+context.symbol_table.get_rule(self.reference2).toLatex(context)+'}}'
         return latex
 
 class BottomDef():
+    __slots__ = ('line', 'formula', 'reference1')
+    is_copied = False
+
     def __init__(self,line, formula, reference1):
         self.line = line
         self.formula = formula
         self.reference1 = reference1
-        self.is_copied = False
     
     def evaluation(self,parser,deduction_result):
       # If the references lines occur before the rule line 
@@ -1161,26 +1259,28 @@ class BottomDef():
         parser.check_line_scope_reference_error(deduction_result,self, reference1=True)      
 
       formula_reference = parser.symbol_table.find_token(self.line)
-      formula1 = parser.symbol_table.lookup_formula_by_line(self.line, self.reference1.value)
+      formula1 = parser.symbol_table.lookup_formula_by_line(self.line, self.reference1)
       if(formula1==None):
         return
 
       # If the formula (reference 1) is not a bottom formula
       if(formula1.toString()!='@'):
           parser.has_error = True
-          deduction_result.add_error(parser.get_error(constants.IS_NOT_BOTTOM, self.reference1, self))
+          deduction_result.add_error(parser.get_error(constants.IS_NOT_BOTTOM, parser.symbol_table.find_reference_token(self.line, 1), self), constants.IS_NOT_BOTTOM)
 
-    def toLatex(self, symbol_table):
-        latex = '\\infer[\\!\\!{\\bot e}]{'+self.formula.toLatex()+'}{'+symbol_table.get_rule(self.reference1.value).toLatex(symbol_table)+'}'
+    def toLatex(self, context):
+        latex = '\\infer[\\!\\!{\\bot e}]{'+self.formula.toLatex()+'}{'+context.symbol_table.get_rule(self.reference1).toLatex(context)+'}'
         return latex
 
 class RaaDef():
+    __slots__ = ('line', 'formula', 'reference1', 'reference2')
+    is_copied = False
+
     def __init__(self,line, formula, reference1, reference2):
         self.line = line
         self.formula = formula
         self.reference1 = reference1
         self.reference2 = reference2
-        self.is_copied = False
 
     def evaluation(self,parser,deduction_result):
       # If the references lines occur before the rule line 
@@ -1189,31 +1289,145 @@ class RaaDef():
       valid_box = parser.check_scope_reference_error(deduction_result,self)
 
       formula_reference = parser.symbol_table.find_token(self.line)
-      formula1, formula2 = parser.symbol_table.check_scope_delimiter(self.reference1.value, self.reference2.value)
+      formula1, formula2 = parser.symbol_table.check_scope_delimiter(self.reference1, self.reference2)
       if(formula1==None or formula2==None or formula_reference==None):
         return
 
       # If the hypothese (reference1) is the left formula of the conclusion
       if(formula1 != NegationFormula(self.formula)):
           parser.has_error = True
-          deduction_result.add_error(parser.get_error(constants.INVALID_HYPOTHESIS, self.reference1, self))
+          deduction_result.add_error(parser.get_error(constants.INVALID_HYPOTHESIS, parser.symbol_table.find_reference_token(self.line, 1), self), constants.INVALID_HYPOTHESIS)
       # If the conclusion of the box (reference2) is the @
       if(formula2.toString() != '@'):
           parser.has_error = True
-          deduction_result.add_error(parser.get_error(constants.INVALID_BOX_RESULT, self.reference2, self))
+          deduction_result.add_error(parser.get_error(constants.INVALID_BOX_RESULT, parser.symbol_table.find_reference_token(self.line, 2), self), constants.INVALID_BOX_RESULT)
 
-    def toLatex(self, symbol_table):
-        hypothesis_number = str(len(hypothesis) + 1)
-        hypothesis[self.reference1.value] = hypothesis_number
-        latex = '\\infer[\\!\\!{\\text{raa}^_{'+ hypothesis_number +'} }]{'+self.formula.toLatex()+'}{'+symbol_table.get_rule(self.reference2.value).toLatex(symbol_table)+'}'
+    def toLatex(self, context):
+        hypothesis_number = str(len(context.hypothesis) + 1)
+        context.hypothesis[self.reference1] = hypothesis_number
+        latex = '\\infer[\\!\\!{\\text{raa}^_{'+ hypothesis_number +'} }]{'+self.formula.toLatex()+'}{'+context.symbol_table.get_rule(self.reference2).toLatex(context)+'}'
         return latex
 
+# Derived rules: checked by their patterns and, in the Gentzen proof, expanded into the
+# primitive rules by their templates (see nadia_pt_derived)
+
+def derived_latex(rule, context):
+    # The templates are checked by a ProofSession, which is built on this module
+    from nadia.nadia_pt_derived import expand_latex
+    return expand_latex(rule, context)
+
+class ModusTollensDef():
+    __slots__ = ('line', 'formula', 'reference1', 'reference2')
+    is_copied = False
+
+    def __init__(self,line, formula, reference1, reference2):
+        self.line = line
+        self.formula = formula
+        self.reference1 = reference1
+        self.reference2 = reference2
+
+    def premisses(self, formula1, formula2):
+      # The implication A->B and ~B, in this order, of the conclusion ~A, or None
+      for implication, negation in ((formula1, formula2), (formula2, formula1)):
+          if(isinstance(implication, BinaryFormula) and implication.key == '->'
+          and NegationFormula(implication.right) == negation and NegationFormula(implication.left) == self.formula):
+              return implication, negation
+      return None
+
+    def evaluation(self,parser,deduction_result):
+      # If the references lines occur before the rule line
+      before = parser.check_line_reference_before_rule_error(deduction_result,self)
+      # If the reference1 line and the reference2 occur in the scope of the rule line
+      if before:
+        parser.check_line_scope_reference_error(deduction_result,self, reference1=True, reference2=True)
+
+      formula_reference = parser.symbol_table.find_token(self.line)
+      formula1 = parser.symbol_table.lookup_formula_by_line(self.line, self.reference1)
+      formula2 = parser.symbol_table.lookup_formula_by_line(self.line, self.reference2)
+      if(formula1==None or formula2==None or formula_reference==None):
+        return
+
+      if(self.premisses(formula1, formula2) is None):
+          parser.has_error = True
+          deduction_result.add_error(parser.get_error(constants.INVALID_RESULT, formula_reference, self), constants.INVALID_RESULT)
+
+    def template(self, symbol_table):
+      # The template of the rule, the formulas of its atoms and the lines of its premisses
+      formula1 = symbol_table.get_rule(self.reference1).formula
+      implication, negation = self.premisses(formula1, symbol_table.get_rule(self.reference2).formula)
+      references = (self.reference1, self.reference2) if implication is formula1 else (self.reference2, self.reference1)
+      return 'mt', {'A': implication.left, 'B': implication.right}, references
+
+    def toLatex(self, context):
+        return derived_latex(self, context)
+
+class DoubleNegationDef():
+    __slots__ = ('line', 'formula', 'reference1')
+    is_copied = False
+
+    def __init__(self,line, formula, reference1):
+        self.line = line
+        self.formula = formula
+        self.reference1 = reference1
+
+    def evaluation(self,parser,deduction_result):
+      # If the references lines occur before the rule line
+      before = parser.check_line_reference_before_rule_error(deduction_result,self)
+      # If the reference1 line occurs in the scope of the rule line
+      if before:
+        parser.check_line_scope_reference_error(deduction_result,self, reference1=True)
+
+      formula_reference = parser.symbol_table.find_token(self.line)
+      formula1 = parser.symbol_table.lookup_formula_by_line(self.line, self.reference1)
+      if(formula1==None or formula_reference==None):
+        return
+
+      # The conclusion is ~~A of the reference A, or A of ~~A
+      if(NegationFormula(NegationFormula(formula1)) != self.formula and NegationFormula(NegationFormula(self.formula)) != formula1):
+          parser.has_error = True
+          deduction_result.add_error(parser.get_error(constants.INVALID_RESULT, formula_reference, self), constants.INVALID_RESULT)
+
+    def template(self, symbol_table):
+      formula1 = symbol_table.get_rule(self.reference1).formula
+      if(NegationFormula(NegationFormula(formula1)) == self.formula):
+          return 'dni', {'A': formula1}, (self.reference1,)
+      return 'dne', {'A': self.formula}, (self.reference1,)
+
+    def toLatex(self, context):
+        return derived_latex(self, context)
+
+class ExcludedMiddleDef():
+    __slots__ = ('line', 'formula')
+    is_copied = False
+
+    def __init__(self,line, formula):
+        self.line = line
+        self.formula = formula
+
+    def evaluation(self,parser,deduction_result):
+      formula_reference = parser.symbol_table.find_token(self.line)
+      if(formula_reference==None):
+        return
+
+      # The conclusion is A|~A
+      if(not (isinstance(self.formula, BinaryFormula) and self.formula.key == '|' and NegationFormula(self.formula.left) == self.formula.right)):
+          parser.has_error = True
+          deduction_result.add_error(parser.get_error(constants.INVALID_RESULT, formula_reference, self), constants.INVALID_RESULT)
+
+    def template(self, symbol_table):
+      return 'lem', {'A': self.formula.left}, ()
+
+    def toLatex(self, context):
+        return derived_latex(self, context)
+
 class CopyDef():
+    __slots__ = ('line', 'formula', 'reference1')
+    is_copied = False
+
     def __init__(self, line, formula, reference1):
         self.line = line
         self.formula = formula
         self.reference1 = reference1
-        self.is_copied = False
 
     def evaluation(self,parser,deduction_result):
       # If the references lines occur before the rule line 
@@ -1223,33 +1437,58 @@ class CopyDef():
         parser.check_line_scope_reference_error(deduction_result,self, reference1=True)      
 
       formula_reference = parser.symbol_table.find_token(self.line)
-      formula1 = parser.symbol_table.lookup_formula_by_line(self.line, self.reference1.value)
+      formula1 = parser.symbol_table.lookup_formula_by_line(self.line, self.reference1)
       if(formula1==None):
         return
 
       # If the formula (reference 1) is not a conjunction formula
       if(formula1!=self.formula):
           parser.has_error = True
-          deduction_result.add_error(parser.get_error(constants.COPY_DIFFERENT_FORMULE, formula_reference, self))
+          deduction_result.add_error(parser.get_error(constants.COPY_DIFFERENT_FORMULE, formula_reference, self), constants.COPY_DIFFERENT_FORMULE)
 
-    def toLatex(self, symbol_table):
-        formula1 = symbol_table.lookup_formula_by_line(self.line, self.reference1.value)
+    def toLatex(self, context):
+        formula1 = context.symbol_table.lookup_formula_by_line(self.line, self.reference1)
         latex = '{'+formula1.toLatex()+'}'
-#        latex = '{'+self.formula.toLatex()+'}'#'\\infer[\\!\\!{\\land\\text{e}}]{'+self.formula.toLatex()+'}{'+symbol_table.get_rule(self.reference1.value).toLatex(symbol_table)+'}'
+#        latex = '{'+self.formula.toLatex()+'}'#'\\infer[\\!\\!{\\land\\text{e}}]{'+self.formula.toLatex()+'}{'+context.symbol_table.get_rule(self.reference1).toLatex(context)+'}'
         return latex
 
+# A line justified by copie. It is an alias of the copied rule: the formula and the Gentzen tree
+# are shared with the original rule instead of being duplicated.
+class CopiedDef():
+    __slots__ = ('line', 'original')
+    is_copied = True
+
+    def __init__(self, line, original):
+        self.line = line
+        # Copies of copies point directly to the first rule.
+        self.original = original.original if isinstance(original, CopiedDef) else original
+
+    @property
+    def formula(self):
+        return self.original.formula
+
+    def evaluation(self,parser,deduction_result):
+        return
+
+    def toLatex(self, context):
+        return self.original.toLatex(context)
+
 class WrongDef():
+    __slots__ = ('line', 'formula')
+    is_copied = False
+
     def __init__(self,line, formula):
         self.line = line
         self.formula = formula
-        self.is_copied = False
 
 class ForAllEliminationDef():
+    __slots__ = ('line', 'formula', 'reference1')
+    is_copied = False
+
     def __init__(self, line, formula, reference1):
         self.line = line
         self.formula = formula
         self.reference1 = reference1
-        self.is_copied = False
 
     def evaluation(self,parser,deduction_result):
       # If the references lines occur before the rule line 
@@ -1259,35 +1498,37 @@ class ForAllEliminationDef():
         parser.check_line_scope_reference_error(deduction_result,self, reference1=True)      
 
       formula_reference = parser.symbol_table.find_token(self.line)
-      formula1 = parser.symbol_table.lookup_formula_by_line(self.line, self.reference1.value)
+      formula1 = parser.symbol_table.lookup_formula_by_line(self.line, self.reference1)
       if(formula1==None):
         return
 
       # If the formula is not a universal formula
       if(not isinstance(formula1, QuantifierFormula) or (isinstance(formula1, QuantifierFormula) and not formula1.is_universal())):
           parser.has_error = True
-          deduction_result.add_error(parser.get_error(constants.INVALID_UNIVERSAL_FORMULA, self.reference1, self))
+          deduction_result.add_error(parser.get_error(constants.INVALID_UNIVERSAL_FORMULA, parser.symbol_table.find_reference_token(self.line, 1), self), constants.INVALID_UNIVERSAL_FORMULA)
 
       # If the conclusion is a valid substitution of the universal formula (referecence 1)
       if(isinstance(formula1, QuantifierFormula) and not formula1.valid_substitution(self.formula)):
           parser.has_error = True
-          deduction_result.add_error(parser.get_error(constants.INVALID_SUBSTITUTION_UNIVERSAL, formula_reference, self))
+          deduction_result.add_error(parser.get_error(constants.INVALID_SUBSTITUTION_UNIVERSAL, formula_reference, self), constants.INVALID_SUBSTITUTION_UNIVERSAL)
 
-    def toLatex(self, symbol_table):
+    def toLatex(self, context):
         latex = '\\infer[\\!\\!\\forall\\text{e}]{'
         latex += self.formula.toLatex()
         latex += '}{'
-        latex += symbol_table.get_rule(self.reference1.value).toLatex(symbol_table)
+        latex += context.symbol_table.get_rule(self.reference1).toLatex(context)
         latex += '}'
         return latex
 
 
 class ExistsIntroductionDef():
+    __slots__ = ('line', 'formula', 'reference1')
+    is_copied = False
+
     def __init__(self, line, formula, reference1):
         self.line = line
         self.formula = formula
         self.reference1 = reference1
-        self.is_copied = False
 
     def evaluation(self,parser,deduction_result):
       # If the references lines occur before the rule line 
@@ -1298,34 +1539,36 @@ class ExistsIntroductionDef():
 
 
       formula_reference = parser.symbol_table.find_token(self.line)
-      formula1 = parser.symbol_table.lookup_formula_by_line(self.line, self.reference1.value)
+      formula1 = parser.symbol_table.lookup_formula_by_line(self.line, self.reference1)
       if(formula1==None):
         return
       # If the formula is not a existential formula
       if(not isinstance(self.formula, QuantifierFormula) or (isinstance(self.formula, QuantifierFormula) and not self.formula.is_existential())):
           parser.has_error = True
-          deduction_result.add_error(parser.get_error(constants.INVALID_EXISTENTIAL_FORMULA, formula_reference, self))
+          deduction_result.add_error(parser.get_error(constants.INVALID_EXISTENTIAL_FORMULA, formula_reference, self), constants.INVALID_EXISTENTIAL_FORMULA)
       # If the conclusion is a valid substitution for the variable in formula1
       if(isinstance(self.formula, QuantifierFormula) and not self.formula.valid_substitution(formula1)):
           parser.has_error = True
-          deduction_result.add_error(parser.get_error(constants.INVALID_SUBSTITUTION_EXISTENTIAL, formula_reference, self))
+          deduction_result.add_error(parser.get_error(constants.INVALID_SUBSTITUTION_EXISTENTIAL, formula_reference, self), constants.INVALID_SUBSTITUTION_EXISTENTIAL)
 
-    def toLatex(self, symbol_table):
+    def toLatex(self, context):
         latex = '\\infer[\\!\\!\\exists\\text{i}]{'
         latex += self.formula.toLatex()
         latex += '}{'
-        latex += symbol_table.get_rule(self.reference1.value).toLatex(symbol_table)
+        latex += context.symbol_table.get_rule(self.reference1).toLatex(context)
         latex += '}'
         return latex
 
 class ExistsEliminationtionDef():
+    __slots__ = ('line', 'formula', 'reference1', 'reference2', 'reference3')
+    is_copied = False
+
     def __init__(self,line, formula, reference1, reference2, reference3):
         self.line = line
         self.formula = formula
         self.reference1 = reference1
         self.reference2 = reference2
         self.reference3 = reference3
-        self.is_copied = False
 
     def evaluation(self,parser,deduction_result):
       # If the references lines occur before the rule line 
@@ -1336,56 +1579,58 @@ class ExistsEliminationtionDef():
       # If the box is a valid scope
       valid_box = parser.check_scope_reference_error(deduction_result,self)
 
-      variable = parser.symbol_table.find_scope_variable(self.reference2.value)
+      variable = parser.symbol_table.find_scope_variable(self.reference2)
       # If no variable is at the hypothesis line.
       if variable==None:
           parser.has_error = True
-          deduction_result.add_error(parser.get_error(constants.BOX_MUST_HAVE_A_VARIABLE, self.reference2, self))
+          deduction_result.add_error(parser.get_error(constants.BOX_MUST_HAVE_A_VARIABLE, parser.symbol_table.find_reference_token(self.line, 2), self), constants.BOX_MUST_HAVE_A_VARIABLE)
           return
       # If the variable is not a fresh variable 
-      if(not parser.symbol_table.is_fresh_variable(self.reference2.value)):
+      if(not parser.symbol_table.is_fresh_variable(self.reference2)):
           parser.has_error = True
-          deduction_result.add_error(parser.get_error(constants.VARIABLE_IS_NOT_FRESH_VARIABLE, self.reference2, self))
+          deduction_result.add_error(parser.get_error(constants.VARIABLE_IS_NOT_FRESH_VARIABLE, parser.symbol_table.find_reference_token(self.line, 2), self), constants.VARIABLE_IS_NOT_FRESH_VARIABLE)
 
       formula_reference = parser.symbol_table.find_token(self.line)
-      formula1 = parser.symbol_table.lookup_formula_by_line(self.line, self.reference1.value)
-      formula2, formula3 = parser.symbol_table.check_scope_delimiter(self.reference2.value, self.reference3.value)
+      formula1 = parser.symbol_table.lookup_formula_by_line(self.line, self.reference1)
+      formula2, formula3 = parser.symbol_table.check_scope_delimiter(self.reference2, self.reference3)
       if(formula1==None or formula2==None or formula3==None or formula_reference==None):
         return
 
       # If the rule conclusion is the same as the last formula of the box
       if(self.formula != formula3):
           parser.has_error = True
-          deduction_result.add_error(parser.get_error(constants.INVALID_CONCLUSION_EXISTENTIAL_LAST_RULE, self.reference3, self))
+          deduction_result.add_error(parser.get_error(constants.INVALID_CONCLUSION_EXISTENTIAL_LAST_RULE, parser.symbol_table.find_reference_token(self.line, 3), self), constants.INVALID_CONCLUSION_EXISTENTIAL_LAST_RULE)
       # If the formula of the first reference is not a existential formula
       if(not isinstance(formula1, QuantifierFormula) or (isinstance(formula1, QuantifierFormula) and not formula1.is_existential())):
           parser.has_error = True
-          deduction_result.add_error(parser.get_error(constants.INVALID_EXISTENTIAL_FORMULA, formula_reference, self))
+          deduction_result.add_error(parser.get_error(constants.INVALID_EXISTENTIAL_FORMULA, formula_reference, self), constants.INVALID_EXISTENTIAL_FORMULA)
       # If the hypothesis formula (reference line 2) is a valid subtitutotion of the existential formula (reference line 1)
       if(isinstance(formula1, QuantifierFormula) and formula1.formula.substitution(formula1.variable, variable)!=formula2):
           parser.has_error = True
-          deduction_result.add_error(parser.get_error(constants.INVALID_SUBSTITUTION_EXISTENTIAL, self.reference2, self))
+          deduction_result.add_error(parser.get_error(constants.INVALID_SUBSTITUTION_EXISTENTIAL, parser.symbol_table.find_reference_token(self.line, 2), self), constants.INVALID_SUBSTITUTION_EXISTENTIAL)
       # if the variable is a free variable at the conclusion formula (referecne line 3)
       if(variable in formula3.free_variables()):
           parser.has_error = True
-          deduction_result.add_error(parser.get_error(constants.INVALID_CONCLUSION_EXISTENTIAL, self.reference2, self))
+          deduction_result.add_error(parser.get_error(constants.INVALID_CONCLUSION_EXISTENTIAL, parser.symbol_table.find_reference_token(self.line, 2), self), constants.INVALID_CONCLUSION_EXISTENTIAL)
 
-    def toLatex(self, symbol_table):
-        hypothesis_number = str(len(hypothesis) + 1)
-        hypothesis[self.reference2.value] = hypothesis_number
+    def toLatex(self, context):
+        hypothesis_number = str(len(context.hypothesis) + 1)
+        context.hypothesis[self.reference2] = hypothesis_number
         latex = '\\infer[\\!\\!{\\exists\\text{e}^{_'+ hypothesis_number +'} }]{'
         latex += self.formula.toLatex()+'}{'
-        latex += symbol_table.get_rule(self.reference1.value).toLatex(symbol_table)
-        latex += ' & '+symbol_table.get_rule(self.reference3.value).toLatex(symbol_table)+ '}'
+        latex += context.symbol_table.get_rule(self.reference1).toLatex(context)
+        latex += ' & '+context.symbol_table.get_rule(self.reference3).toLatex(context)+ '}'
         return latex
 
 class ForAllIntroductiontionDef():
+    __slots__ = ('line', 'formula', 'reference1', 'reference2')
+    is_copied = False
+
     def __init__(self,line, formula, reference1, reference2):
         self.line = line
         self.formula = formula
         self.reference1 = reference1
         self.reference2 = reference2
-        self.is_copied = False
 
     def evaluation(self,parser,deduction_result):
       # If the references lines occur before the rule line 
@@ -1393,74 +1638,79 @@ class ForAllIntroductiontionDef():
       # If the box is a valid scope
       valid_box = parser.check_scope_reference_error(deduction_result,self)
 
-      variable = parser.symbol_table.find_scope_variable(self.reference1.value)
-      first_rule = parser.symbol_table.get_first_rule_from_scope(self.reference1.value)
+      variable = parser.symbol_table.find_scope_variable(self.reference1)
+      first_rule = parser.symbol_table.get_first_rule_from_scope(self.reference1)
       # If no variable is at the hypothesis line.
       if variable==None:
           parser.has_error = True
-          deduction_result.add_error(parser.get_error(constants.BOX_MUST_HAVE_A_VARIABLE, self.reference1, self))
+          deduction_result.add_error(parser.get_error(constants.BOX_MUST_HAVE_A_VARIABLE, parser.symbol_table.find_reference_token(self.line, 1), self), constants.BOX_MUST_HAVE_A_VARIABLE)
           return
       elif isinstance(first_rule, HypothesisFirstOrderDef):
           parser.has_error = True
-          deduction_result.add_error(parser.get_error(constants.BOX_MUST_HAVE_ONLY_A_VARIABLE, self.reference1, self))
+          deduction_result.add_error(parser.get_error(constants.BOX_MUST_HAVE_ONLY_A_VARIABLE, parser.symbol_table.find_reference_token(self.line, 1), self), constants.BOX_MUST_HAVE_ONLY_A_VARIABLE)
           return
         
       # If the variable is not a fresh variable 
-      if(not parser.symbol_table.is_fresh_variable(self.reference1.value)):
+      if(not parser.symbol_table.is_fresh_variable(self.reference1)):
           parser.has_error = True
-          deduction_result.add_error(parser.get_error(constants.VARIABLE_IS_NOT_FRESH_VARIABLE, self.reference1, self))
+          deduction_result.add_error(parser.get_error(constants.VARIABLE_IS_NOT_FRESH_VARIABLE, parser.symbol_table.find_reference_token(self.line, 1), self), constants.VARIABLE_IS_NOT_FRESH_VARIABLE)
 
       formula_reference = parser.symbol_table.find_token(self.line)
-      formula1, formula2 = parser.symbol_table.check_scope_delimiter(self.reference1.value, self.reference2.value)
+      formula1, formula2 = parser.symbol_table.check_scope_delimiter(self.reference1, self.reference2)
       if(formula1==None or formula2==None or formula_reference==None):
         return
 
       # If the formula of the first reference is not a existential formula
       if(not isinstance(self.formula, QuantifierFormula) or (isinstance(self.formula, QuantifierFormula) and not self.formula.is_universal())):
           parser.has_error = True
-          deduction_result.add_error(parser.get_error(constants.INVALID_EXISTENTIAL_FORMULA, formula_reference, self))
+          deduction_result.add_error(parser.get_error(constants.INVALID_EXISTENTIAL_FORMULA, formula_reference, self), constants.INVALID_EXISTENTIAL_FORMULA)
       # If the conclusion is a universal formula of the last formula (reference line 2) by substitution of the variable
       if(isinstance(self.formula, QuantifierFormula) and self.formula.formula.substitution(self.formula.variable, variable)!=formula2):
           parser.has_error = True
-          deduction_result.add_error(parser.get_error(constants.INVALID_CONCLUSION_UNIVERSAL_LAST_RULE, self.reference2, self))
+          deduction_result.add_error(parser.get_error(constants.INVALID_CONCLUSION_UNIVERSAL_LAST_RULE, parser.symbol_table.find_reference_token(self.line, 2), self), constants.INVALID_CONCLUSION_UNIVERSAL_LAST_RULE)
       # if the variable is a free variable at the conclusion formula (reference line 3)
       if(variable in self.formula.free_variables()):
           parser.has_error = True
-          deduction_result.add_error(parser.get_error(constants.INVALID_CONCLUSION_UNIVERSAL, formula_reference, self))
+          deduction_result.add_error(parser.get_error(constants.INVALID_CONCLUSION_UNIVERSAL, formula_reference, self), constants.INVALID_CONCLUSION_UNIVERSAL)
 
-    def toLatex(self, symbol_table):
-        hypothesis_number = str(len(hypothesis) + 1)
-        hypothesis[self.reference2.value] = hypothesis_number
+    def toLatex(self, context):
+        hypothesis_number = str(len(context.hypothesis) + 1)
+        context.hypothesis[self.reference2] = hypothesis_number
         latex = '\\infer[\\!\\!{\\forall\\text{i}}]{'
         latex += self.formula.toLatex()+'}{'
-        latex += symbol_table.get_rule(self.reference2.value).toLatex(symbol_table)+ '}'
+        latex += context.symbol_table.get_rule(self.reference2).toLatex(context)+ '}'
         return latex
 
 
 ## File analisys.py
 
 from rply import ParserGenerator
-import sys
-import copy
+import threading
 
-deduction_result = natural_deduction_return()
+# Lexers and parsers already built by each thread
+warm_parsers = threading.local()
 
-def value_error_handle(exctype, value, tb):
-    deduction_result.add_error(str(value))
-#    deduction_result.to_json()
+def get_warm_lexer():
+    if not hasattr(warm_parsers, 'lexer'):
+        warm_parsers.lexer = Lexer().get_lexer()
+    return warm_parsers.lexer
 
-sys.excepthook = value_error_handle
+def warm_up():
+    # Builds the parsers of the current thread ahead of the first check
+    ParserNadia.getWarmParser()
+    ParserTheorem.getWarmParser()
+    ParserFormula.getWarmParser()
 
 class ParserNadia():
     def __init__(self, state):
-        self.state = state
         self.pg = ParserGenerator(
             # A list of all token names accepted by the parser.
             ['NUM', 'DOT', 'COMMA', 'OPEN_PAREN', 'CLOSE_PAREN', 'NOT', 'RAA',
              'AND', 'OR', 'OR_INTROD', 'OR_ELIM', 'BOTTOM','BOTTOM_ELIM', 'OPEN_BRACKET', 'AND_INTROD',
              'AND_ELIM', 'NEG_INTROD', 'NEG_ELIM', 'HYPOTHESIS', 'PREMISE', 'ATOM', 'CLOSE_BRACKET',
              'DASH', 'COPY', 'IMP_ELIM', 'IMPLIE', 'IMP_INTROD',
-             'VAR', 'EXT', 'ALL', 'ALL_ELIM', 'EXT_INTROD', 'EXT_ELIM', 'ALL_INTROD' ],
+             'VAR', 'EXT', 'ALL', 'ALL_ELIM', 'EXT_INTROD', 'EXT_ELIM', 'ALL_INTROD',
+             'MODUS_TOLLENS', 'DOUBLE_NEGATION', 'EXCLUDED_MIDDLE', 'PBC' ],
             #The precedence $\lnot,\forall,\exists,\land,\lor,\rightarrow,\leftrightarrow$
             precedence=[
                 ('right', ['IMPLIE']),
@@ -1471,11 +1721,25 @@ class ParserNadia():
                 ('right', ['NOT']),
             ]
         )
+        self.reset(state)
+
+    def reset(self, state, evaluator=None):
+        # Starts the check of a new proof, so that the grammar built by this parser can be reused.
+        # The evaluator (e.g. an IncrementalChecker) evaluates the rules in place of the parser.
+        self.state = state
+        self.evaluator = evaluator
         self.symbol_table = SymbolTable()
+        self.context = CheckContext(self.symbol_table)
         self.box_latex = "\\begin{logicproof}{6}\n"
         self.has_error = False
 
 
+    def evaluate_rule(self, rule, deduction_result):
+        if self.evaluator is not None:
+            self.evaluator.evaluate(self, rule, deduction_result)
+        else:
+            rule.evaluation(self, deduction_result)
+
     def verify_sequence_lines_error(self, deduction_result):
         productions = self.state.splitlines()
         i = 1
@@ -1484,8 +1748,8 @@ class ParserNadia():
           if x.isdigit():
             if int(x)!=i: 
               self.has_error = True
-              if(i==1): deduction_result.add_error("{}\n^, A numeração da linha {} deveria ser {}, pois a numeração da prova deve ser sequencial e iniciar em 1.\n".format(p,x,i))
-              else: deduction_result.add_error("{}\n^, A numeração da linha {} deveria ser {}, pois a numeração da prova deve ser sequencial.\n".format(p,x,i))
+              if(i==1): deduction_result.add_error("{}\n^, A numeração da linha {} deveria ser {}, pois a numeração da prova deve ser sequencial e iniciar em 1.\n".format(p,x,i), constants.LINES_MUST_BE_SEQUENCE)
+              else: deduction_result.add_error("{}\n^, A numeração da linha {} deveria ser {}, pois a numeração da prova deve ser sequencial.\n".format(p,x,i), constants.LINES_MUST_BE_SEQUENCE)
               break
             i+=1
 
@@ -1496,11 +1760,11 @@ class ParserNadia():
         current_scope_parent = self.symbol_table.symbol_table[current_scope['parent']] if current_scope['parent'] else None
         if(current_scope_parent==None):
           self.has_error = True
-          deduction_result.add_error("Erro no escopo da demontração: escopo pai não encontrado.")
+          deduction_result.add_error("Erro no escopo da demontração: escopo pai não encontrado.", constants.SCOPE_NOT_FOUND)
         next_line_parent = None
         rule_next = None
         for rule in current_scope_parent['rules']:
-          if(int(rule.line)>int(current_scope['end_line'])):
+          if(rule.line>current_scope['end_line']):
             rule_next = rule
             break
         if (rule_next==None or ( not (isinstance(rule_next, NegationIntroductionDef) or isinstance(rule_next, RaaDef)
@@ -1509,63 +1773,63 @@ class ParserNadia():
           self.has_error = True
           begin_rule = current_scope["rules"][0]
           begin_token =current_scope["lines"][0]
-          deduction_result.add_error(self.get_error(constants.BOX_MUST_BE_DISPOSED, begin_token, begin_rule))
+          deduction_result.add_error(self.get_error(constants.BOX_MUST_BE_DISPOSED, begin_token, begin_rule), constants.BOX_MUST_BE_DISPOSED)
 
     def check_line_reference_before_rule_error(self, deduction_result, rule):
       result = True
       if hasattr(rule, 'reference1'):
-        if(int(rule.reference1.value) >= int(rule.line)):
+        if(rule.reference1 >= rule.line):
             self.has_error = True
-            deduction_result.add_error(self.get_error(constants.REFERENCED_LINE_NOT_DEFINED, rule.reference1, rule))
+            deduction_result.add_error(self.get_error(constants.REFERENCED_LINE_NOT_DEFINED, self.symbol_table.find_reference_token(rule.line, 1), rule), constants.REFERENCED_LINE_NOT_DEFINED)
             result = False
       if hasattr(rule, 'reference2'):
-        if(int(rule.reference2.value) >= int(rule.line)):
+        if(rule.reference2 >= rule.line):
             self.has_error = True
-            deduction_result.add_error(self.get_error(constants.REFERENCED_LINE_NOT_DEFINED, rule.reference2, rule))
+            deduction_result.add_error(self.get_error(constants.REFERENCED_LINE_NOT_DEFINED, self.symbol_table.find_reference_token(rule.line, 2), rule), constants.REFERENCED_LINE_NOT_DEFINED)
             result = False
       if hasattr(rule, 'reference3'):
-        if(int(rule.reference3.value) >= int(rule.line)):
+        if(rule.reference3 >= rule.line):
             self.has_error = True
-            deduction_result.add_error(self.get_error(constants.REFERENCED_LINE_NOT_DEFINED, rule.reference3, rule))
+            deduction_result.add_error(self.get_error(constants.REFERENCED_LINE_NOT_DEFINED, self.symbol_table.find_reference_token(rule.line, 3), rule), constants.REFERENCED_LINE_NOT_DEFINED)
             result = False
       if hasattr(rule, 'reference4'):
-        if(int(rule.reference4.value) >= int(rule.line)):
+        if(rule.reference4 >= rule.line):
             self.has_error = True
-            deduction_result.add_error(self.get_error(constants.REFERENCED_LINE_NOT_DEFINED, rule.reference4, rule))
+            deduction_result.add_error(self.get_error(constants.REFERENCED_LINE_NOT_DEFINED, self.symbol_table.find_reference_token(rule.line, 4), rule), constants.REFERENCED_LINE_NOT_DEFINED)
             result = False
       if hasattr(rule, 'reference5'):
-        if(int(rule.reference5.value) >= int(rule.line)):
+        if(rule.reference5 >= rule.line):
             self.has_error = True
-            deduction_result.add_error(self.get_error(constants.REFERENCED_LINE_NOT_DEFINED, rule.reference5, rule))
+            deduction_result.add_error(self.get_error(constants.REFERENCED_LINE_NOT_DEFINED, self.symbol_table.find_reference_token(rule.line, 5), rule), constants.REFERENCED_LINE_NOT_DEFINED)
             result = False
       return result
 
     def check_line_scope_reference_error(self, deduction_result, rule, reference1=False, reference2=False, reference3=False, reference4=False, reference5=False):
       result = True
       if reference1:
-        if (self.symbol_table.lookup_formula_by_line(rule.line, rule.reference1.value)==None):
+        if (self.symbol_table.lookup_formula_by_line(rule.line, rule.reference1)==None):
             self.has_error = True
-            deduction_result.add_error(self.get_error(constants.USING_DESCARTED_RULE, rule.reference1, rule))
+            deduction_result.add_error(self.get_error(constants.USING_DESCARTED_RULE, self.symbol_table.find_reference_token(rule.line, 1), rule), constants.USING_DESCARTED_RULE)
             result = False
       if reference2:
-        if (self.symbol_table.lookup_formula_by_line(rule.line, rule.reference2.value)==None):
+        if (self.symbol_table.lookup_formula_by_line(rule.line, rule.reference2)==None):
             self.has_error = True
-            deduction_result.add_error(self.get_error(constants.USING_DESCARTED_RULE, rule.reference2, rule))
+            deduction_result.add_error(self.get_error(constants.USING_DESCARTED_RULE, self.symbol_table.find_reference_token(rule.line, 2), rule), constants.USING_DESCARTED_RULE)
             result = False
       if reference3:
-        if (self.symbol_table.lookup_formula_by_line(rule.line, rule.reference3.value)==None):
+        if (self.symbol_table.lookup_formula_by_line(rule.line, rule.reference3)==None):
             self.has_error = True
-            deduction_result.add_error(self.get_error(constants.USING_DESCARTED_RULE, rule.reference3, rule))
+            deduction_result.add_error(self.get_error(constants.USING_DESCARTED_RULE, self.symbol_table.find_reference_token(rule.line, 3), rule), constants.USING_DESCARTED_RULE)
             result = False
       if reference4:
-        if (self.symbol_table.lookup_formula_by_line(rule.line, rule.reference4.value)==None):
+        if (self.symbol_table.lookup_formula_by_line(rule.line, rule.reference4)==None):
             self.has_error = True
-            deduction_result.add_error(self.get_error(constants.USING_DESCARTED_RULE, rule.reference3, rule))
+            deduction_result.add_error(self.get_error(constants.USING_DESCARTED_RULE, self.symbol_table.find_reference_token(rule.line, 3), rule), constants.USING_DESCARTED_RULE)
             result = False
       if reference5:
-        if (self.symbol_table.lookup_formula_by_line(rule.line, rule.reference5.value)==None):
+        if (self.symbol_table.lookup_formula_by_line(rule.line, rule.reference5)==None):
             self.has_error = True
-            deduction_result.add_error(self.get_error(constants.USING_DESCARTED_RULE, rule.reference5, rule))
+            deduction_result.add_error(self.get_error(constants.USING_DESCARTED_RULE, self.symbol_table.find_reference_token(rule.line, 5), rule), constants.USING_DESCARTED_RULE)
             result = False
       return result
 
@@ -1573,91 +1837,93 @@ class ParserNadia():
         result = True
         if (isinstance(rule, NegationIntroductionDef) or isinstance(rule, RaaDef)
           or isinstance(rule, ImplicationIntroductionDef) or isinstance(rule, ForAllIntroductiontionDef)):
-          formula1, formula2 = self.symbol_table.check_scope_delimiter(rule.reference1.value, rule.reference2.value)
+          formula1, formula2 = self.symbol_table.check_scope_delimiter(rule.reference1, rule.reference2)
           # If the box references does not form a valid box 
           if(formula1==None):
               self.has_error = True
-              deduction_result.add_error(self.get_error(constants.INVALID_SCOPE_DELIMITER, rule.reference1, rule))
+              deduction_result.add_error(self.get_error(constants.INVALID_SCOPE_DELIMITER, self.symbol_table.find_reference_token(rule.line, 1), rule), constants.INVALID_SCOPE_DELIMITER)
               result = False
           #If the box references are not followed by each other.
-          elif not (int(rule.line) > int(rule.reference2.value) and int(rule.reference2.value)>= int(rule.reference1.value)):
+          elif not (rule.line > rule.reference2 and rule.reference2>= rule.reference1):
               self.has_error = True
-              deduction_result.add_error(self.get_error(constants.INVALID_SCOPE_DELIMITER, rule.reference1, rule))
+              deduction_result.add_error(self.get_error(constants.INVALID_SCOPE_DELIMITER, self.symbol_table.find_reference_token(rule.line, 1), rule), constants.INVALID_SCOPE_DELIMITER)
               result = False
           # If box is not imediatally closed by the rule 
-          if int(rule.line) != int(rule.reference2.value)+1 and not rule.is_copied:
+          if rule.line != rule.reference2+1 and not rule.is_copied:
               self.has_error = True
-              deduction_result.add_error(self.get_error(constants.BOX_MUST_BE_DISPOSED_BY_RULE, rule.reference1, rule))
+              deduction_result.add_error(self.get_error(constants.BOX_MUST_BE_DISPOSED_BY_RULE, self.symbol_table.find_reference_token(rule.line, 1), rule), constants.BOX_MUST_BE_DISPOSED_BY_RULE)
               result = False
 
         elif (isinstance(rule, ExistsEliminationtionDef)):
-          formula1, formula2 = self.symbol_table.check_scope_delimiter(rule.reference2.value, rule.reference3.value)
+          formula1, formula2 = self.symbol_table.check_scope_delimiter(rule.reference2, rule.reference3)
           # If the box references does not form a valid box 
           if(formula1==None):
               self.has_error = True
-              deduction_result.add_error(self.get_error(constants.INVALID_SCOPE_DELIMITER, rule.reference2, rule))
+              deduction_result.add_error(self.get_error(constants.INVALID_SCOPE_DELIMITER, self.symbol_table.find_reference_token(rule.line, 2), rule), constants.INVALID_SCOPE_DELIMITER)
               result = False
           #If the box references are not followed by each other.
-          elif not (int(rule.line) > int(rule.reference3.value) and int(rule.reference3.value)>= int(rule.reference2.value) 
-                and int(rule.reference2.value)>= int(rule.reference1.value)):
+          elif not (rule.line > rule.reference3 and rule.reference3>= rule.reference2 
+                and rule.reference2>= rule.reference1):
               self.has_error = True
-              deduction_result.add_error(self.get_error(constants.INVALID_SCOPE_DELIMITER, rule.reference2, rule))
+              deduction_result.add_error(self.get_error(constants.INVALID_SCOPE_DELIMITER, self.symbol_table.find_reference_token(rule.line, 2), rule), constants.INVALID_SCOPE_DELIMITER)
               result = False
           # If box is not imediatally closed by the rule 
-          if int(rule.line) != int(rule.reference3.value)+1:
+          if rule.line != rule.reference3+1:
               self.has_error = True
-              deduction_result.add_error(self.get_error(constants.BOX_MUST_BE_DISPOSED_BY_RULE, rule.reference2, rule))
+              deduction_result.add_error(self.get_error(constants.BOX_MUST_BE_DISPOSED_BY_RULE, self.symbol_table.find_reference_token(rule.line, 2), rule), constants.BOX_MUST_BE_DISPOSED_BY_RULE)
               result = False
 
         elif isinstance(rule, DisjunctionEliminationDef):   
-          formula1, formula2 = self.symbol_table.check_scope_delimiter(rule.reference2.value, rule.reference3.value)
+          formula1, formula2 = self.symbol_table.check_scope_delimiter(rule.reference2, rule.reference3)
           # If the box references does not form a valid box 
           if(formula1==None):
               self.has_error = True
-              deduction_result.add_error(self.get_error(constants.INVALID_SCOPE_DELIMITER, rule.reference2, rule))
+              deduction_result.add_error(self.get_error(constants.INVALID_SCOPE_DELIMITER, self.symbol_table.find_reference_token(rule.line, 2), rule), constants.INVALID_SCOPE_DELIMITER)
               result = False
           #If the box references are not followed by each other.
-          elif not (int(rule.line) > int(rule.reference3.value) and int(rule.reference3.value)>= int(rule.reference2.value) 
-                and int(rule.reference2.value)>= int(rule.reference1.value)):
+          elif not (rule.line > rule.reference3 and rule.reference3>= rule.reference2 
+                and rule.reference2>= rule.reference1):
               self.has_error = True
-              deduction_result.add_error(self.get_error(constants.INVALID_SCOPE_DELIMITER, rule.reference2, rule))
+              deduction_result.add_error(self.get_error(constants.INVALID_SCOPE_DELIMITER, self.symbol_table.find_reference_token(rule.line, 2), rule), constants.INVALID_SCOPE_DELIMITER)
               result = False
-          formula1, formula2 = self.symbol_table.check_scope_delimiter(rule.reference4.value, rule.reference5.value)
+          formula1, formula2 = self.symbol_table.check_scope_delimiter(rule.reference4, rule.reference5)
           # If the box references does not form a valid box 
           if(formula1==None):
               self.has_error = True
-              deduction_result.add_error(self.get_error(constants.INVALID_SCOPE_DELIMITER, rule.reference4, rule))
+              deduction_result.add_error(self.get_error(constants.INVALID_SCOPE_DELIMITER, self.symbol_table.find_reference_token(rule.line, 4), rule), constants.INVALID_SCOPE_DELIMITER)
               result = False
           #If the box references are not followed by each other.
-          elif not (int(rule.line) > int(rule.reference5.value) and int(rule.reference5.value)>= int(rule.reference4.value) 
-                and int(rule.reference4.value)== int(rule.reference3.value)+1):
+          elif not (rule.line > rule.reference5 and rule.reference5>= rule.reference4 
+                and rule.reference4== rule.reference3+1):
               self.has_error = True
-              deduction_result.add_error(self.get_error(constants.INVALID_SCOPE_DELIMITER, rule.reference4, rule))
+              deduction_result.add_error(self.get_error(constants.INVALID_SCOPE_DELIMITER, self.symbol_table.find_reference_token(rule.line, 4), rule), constants.INVALID_SCOPE_DELIMITER)
               result = False
           # If box is not imediatally closed by the rule 
-          if int(rule.line) != int(rule.reference5.value)+1:
+          if rule.line != rule.reference5+1:
               self.has_error = True
-              deduction_result.add_error(self.get_error(constants.BOX_MUST_BE_DISPOSED_BY_RULE, rule.reference4, rule))
+              deduction_result.add_error(self.get_error(constants.BOX_MUST_BE_DISPOSED_BY_RULE, self.symbol_table.find_reference_token(rule.line, 4), rule), constants.BOX_MUST_BE_DISPOSED_BY_RULE)
               result = False
         
         return result
 
 
     def parse(self):
-        deduction_result = natural_deduction_return()
         @self.pg.production('program : steps')
         def program(p):
-            self.symbol_table.set_lines_visible()
+            deduction_result = self.context.deduction_result
             self.verify_sequence_lines_error(deduction_result)
             self.check_is_closed_boxes_by_rule(deduction_result)
 
             rule_info = p[0]
             for i in rule_info:
                 rule_line, formula_reference = rule_info[i]
+                # A closed box without rules keeps the bracket as its line
+                if not rule_line.value.isdigit():
+                    continue
 
-                formula_reference = self.symbol_table.find_token(rule_line.value)
+                formula_reference = self.symbol_table.find_token(int(rule_line.value))
 
-                rule = self.symbol_table.get_rule(rule_line.value)
+                rule = self.symbol_table.get_rule(int(rule_line.value))
                 if(isinstance(rule, PremisseDef) ):
                     pass
                 elif(isinstance(rule, HypothesisDef)):
@@ -1665,47 +1931,49 @@ class ParserNadia():
                 elif(isinstance(rule, HypothesisFirstOrderDef)):
                     pass
                 elif(isinstance(rule, NegationIntroductionDef)):
-                    rule.evaluation(self, deduction_result)
+                    self.evaluate_rule(rule, deduction_result)
                 elif(isinstance(rule, NegationEliminationDef)):
-                    rule.evaluation(self, deduction_result)
+                    self.evaluate_rule(rule, deduction_result)
                 elif(isinstance(rule, AndIntroductionDef)):
-                    rule.evaluation(self, deduction_result)
+                    self.evaluate_rule(rule, deduction_result)
                 elif(isinstance(rule, AndEliminationDef)):
-                    rule.evaluation(self, deduction_result)
+                    self.evaluate_rule(rule, deduction_result)
                 elif isinstance(rule, ImplicationIntroductionDef):
-                    rule.evaluation(self, deduction_result)
+                    self.evaluate_rule(rule, deduction_result)
                 elif isinstance(rule, ImplicationEliminationDef):
-                    rule.evaluation(self, deduction_result)
+                    self.evaluate_rule(rule, deduction_result)
                 elif(isinstance(rule, DisjunctionEliminationDef)):
-                    rule.evaluation(self, deduction_result)
+                    self.evaluate_rule(rule, deduction_result)
                 elif(isinstance(rule, DisjunctionIntroductionDef)):
-                    rule.evaluation(self, deduction_result)
+                    self.evaluate_rule(rule, deduction_result)
                 elif(isinstance(rule, RaaDef)):
-                    rule.evaluation(self, deduction_result)
+                    self.evaluate_rule(rule, deduction_result)
                 elif(isinstance(rule, BottomDef)):
-                    rule.evaluation(self, deduction_result)
+                    self.evaluate_rule(rule, deduction_result)
+                elif(isinstance(rule, ModusTollensDef)):
+                    self.evaluate_rule(rule, deduction_result)
+                elif(isinstance(rule, DoubleNegationDef)):
+                    self.evaluate_rule(rule, deduction_result)
+                elif(isinstance(rule, ExcludedMiddleDef)):
+                    self.evaluate_rule(rule, deduction_result)
                 #elif(isinstance(rule, CopyDef)):
                 #    rule.evaluation(self, deduction_result)
                 elif(isinstance(rule, ExistsIntroductionDef)):
-                    rule.evaluation(self, deduction_result)
+                    self.evaluate_rule(rule, deduction_result)
                 elif(isinstance(rule, ExistsEliminationtionDef)):
-                    rule.evaluation(self, deduction_result)
+                    self.evaluate_rule(rule, deduction_result)
                 elif(isinstance(rule, ForAllIntroductiontionDef)):
-                    rule.evaluation(self, deduction_result)
+                    self.evaluate_rule(rule, deduction_result)
                 elif(isinstance(rule, ForAllEliminationDef)):
-                    rule.evaluation(self, deduction_result)
+                    self.evaluate_rule(rule, deduction_result)
 
             if(not self.has_error):
-                latex = '\\['
                 formula_reference = str(sorted(list(map(int, rule_info.keys())))[-1])
-                rule = self.symbol_table.get_rule(rule_info[formula_reference][0].value)
-                latex += rule.toLatex(self.symbol_table)
-                latex += '\\]'
-                limpaHipotese()
+                deduction_result.gentzen_rule = self.symbol_table.get_rule(int(rule_info[formula_reference][0].value))
+                deduction_result.gentzen_context = self.context
                 deduction_result.premisses = self.symbol_table.getPremissesFormulas()
                 deduction_result.conclusion = self.symbol_table.getConclusionFormula()
                 deduction_result.fitch = self.box_latex[:-3] + '\n\end{logicproof}'
-                deduction_result.gentzen = latex + "\n"
 ##                print(deduction_result.gentzen)
 ##                print(deduction_result.fitch)
             return deduction_result
@@ -1725,7 +1993,7 @@ class ParserNadia():
         def Premisse(p):
             formula_result = p[2]
             formula = formula_result[1]
-            premisse = PremisseDef(p[0].value, formula)
+            premisse = PremisseDef(int(p[0].value), formula)
             self.symbol_table.insert(premisse, p[0])
             self.box_latex += "{} & premissa\\\\\n".format(formula.toLatex())
             return p[0], formula_result[0]
@@ -1737,35 +2005,35 @@ class ParserNadia():
             formula_result = {}
             if len(p) == 4 and p[3].gettokentype() == 'VAR':
                 variable = p[3].value
-                self.symbol_table.add_scope(p[0].value,variable=variable)
+                self.symbol_table.add_scope(int(p[0].value),variable=variable)
                 self.box_latex += "\\begin{subproof}\n"
                 self.box_latex += "\\llap{$"+str(variable)+"\\quad$} &"+"\\\\\n"
                 return p[0], None
             elif len(p) == 5:
                 formula_result = p[3]
-                self.symbol_table.add_scope(p[0].value)
+                self.symbol_table.add_scope(int(p[0].value))
                 formula = formula_result[1]
                 self.box_latex += "\\begin{subproof}\n"
                 self.box_latex += "{} & hipótese\\\\\n".format(formula.toLatex())
-                hypothesis = HypothesisDef(p[0].value, formula)
+                hypothesis = HypothesisDef(int(p[0].value), formula)
             elif len(p) == 6:
                 variable = p[3].value
                 formula_result = p[4]
-                self.symbol_table.add_scope(p[0].value,variable=variable)
+                self.symbol_table.add_scope(int(p[0].value),variable=variable)
                 formula = formula_result[1]
                 self.box_latex += "\\begin{subproof}\n"
                 self.box_latex += "\\llap{$"+str(variable)+"\\quad$}"+"{} & hipótese\\\\\n".format(formula.toLatex())
-                hypothesis = HypothesisFirstOrderDef(p[0].value, variable, formula)
+                hypothesis = HypothesisFirstOrderDef(int(p[0].value), variable, formula)
             elif len(p) == 4 and p[3].gettokentype() != 'VAR':
                 formula_result = p[2]
                 formula = formula_result[1]
                 self.box_latex += "{} & hipótese\\\\\n".format(formula.toLatex())
-                hypothesis = HypothesisDef(p[0].value, formula)
+                hypothesis = HypothesisDef(int(p[0].value), formula)
 
             self.symbol_table.insert(hypothesis, p[0])
             if(self.symbol_table.current_scope == "scope_0"):
                 self.has_error = True
-                deduction_result.add_error(self.get_error(constants.HYPOTHESIS_WITHOUT_BOX, formula_result[0], hypothesis))
+                self.context.deduction_result.add_error(self.get_error(constants.HYPOTHESIS_WITHOUT_BOX, formula_result[0], hypothesis), constants.HYPOTHESIS_WITHOUT_BOX)
             return p[0], formula_result[0]
 
 
@@ -1776,8 +2044,8 @@ class ParserNadia():
         @self.pg.production('step : NUM DOT OPEN_BRACKET formula ATOM')
         def Wrong_pre_hip(p):
             self.has_error = True
-            wrong_rule = WrongDef(p[0].value, p[-2])
-            deduction_result.add_error(self.get_error(constants.INVALID_HIP_PRE_WRITE, p[-1], wrong_rule))
+            wrong_rule = WrongDef(int(p[0].value), p[-2])
+            self.context.deduction_result.add_error(self.get_error(constants.INVALID_HIP_PRE_WRITE, p[-1], wrong_rule), constants.INVALID_HIP_PRE_WRITE)
             return p[0], p[-2]
 
         @self.pg.production('step : NUM DOT formula PREMISE ATOM')
@@ -1785,16 +2053,16 @@ class ParserNadia():
         @self.pg.production('step : NUM DOT OPEN_BRACKET formula HYPOTHESIS ATOM')
         def Wrong_pre_hip(p):
             self.has_error = True
-            wrong_rule = WrongDef(p[0].value, p[-3])
-            deduction_result.add_error(self.get_error(constants.EXCEDENT_HIP_PRE_WRITE, p[-1], wrong_rule))
+            wrong_rule = WrongDef(int(p[0].value), p[-3])
+            self.context.deduction_result.add_error(self.get_error(constants.EXCEDENT_HIP_PRE_WRITE, p[-1], wrong_rule), constants.EXCEDENT_HIP_PRE_WRITE)
             return p[0], p[-3]
 
         @self.pg.production('step : NUM DOT formula NEG_ELIM NUM COMMA NUM')
         def Neg_elim(p):
             formula_result = p[2]
             formula = formula_result[1]
-            negationElimination = NegationEliminationDef(p[0].value, formula, p[4], p[6])
-            self.symbol_table.insert(negationElimination, p[0])
+            negationElimination = NegationEliminationDef(int(p[0].value), formula, int(p[4].value), int(p[6].value))
+            self.symbol_table.insert(negationElimination, p[0], (p[4], p[6]))
             self.box_latex += "{} & $\lnot e$ {}, {}\\\\\n".format(formula.toLatex(), p[4].value, p[6].value)
             return p[0], formula_result[0]
 
@@ -1802,8 +2070,8 @@ class ParserNadia():
         def Imp_elim(p):
             formula_result = p[2]
             formula = formula_result[1]
-            implicationElimination = ImplicationEliminationDef(p[0].value, formula, p[4], p[6])
-            self.symbol_table.insert(implicationElimination, p[0])
+            implicationElimination = ImplicationEliminationDef(int(p[0].value), formula, int(p[4].value), int(p[6].value))
+            self.symbol_table.insert(implicationElimination, p[0], (p[4], p[6]))
             self.box_latex += "{} & $\\rightarrow e$ {}, {}\\\\\n".format(formula.toLatex(), p[4].value, p[6].value)
             return p[0], formula_result[0]
             
@@ -1811,8 +2079,8 @@ class ParserNadia():
         def Imp_introd(p):
             formula_result = p[2]
             formula = formula_result[1]
-            implicationIntrod = ImplicationIntroductionDef(p[0].value, formula, p[4], p[6])
-            self.symbol_table.insert(implicationIntrod, p[0])
+            implicationIntrod = ImplicationIntroductionDef(int(p[0].value), formula, int(p[4].value), int(p[6].value))
+            self.symbol_table.insert(implicationIntrod, p[0], (p[4], p[6]))
             self.box_latex += "{} & $\\rightarrow i$ {}-{}\\\\\n".format(formula.toLatex(), p[4].value, p[6].value)
             return p[0], formula_result[0]
 
@@ -1820,8 +2088,8 @@ class ParserNadia():
         def Or_introd(p):
             formula_result = p[2]
             formula = formula_result[1]
-            disjunctionIntrod = DisjunctionIntroductionDef(p[0].value, formula, p[4])
-            self.symbol_table.insert(disjunctionIntrod, p[0])
+            disjunctionIntrod = DisjunctionIntroductionDef(int(p[0].value), formula, int(p[4].value))
+            self.symbol_table.insert(disjunctionIntrod, p[0], (p[4],))
             self.box_latex += "{} & $\\lor i$ {}\\\\\n".format(formula.toLatex(), p[4].value)
             return p[0], formula_result[0]
 
@@ -1829,8 +2097,8 @@ class ParserNadia():
         def And_introd(p):
             formula_result = p[2]
             formula = formula_result[1]
-            andIntrod = AndIntroductionDef(p[0].value, formula, p[4], p[6])
-            self.symbol_table.insert(andIntrod, p[0])
+            andIntrod = AndIntroductionDef(int(p[0].value), formula, int(p[4].value), int(p[6].value))
+            self.symbol_table.insert(andIntrod, p[0], (p[4], p[6]))
             self.box_latex += "{} & $\\land i$ {},{}\\\\\n".format(formula.toLatex(), p[4].value, p[6].value)
                 
             return p[0], formula_result[0]
@@ -1839,8 +2107,8 @@ class ParserNadia():
         def And_elim(p):
             formula_result = p[2]
             formula = formula_result[1]
-            andElim = AndEliminationDef(p[0].value, formula, p[4])
-            self.symbol_table.insert(andElim, p[0])
+            andElim = AndEliminationDef(int(p[0].value), formula, int(p[4].value))
+            self.symbol_table.insert(andElim, p[0], (p[4],))
             self.box_latex += "{} & $\\land e$ {}\\\\\n".format(formula.toLatex(), p[4].value)
             return p[0], formula_result[0]
 
@@ -1848,8 +2116,8 @@ class ParserNadia():
         def Or_elim(p):
             formula_result = p[2]
             formula = formula_result[1]
-            orElim = DisjunctionEliminationDef(p[0].value, formula, p[4], p[6], p[8], p[10], p[12])
-            self.symbol_table.insert(orElim, p[0])
+            orElim = DisjunctionEliminationDef(int(p[0].value), formula, int(p[4].value), int(p[6].value), int(p[8].value), int(p[10].value), int(p[12].value))
+            self.symbol_table.insert(orElim, p[0], (p[4], p[6], p[8], p[10], p[12]))
             self.box_latex += "{} & $\\lor e$ {}, {}-{}, {}-{}\\\\\n".format(formula.toLatex(), p[4].value, p[6].value, p[8].value, p[10].value, p[12].value)
             return p[0], formula_result[0]
         
@@ -1857,8 +2125,8 @@ class ParserNadia():
         def Neg_introd(p):
             formula_result = p[2]
             formula = formula_result[1]
-            negationIntrod = NegationIntroductionDef(p[0].value, formula, p[4], p[6])
-            self.symbol_table.insert(negationIntrod, p[0])
+            negationIntrod = NegationIntroductionDef(int(p[0].value), formula, int(p[4].value), int(p[6].value))
+            self.symbol_table.insert(negationIntrod, p[0], (p[4], p[6]))
             self.box_latex += "{} & $\lnot i$ {}-{}\\\\\n".format(formula.toLatex(), p[4].value, p[6].value)
             return p[0], formula_result[0]
 
@@ -1866,18 +2134,48 @@ class ParserNadia():
         def Bottom(p):
             formula_result = p[2]
             formula = formula_result[1]
-            bottom = BottomDef(p[0].value, formula, p[4])
-            self.symbol_table.insert(bottom, p[0])
+            bottom = BottomDef(int(p[0].value), formula, int(p[4].value))
+            self.symbol_table.insert(bottom, p[0], (p[4],))
             self.box_latex += "{} & $\\bot e$ {}\\\\\n".format(formula.toLatex(), p[4].value)
             return p[0], formula_result[0]
 
         @self.pg.production('step : NUM DOT formula RAA NUM DASH NUM')
+        @self.pg.production('step : NUM DOT formula PBC NUM DASH NUM')
         def Raa(p):
             formula_result = p[2]
             formula = formula_result[1]
-            raa = RaaDef(p[0].value, formula, p[4], p[6])
-            self.symbol_table.insert(raa, p[0])
-            self.box_latex += "{} & raa {}-{}\\\\\n".format(formula.toLatex(), p[4].value, p[6].value)
+            raa = RaaDef(int(p[0].value), formula, int(p[4].value), int(p[6].value))
+            self.symbol_table.insert(raa, p[0], (p[4], p[6]))
+            # pbc is the name of raa among the derived rules
+            label = 'PBC' if p[3].gettokentype() == 'PBC' else 'raa'
+            self.box_latex += "{} & {} {}-{}\\\\\n".format(formula.toLatex(), label, p[4].value, p[6].value)
+            return p[0], formula_result[0]
+
+        @self.pg.production('step : NUM DOT formula MODUS_TOLLENS NUM COMMA NUM')
+        def Modus_tollens(p):
+            formula_result = p[2]
+            formula = formula_result[1]
+            modusTollens = ModusTollensDef(int(p[0].value), formula, int(p[4].value), int(p[6].value))
+            self.symbol_table.insert(modusTollens, p[0], (p[4], p[6]))
+            self.box_latex += "{} & MT {}, {}\\\\\n".format(formula.toLatex(), p[4].value, p[6].value)
+            return p[0], formula_result[0]
+
+        @self.pg.production('step : NUM DOT formula DOUBLE_NEGATION NUM')
+        def Double_negation(p):
+            formula_result = p[2]
+            formula = formula_result[1]
+            doubleNegation = DoubleNegationDef(int(p[0].value), formula, int(p[4].value))
+            self.symbol_table.insert(doubleNegation, p[0], (p[4],))
+            self.box_latex += "{} & $\\lnot\\lnot$ {}\\\\\n".format(formula.toLatex(), p[4].value)
+            return p[0], formula_result[0]
+
+        @self.pg.production('step : NUM DOT formula EXCLUDED_MIDDLE')
+        def Excluded_middle(p):
+            formula_result = p[2]
+            formula = formula_result[1]
+            excludedMiddle = ExcludedMiddleDef(int(p[0].value), formula)
+            self.symbol_table.insert(excludedMiddle, p[0])
+            self.box_latex += "{} & LEM\\\\\n".format(formula.toLatex())
             return p[0], formula_result[0]
 
 #        @self.pg.production('step : NUM DOT formula COPY NUM')
@@ -1891,31 +2189,25 @@ class ParserNadia():
 #            return p[0], formula_result[0]
         @self.pg.production('step : NUM DOT formula COPY NUM')
         def Copy(p):
-            copied_scope = self.symbol_table.find_scope(p[4].value)
+            line = int(p[4].value)
+            copied_scope = self.symbol_table.find_scope(line)
             if self.symbol_table.check_scope_is_valid(copied_scope):
-                line = p[4].value
                 formula_result = p[2]
-                rule = copy.deepcopy(self.symbol_table.get_rule(line))
-                rule.is_copied = True
-                if(rule is not None):
-                    if isinstance(rule, HypothesisDef):
-                        rule.copied = rule.line
+                original = self.symbol_table.get_rule(line)
+                if(original is not None):
+                    rule = CopiedDef(int(p[0].value), original)
                     formula = formula_result[1]
-                    rule.line = p[0].value 
                     if(rule.formula != formula):
-                        formula_diff = rule.formula
-                        rule.formula = formula
                         self.has_error = True
-                        deduction_result.add_error(self.get_error(constants.COPY_DIFFERENT_FORMULE, formula_result[0], rule))
-                        rule.formula = formula_diff
+                        self.context.deduction_result.add_error(self.get_error(constants.COPY_DIFFERENT_FORMULE, formula_result[0], rule), constants.COPY_DIFFERENT_FORMULE)
                     self.box_latex += "{} & copie {}\\\\\n".format(formula.toLatex(), p[4].value)
+                    self.symbol_table.insert(rule, p[0], (p[4],))
                 else:
                     self.has_error = True
-                    deduction_result.add_error(self.get_error(constants.NONE_COPY, p[4], rule))
-                self.symbol_table.insert(rule, p[0])
+                    self.context.deduction_result.add_error(self.get_error(constants.NONE_COPY, p[4], original), constants.NONE_COPY)
             else:
                 self.has_error = True
-                deduction_result.add_error(self.get_error(constants.USING_DESCARTED_RULE, p[4], None))
+                self.context.deduction_result.add_error(self.get_error(constants.USING_DESCARTED_RULE, p[4], None), constants.USING_DESCARTED_RULE)
             return p[0], p[2][0]
 
 
@@ -1925,17 +2217,17 @@ class ParserNadia():
             rule = self.symbol_table.get_last_rule_from_scope()
             if rule==None:
                 self.has_error = True
-                deduction_result.add_error(self.get_error(constants.BOX_MUST_BE_DISPOSED_BY_RULE, p[0], rule))              
+                self.context.deduction_result.add_error(self.get_error(constants.BOX_MUST_BE_DISPOSED_BY_RULE, p[0], rule), constants.BOX_MUST_BE_DISPOSED_BY_RULE)              
                 return p[0], rule
-            elif(self.symbol_table.get_box_start()):
+            elif(self.symbol_table.get_box_start() is not None):
                 self.symbol_table.end_scope(rule.line)
                 self.box_latex = self.box_latex[:-3] + '\n'
                 self.box_latex += "\end{subproof}\n"
             else:
                 self.has_error = True
-                deduction_result.add_error(self.get_error(constants.CLOSE_BRACKET_WITHOUT_BOX, p[0], rule))
+                self.context.deduction_result.add_error(self.get_error(constants.CLOSE_BRACKET_WITHOUT_BOX, p[0], rule), constants.CLOSE_BRACKET_WITHOUT_BOX)
             token = p[0]
-            token.value = rule.line
+            token.value = str(rule.line)
             return p[0], rule.formula
 
 
@@ -1943,8 +2235,8 @@ class ParserNadia():
         def For_all_elim(p):
           formula_result = p[2]
           formula = formula_result[1]
-          forAllElimination = ForAllEliminationDef(p[0].value, formula, p[4])
-          self.symbol_table.insert(forAllElimination, p[0])
+          forAllElimination = ForAllEliminationDef(int(p[0].value), formula, int(p[4].value))
+          self.symbol_table.insert(forAllElimination, p[0], (p[4],))
           self.box_latex += "{} & $\\forall e$ {}\\\\\n".format(formula.toLatex(), p[4].value)
           return p[0], formula_result[0]
 
@@ -1953,8 +2245,8 @@ class ParserNadia():
           formula_result = p[2]
           formula = formula_result[1]
           #self.symbol_table.add_scope(p[0].value)
-          existsIntroduction = ExistsIntroductionDef(p[0].value, formula, p[4])
-          self.symbol_table.insert(existsIntroduction, p[0])
+          existsIntroduction = ExistsIntroductionDef(int(p[0].value), formula, int(p[4].value))
+          self.symbol_table.insert(existsIntroduction, p[0], (p[4],))
           self.box_latex += "{} & $\\exists i$ {}\\\\\n".format(formula.toLatex(), p[4].value)
           return p[0], formula_result[0]
 
@@ -1962,8 +2254,8 @@ class ParserNadia():
         def Exists_elim(p):
             formula_result = p[2]
             formula = formula_result[1]
-            existsElim = ExistsEliminationtionDef(p[0].value, formula, p[4], p[6], p[8])
-            self.symbol_table.insert(existsElim, p[0])
+            existsElim = ExistsEliminationtionDef(int(p[0].value), formula, int(p[4].value), int(p[6].value), int(p[8].value))
+            self.symbol_table.insert(existsElim, p[0], (p[4], p[6], p[8]))
             self.box_latex += "{} & $\\exists e$ {},{}-{}\\\\\n".format(formula.toLatex(), p[4].value, p[6].value, p[8].value)
             return p[0], formula_result[0]
 
@@ -1971,8 +2263,8 @@ class ParserNadia():
         def For_all_intro(p):
             formula_result = p[2]
             formula = formula_result[1]
-            allIntrod = ForAllIntroductiontionDef(p[0].value, formula, p[4], p[6])
-            self.symbol_table.insert(allIntrod, p[0])
+            allIntrod = ForAllIntroductiontionDef(int(p[0].value), formula, int(p[4].value), int(p[6].value))
+            self.symbol_table.insert(allIntrod, p[0], (p[4], p[6]))
             self.box_latex += "{} & $\\forall i$ {}-{}\\\\\n".format(formula.toLatex(), p[4].value, p[6].value)
             return p[0], formula_result[0]
 
@@ -1984,16 +2276,16 @@ class ParserNadia():
         @self.pg.production('step : NUM DOT formula NEG_ELIM NUM DASH NUM')
         def Wrong_use_conective_references(p):
             self.has_error = True
-            wrong_rule = WrongDef(p[0].value, p[2])
-            deduction_result.add_error(self.get_error(constants.INVALID_RULE, p[3], wrong_rule))
+            wrong_rule = WrongDef(int(p[0].value), p[2])
+            self.context.deduction_result.add_error(self.get_error(constants.INVALID_RULE, p[3], wrong_rule), constants.INVALID_RULE)
             return p[0], p[2]
 
         @self.pg.production('step : NUM DOT formula AND_ELIM NUM COMMA NUM ')
         @self.pg.production('step : NUM DOT formula AND_ELIM NUM DASH NUM')
         def Wrong_use_conective_reference(p):
             self.has_error = True
-            wrong_rule = WrongDef(p[0].value, p[2])
-            deduction_result.add_error(self.get_error(constants.INVALID_RULE_ONE_REFERENCE, p[3], wrong_rule))
+            wrong_rule = WrongDef(int(p[0].value), p[2])
+            self.context.deduction_result.add_error(self.get_error(constants.INVALID_RULE_ONE_REFERENCE, p[3], wrong_rule), constants.INVALID_RULE_ONE_REFERENCE)
             return p[0], p[2]
 
 
@@ -2085,11 +2377,13 @@ class ParserNadia():
                 
             raise ValueError("@@"+error)
 
+    def source_line(self, lineno):
+        return self.state.splitlines()[lineno-1]
+
     def get_error(self, type_error, token_error, rule):
-        productions = self.state.splitlines()
         column_error = token_error.getsourcepos().colno
         erro = "Erro de sintaxe na linha {}:\n".format(token_error.getsourcepos().lineno)
-        erro += productions[token_error.getsourcepos().lineno-1] + "\n"
+        erro += self.source_line(token_error.getsourcepos().lineno) + "\n"
         for i in range(column_error-1):
             erro += ' '
         if type_error == constants.REFERENCED_FORMULE_NONE:## REVER SE NAO EXCLUIR
@@ -2150,7 +2444,7 @@ class ParserNadia():
         elif type_error == constants.BOX_MUST_BE_DISPOSED_BY_RULE:
             erro += "^, Esta caixa dever ser fechada em linha imediatamente posterior pela regra que a introduziu."
         elif type_error == constants.INVALID_SUBSTITUTION_UNIVERSAL:
-            erro += "^, A fórmula {} não é uma substituição válida da fórmula universal refenciada na linha {}.".format(rule.formula.toString(), rule.reference1.value)
+            erro += "^, A fórmula {} não é uma substituição válida da fórmula universal refenciada na linha {}.".format(rule.formula.toString(), rule.reference1)
         elif type_error == constants.INVALID_CONCLUSION_EXISTENTIAL_LAST_RULE:
             erro += "^, A formula da conclusão desta regra deve ser a mesma fórmula refenciada na linha {}.".format(token_error.value)
         elif type_error == constants.INVALID_CONCLUSION_UNIVERSAL_LAST_RULE:
@@ -2158,7 +2452,7 @@ class ParserNadia():
         elif type_error == constants.INVALID_UNIVERSAL_FORMULA:
             erro += "^, A fórmula referenciada na regra do universal não é uma fórmula do tipo universal."
         elif type_error == constants.INVALID_SUBSTITUTION_EXISTENTIAL:
-            erro += "^, A fórmula {} não é uma substituição válida da fórmula existencial refenciada na linha {}.".format(rule.formula.toString(), rule.reference1.value)
+            erro += "^, A fórmula {} não é uma substituição válida da fórmula existencial refenciada na linha {}.".format(rule.formula.toString(), rule.reference1)
 #            erro += "^, A fórmula refenciada na linha {} não é uma substituição correta da variável na fórmula do existencial desta regra.".format(token_error.value)
         elif type_error == constants.VARIABLE_IS_NOT_FRESH_VARIABLE:
             erro += "^, A variável utilizada na linha {} é uma variável livre de uma fórmula definida anteriormente e, portanto, não pode ser utilizada nesta regra.".format(token_error.value)
@@ -2190,14 +2484,22 @@ class ParserNadia():
     def theorem_to_latex(self,parentheses=False):
       return self.symbol_table.theoremToLatex(parentheses=parentheses)
 
+    @staticmethod
+    def getWarmParser():
+      # Building the LR tables costs more than checking a proof, so each thread
+      # builds them once and reuses them for the next proofs.
+      if not hasattr(warm_parsers, 'proof'):
+        pg = ParserNadia(state='')
+        pg.parse()
+        warm_parsers.proof = (get_warm_lexer(), pg, pg.get_parser())
+      return warm_parsers.proof
+
     @staticmethod
     def getProof(input_text=''):
-      lexer = Lexer().get_lexer()
+      lexer, pg, parser = ParserNadia.getWarmParser()
       tokens = lexer.lex(input_text)
 
-      pg = ParserNadia(state=input_text)
-      pg.parse()
-      parser = pg.get_parser()
+      pg.reset(input_text)
       result = parser.parse(tokens)
       return result
     # def getProof(input_text=''):
@@ -2232,17 +2534,32 @@ class ParserNadia():
         return ", ".join(f.toLatex(parentheses=parentheses) for f in premisses) +' \\vdash '+conclusion.toLatex(parentheses=parentheses)
 
 
-def check_proof(input_proof, input_theorem=None, display_theorem=True, display_fitch=True, display_gentzen=True):
+class check_status:
+  CORRECT = 0 # A demonstração está correta
+  DIFFERENT_THEOREM = 1 # A demonstração é válida, mas de outro teorema
+  INVALID_THEOREM = 2 # O teorema informado não é válido
+  INVALID_PROOF = 3 # A demonstração tem erros
+  TIMEOUT = 4 # A verificação excedeu o tempo limite
+  MEMORY_LIMIT = 5 # A verificação excedeu o limite de memória
+  CRASHED = 6 # A verificação terminou com um erro inesperado
+
+def verify_proof(input_proof, input_theorem=None, display_theorem=True, display_fitch=True, display_gentzen=True, cache=None):
+    # Returns the status of the check, the sequent proved (None when the proof has errors),
+    # the errors found, the message shown by check_proof and the codes (constants) of the
+    # errors. If a ProofCache is given, the result is looked up there first.
+    if cache is not None:
+        return cache.verify_proof(input_proof, input_theorem, display_theorem, display_fitch, display_gentzen)
     try:
         result = ParserNadia.getProof(input_proof)
         r = ''
 
         if(result.errors==[]):
             s_theorem = ParserNadia.toString(result.premisses, result.conclusion)
+            status = check_status.CORRECT
             if input_theorem!=None: 
                 premisses, conclusion = ParserTheorem.getTheorem(input_theorem)
                 if conclusion == None:
-                    return f'{input_theorem} não é um teorema válido!'
+                    return check_status.INVALID_THEOREM, s_theorem, [], f'{input_theorem} não é um teorema válido!', []
 
                 set_premisses = set([p.toString() for p in premisses])
                 set_premisses_result = set([p.toString() for p in result.premisses])
@@ -2251,6 +2568,7 @@ def check_proof(input_proof, input_theorem=None, display_theorem=True, display_f
                     if display_theorem:
                        r += "\n"+s_theorem
                 else:
+                    status = check_status.DIFFERENT_THEOREM
                     r += f"Sua demostração de {s_theorem} é válida, mas é diferente da demonstração solicitada {input_theorem}"
             else:
                 r += "A demonstração está correta."
@@ -2262,19 +2580,30 @@ def check_proof(input_proof, input_theorem=None, display_theorem=True, display_f
             if display_gentzen:
                 r += "\n\nCódigo da demonstração no estilo Gentzen em Latex:\n"
                 r += str(result.gentzen)
+            return status, s_theorem, [], r, []
         else:
             r += "Os seguintes erros foram encontrados:\n\n"
             for error in result.errors:
                 r += str(error)
-        return r
+            if input_theorem!=None:
+                r += countermodel_message(input_theorem)
+            return check_status.INVALID_PROOF, None, [str(error) for error in result.errors], r, list(result.error_codes)
     except ValueError:
         s = traceback.format_exc()
         result = (s.split("@@"))[-1]
         r = "Os seguintes erros foram encontrados:\n\n"
         r += result
-        return r
-    else:
-        pass
+        if input_theorem!=None:
+            r += countermodel_message(input_theorem)
+        return check_status.INVALID_PROOF, None, [result], r, [constants.SYNTAX_ERROR]
+
+def countermodel_message(input_theorem):
+    # The semantics module imports this one
+    from nadia.nadia_pt_semantics import countermodel_message
+    return countermodel_message(input_theorem)
+
+def check_proof(input_proof, input_theorem=None, display_theorem=True, display_fitch=True, display_gentzen=True, cache=None):
+    return verify_proof(input_proof, input_theorem, display_theorem, display_fitch, display_gentzen, cache=cache)[3]
 
 
 
@@ -2421,15 +2750,21 @@ class ParserTheorem():
     def get_parser(self):
         return self.pg.build()
     
+    @staticmethod
+    def getWarmParser():
+      if not hasattr(warm_parsers, 'theorem'):
+        pg = ParserTheorem(state='')
+        pg.parse()
+        warm_parsers.theorem = (get_warm_lexer(), pg, pg.get_parser())
+      return warm_parsers.theorem
+
     @staticmethod
     def getTheorem(input_text=''):
         try:
-          lexer = Lexer().get_lexer()
+          lexer, pg, parser = ParserTheorem.getWarmParser()
           tokens = lexer.lex(input_text)
 
-          pg = ParserTheorem(state=input_text)
-          pg.parse()
-          parser = pg.get_parser()
+          pg.state = input_text
           formulas, conclusion = parser.parse(tokens)
           return formulas, conclusion
         except ValueError:
@@ -2589,15 +2924,22 @@ class ParserFormula():
     
     def get_parser(self):
         return self.pg.build()
+
+    @staticmethod
+    def getWarmParser():
+      if not hasattr(warm_parsers, 'formula'):
+        pg = ParserFormula(state='')
+        pg.parse()
+        warm_parsers.formula = (get_warm_lexer(), pg, pg.get_parser())
+      return warm_parsers.formula
+
     @staticmethod
     def getFormula(input_text=''):
         try:
-          lexer = Lexer().get_lexer()
+          lexer, pg, parser = ParserFormula.getWarmParser()
           tokens = lexer.lex(input_text)
 
-          pg = ParserFormula(state=input_text)
-          pg.parse()
-          parser = pg.get_parser()
+          pg.state = input_text
           result = parser.parse(tokens)
           return result
         except ValueError:
@@ -2,6 +2,10 @@ import ipywidgets as widgets
 from IPython.display import display, Markdown, HTML
 import traceback
 from nadia.nadia_pt_fo import ParserNadia, ParserTheorem, ParserFormula
+from nadia.nadia_pt_incremental import IncrementalChecker
+from nadia.nadia_pt_bdd import grade_formulas, equivalence_status
+from nadia.nadia_pt_semantics import valuation_to_string
+from nadia.nadia_pt_models import model_to_string
 
 def nadia(input_proof='', input_text_assumptions=[], input_text_conclusion='', height_layout='300px',default_gentzen=False, default_fitch=False):
   layout = widgets.Layout(width='90%', height=height_layout)
@@ -42,12 +46,14 @@ def nadia(input_proof='', input_text_assumptions=[], input_text_conclusion='', h
   else:  
     display(Markdown('### Digite sua demonstração em Dedução Natural:'))
   display(input, wButtons, output)
+  # Each click checks again only what the edits changed
+  checker = IncrementalChecker()
 
   def on_button_run_clicked(_):
     output.clear_output()
     with output:
       try:
-        result = ParserNadia.getProof(input.value)
+        result = checker.check(input.value)
         if result!=None:
           if(result.errors==[]):
               s_theorem = ParserNadia.toString(result.premisses, result.conclusion)
@@ -97,12 +103,13 @@ def nadia_theorem(input_theorem, input_proof='', height_layout='300px',default_g
   
   display(widgets.HTML(f'<h3>Digite a demonstração de {input_theorem} em Dedução Natural:</h3>'), 
           input, wButtons, output)
+  checker = IncrementalChecker()
 
   def on_button_run_clicked(_):
     output.clear_output()
     with output:
       try:
-        result = ParserNadia.getProof(input.value)
+        result = checker.check(input.value)
         if result!=None:
           if(result.errors==[]):
               s_theorem = ParserNadia.toString(result.premisses, result.conclusion)
@@ -364,7 +371,7 @@ def verify_valid_conclusion(input_assumptions, input_conclusion, result_value=Fa
         display(HTML('<font color="red">Infelizmente, você errou a questão. Tente novamente!</font>'))
   run.on_click(on_button_run_clicked)
 
-def verify_formula(input_string=''):
+def verify_formula(input_string='', input_reference=None):
   layout = widgets.Layout(width='90%')
   run = widgets.Button(description="Verificar")
   input = widgets.Text(
@@ -393,6 +400,15 @@ def verify_formula(input_string=''):
                 display(Markdown(rf'${s}$'))
               else:
                 display(HTML(rf'{result.toString(parentheses=cParentheses.value)}'))
+              if input_reference:
+                grade = grade_formulas(input_reference, [input.value])[0]
+                if grade.status == equivalence_status.EQUIVALENT:
+                  display(HTML(r'<font color="blue">Sua fórmula é equivalente à fórmula esperada.</font>'))
+                elif grade.status == equivalence_status.NOT_EQUIVALENT:
+                  countermodel = valuation_to_string(grade.countermodel) if isinstance(grade.countermodel, dict) else model_to_string(grade.countermodel)
+                  display(HTML(rf'<font color="red">Sua fórmula não é equivalente à fórmula esperada. Elas têm valores diferentes em: {countermodel}.</font>'))
+                else:
+                  display(HTML(r'<font color="red">Não foi possível decidir se sua fórmula é equivalente à fórmula esperada.</font>'))
           else:
             display(HTML(r'<font color="red">A definição da fórmula não está correta, verifique se todas regras foram aplicadas corretamente. Lembre-se que uma fórmula é definida pela seguinte BNF: F :== P | ~ P | P & Q | P | Q | P -> Q | P <-> Q | (P), onde P,Q (em caixa alta) são átomos.</font>'))
       except ValueError:
@@ -0,0 +1,293 @@
+from collections import namedtuple
+from functools import lru_cache
+from nadia.nadia_pt_fo import ParserTheorem, AtomFormula, NegationFormula, BinaryFormula, ImplicationFormula, QuantifierFormula, HypothesisDef, HypothesisFirstOrderDef
+from nadia.nadia_pt_prover import variable_names
+
+# Scores of the hints: the goal of the box (or the step that closes or disposes the box),
+# a step after which the goal follows by one elimination, the box of the introduction of
+# the goal, a formula that is part of the goal and raa. The scores of the subgoals (e.g. X
+# when the goal is @ and ~X is visible) are halved at each level.
+GOAL = 100
+NEXT_TO_GOAL = 50
+BOX = 40
+SUBFORMULA = 10
+CLASSICAL = 5
+# Levels of the subgoals
+SUBGOALS = 2
+BOTTOM = AtomFormula('@')
+
+# A next step of a proof built in a ProofSession: add_line(formula, rule, references) for
+# the rules, open_box(variable, formula) for 'hip' and close_box() for '}' (see
+# apply_hint). The formula is a text (None for the box of Ai and for '}').
+Hint = namedtuple('Hint', ['formula', 'rule', 'references', 'variable', 'score'])
+
+@lru_cache(maxsize=256)
+def parse_theorem(input_theorem):
+    return ParserTheorem.getTheorem(input_theorem)
+
+def is_binary(formula, key):
+    # The substitutions return BinaryFormula, so the connective is told by the key
+    return isinstance(formula, BinaryFormula) and formula.key == key
+
+def hypothesis_of(scope):
+    first = scope.first.rule if scope.first is not None else None
+    if isinstance(first, (HypothesisDef, HypothesisFirstOrderDef)) and first.line == scope.start_line:
+        return first.formula
+    return None
+
+class HintEngine():
+    '''Next steps of a proof built in a ProofSession, for the theorem it must prove. The
+    hints are computed from the symbol table already checked by the session (the proof is
+    not parsed again): the lines visible at the end of the proof are indexed by their
+    formulas, the eliminations (&e, ->e, ~e, @e and Ae) of these lines are found in one
+    step and again in two steps, and the introductions (or the boxes) that match the goal
+    of the box and its subgoals are added. The goal of each box follows from the
+    conclusion and the hypotheses of the boxes open (e.g. B in the box of A when the goal
+    is A->B).'''
+    def __init__(self, session):
+        self.session = session
+        # Text of the formulas of the lines, which are shared by the versions of the session
+        self.texts = {}
+
+    def text(self, formula):
+        cached = self.texts.get(id(formula))
+        if cached is None or cached[0] is not formula:
+            cached = (formula, formula.toString())
+            self.texts[id(formula)] = cached
+        return cached[1]
+
+    def hints(self, input_theorem, limit=10):
+        '''Returns up to limit hints (Hint) for the next line, the highest scores first.'''
+        premisses, conclusion = parse_theorem(input_theorem)
+        if conclusion is None:
+            raise ValueError('{} não é um teorema válido!'.format(input_theorem))
+        state = self.session.state
+        table = state.table
+        chain = []
+        number = table.current_scope
+        while number is not None:
+            chain.append(table.get_scope(number))
+            number = chain[-1].parent
+        chain.reverse()
+        # Formula text -> (formula, last visible line)
+        lines = {}
+        variables = set()
+        for scope in chain:
+            entries = []
+            entry = scope.last
+            while entry is not None:
+                entries.append(entry)
+                entry = entry.previous
+            for entry in reversed(entries):
+                lines[self.text(entry.rule.formula)] = (entry.rule.formula, entry.rule.line)
+                variables |= entry.free_variables
+            if scope.variable is not None:
+                variables.add(scope.variable)
+        known = {text: formula for text, (formula, line) in lines.items()}
+        goal = self.goal(chain, conclusion, known)
+        # Text of the goal and of its subgoals -> (formula, level)
+        targets = self.subgoals(goal, known) if goal is not None else {}
+        hints = {}
+        def add(formula, rule, references=(), variable=None, score=0):
+            text = self.text(formula) if formula is not None else None
+            key = (text, rule, references, variable)
+            hints[key] = max(hints.get(key, score), score)
+        pending = [table.get_scope(number) for number in state.pending if table.get_scope(number).parent == table.current_scope]
+        if pending:
+            self.disposals(pending, lines, targets, add)
+        else:
+            if len(chain) == 1:
+                for premisse in premisses:
+                    if self.text(premisse) not in lines:
+                        add(premisse, 'pre', score=GOAL)
+            last = chain[-1].last
+            if len(chain) == 1 and last is not None and last.rule.formula == goal:
+                # The proof is complete
+                return []
+            if goal is not None and self.text(goal) in lines and (last is None or last.rule.formula != goal):
+                add(goal, 'copie', (lines[self.text(goal)][1],), score=GOAL)
+            elif len(chain) > 1 and last is not None and self.text(last.rule.formula) in targets:
+                # The box ends with the goal (or with a subgoal, e.g. in a box of |e)
+                add(None, '}', score=GOAL >> targets[self.text(last.rule.formula)][1])
+            self.eliminations(lines, known, variables, goal, targets, add)
+            for formula, level in targets.values():
+                self.introductions(lines, variables, formula, GOAL >> level, add)
+            self.boxes(lines, variables, goal, add)
+        ranked = [Hint(text, rule, references, variable, score + (SUBFORMULA if text in targets else 0))
+                  for (text, rule, references, variable), score in hints.items()]
+        ranked.sort(key=lambda hint: (-hint.score, len(hint.formula or ''), hint.references))
+        return ranked[:limit]
+
+    def subgoals(self, goal, known):
+        # The goal, the parts of & and |, X for ~X when the goal is @ and X for X->goal
+        targets = {self.text(goal): (goal, 0)}
+        level = [goal]
+        for depth in range(1, SUBGOALS + 1):
+            following = []
+            for formula in level:
+                children = []
+                if is_binary(formula, '&') or is_binary(formula, '|'):
+                    children = [formula.left, formula.right]
+                elif formula == BOTTOM:
+                    children = [f.formula for f in known.values() if isinstance(f, NegationFormula)]
+                children += [f.left for f in known.values() if is_binary(f, '->') and f.right == formula]
+                for child in children:
+                    if self.text(child) not in targets:
+                        targets[self.text(child)] = (child, depth)
+                        following.append(child)
+            level = following
+        return targets
+
+    def goal(self, chain, conclusion, known):
+        # Goal of the last box open, or None when it does not follow from the conclusion. A
+        # box is of the introduction of the goal or of one of its subgoals; the boxes of |e
+        # and Ee have the goal of the box around them.
+        goal = conclusion
+        for scope in chain[1:]:
+            if goal is None:
+                return None
+            hypothesis = hypothesis_of(scope)
+            candidates = [formula for formula, level in sorted(self.subgoals(goal, known).values(), key=lambda target: target[1])]
+            if hypothesis is None:
+                universals = [f for f in candidates if isinstance(f, QuantifierFormula) and f.forAll]
+                goal = universals[0].formula.substitution(universals[0].variable, scope.variable) if universals else None
+            elif scope.variable is None:
+                for candidate in candidates:
+                    if is_binary(candidate, '->') and candidate.left == hypothesis:
+                        goal = candidate.right
+                        break
+                    if (isinstance(candidate, NegationFormula) and candidate.formula == hypothesis) or (isinstance(hypothesis, NegationFormula) and hypothesis.formula == candidate):
+                        goal = BOTTOM
+                        break
+        return goal
+
+    def consequences(self, new, known, variables):
+        # Eliminations of one step with at least one premisse in new (text -> formula):
+        # (formula, rule, texts of the premisses)
+        result = []
+        for text, formula in new.items():
+            if is_binary(formula, '&'):
+                result += [(formula.left, '&e', (text,)), (formula.right, '&e', (text,))]
+            elif is_binary(formula, '->'):
+                antecedent = self.text(formula.left)
+                if antecedent in known:
+                    result.append((formula.right, '->e', (antecedent, text)))
+            elif isinstance(formula, NegationFormula):
+                positive = self.text(formula.formula)
+                if positive in known:
+                    result.append((BOTTOM, '~e', (positive, text)))
+            elif isinstance(formula, QuantifierFormula) and formula.forAll:
+                for term in sorted(variables) or [formula.variable]:
+                    result.append((formula.formula.substitution(formula.variable, term), 'Ae', (text,)))
+            # The antecedents and the positive formulas that arrive after their formula
+            if new is not known:
+                for other, other_formula in known.items():
+                    if other in new:
+                        continue
+                    if is_binary(other_formula, '->') and self.text(other_formula.left) == text:
+                        result.append((other_formula.right, '->e', (text, other)))
+                    elif isinstance(other_formula, NegationFormula) and self.text(other_formula.formula) == text:
+                        result.append((BOTTOM, '~e', (text, other)))
+        return result
+
+    def eliminations(self, lines, known, variables, goal, targets, add):
+        first = {}
+        for formula, rule, sources in self.consequences(known, known, variables):
+            text = self.text(formula)
+            if text not in known:
+                references = tuple(lines[source][1] for source in sources)
+                first.setdefault(text, (formula, rule, references))
+        if '@' in lines and goal is not None and self.text(goal) not in lines:
+            first.setdefault(self.text(goal), (goal, '@e', (lines['@'][1],)))
+        # A step is better if a goal follows from it by one more elimination
+        leads = {}
+        step = {text: formula for text, (formula, rule, references) in first.items()}
+        for formula, rule, sources in self.consequences(step, dict(known, **step), variables):
+            target = targets.get(self.text(formula)) or (targets.get(self.text(goal)) if formula == BOTTOM and goal is not None else None)
+            if target is not None:
+                for source in sources:
+                    if source in step:
+                        leads[source] = max(leads.get(source, 0), NEXT_TO_GOAL >> target[1])
+        for text, (formula, rule, references) in first.items():
+            score = GOAL >> targets[text][1] if text in targets else leads.get(text, 0)
+            add(formula, rule, references, score=score)
+
+    def introductions(self, lines, variables, goal, score, add):
+        # The introductions of the goal, or the boxes of them
+        def line(formula):
+            found = lines.get(self.text(formula))
+            return found[1] if found is not None else None
+        box = score * BOX // GOAL
+        if is_binary(goal, '&') and line(goal.left) is not None and line(goal.right) is not None:
+            add(goal, '&i', (line(goal.left), line(goal.right)), score=score)
+        elif is_binary(goal, '|'):
+            for side in (goal.left, goal.right):
+                if line(side) is not None:
+                    add(goal, '|i', (line(side),), score=score)
+        elif is_binary(goal, '->'):
+            add(goal.left, 'hip', score=box)
+        elif isinstance(goal, NegationFormula):
+            add(goal.formula, 'hip', score=box)
+        elif isinstance(goal, QuantifierFormula) and goal.forAll:
+            add(None, 'hip', variable=self.fresh(variables, goal), score=box)
+        elif isinstance(goal, QuantifierFormula):
+            for text, (formula, number) in lines.items():
+                if goal.valid_substitution(formula):
+                    add(goal, 'Ei', (number,), score=score)
+
+    def boxes(self, lines, variables, goal, add):
+        # The boxes of |e and Ee of the visible lines and of raa of the goal
+        for text, (formula, number) in lines.items():
+            if is_binary(formula, '|') and self.text(formula.left) not in lines and self.text(formula.right) not in lines:
+                add(formula.left, 'hip', score=BOX)
+            elif isinstance(formula, QuantifierFormula) and not formula.forAll:
+                variable = self.fresh(variables, goal)
+                add(formula.formula.substitution(formula.variable, variable), 'hip', variable=variable, score=BOX)
+        if goal is not None and goal != BOTTOM and self.text(NegationFormula(goal)) not in lines:
+            add(NegationFormula(goal), 'hip', score=CLASSICAL)
+
+    def disposals(self, pending, lines, targets, add):
+        # The next line must dispose the boxes just closed
+        box = pending[-1]
+        hypothesis = hypothesis_of(box)
+        result = box.last.rule.formula
+        references = (box.start_line, box.end_line)
+        def score(formula):
+            target = targets.get(self.text(formula))
+            return GOAL >> target[1] if target is not None else 0
+        if box.variable is None:
+            implication = ImplicationFormula(hypothesis, result)
+            add(implication, '->i', references, score=score(implication))
+            if result == BOTTOM:
+                add(NegationFormula(hypothesis), '~i', references, score=score(NegationFormula(hypothesis)))
+                if isinstance(hypothesis, NegationFormula):
+                    add(hypothesis.formula, 'raa', references, score=score(hypothesis.formula))
+            for text, (formula, number) in lines.items():
+                if is_binary(formula, '|') and hypothesis in (formula.left, formula.right):
+                    if len(pending) > 1 and hypothesis_of(pending[-2]) == formula.left and hypothesis == formula.right and pending[-2].last.rule.formula == result:
+                        add(result, '|e', (number, pending[-2].start_line, pending[-2].end_line) + references, score=GOAL)
+                    elif hypothesis == formula.left:
+                        add(formula.right, 'hip', score=GOAL)
+        elif hypothesis is None:
+            universals = [f for f, level in targets.values() if isinstance(f, QuantifierFormula) and f.forAll and f.formula.substitution(f.variable, box.variable) == result]
+            add(universals[0] if universals else QuantifierFormula(True, box.variable, result), 'Ai', references, score=GOAL)
+        elif box.variable not in result.free_variables():
+            for text, (formula, number) in lines.items():
+                if isinstance(formula, QuantifierFormula) and not formula.forAll and formula.formula.substitution(formula.variable, box.variable) == hypothesis:
+                    add(result, 'Ee', (number,) + references, score=GOAL)
+
+    def fresh(self, variables, goal):
+        used = variables | goal.all_variables() if goal is not None else variables
+        return next(name for name in variable_names() if name not in used)
+
+def next_step_hints(session, input_theorem, limit=10):
+    '''Returns up to limit hints (Hint) for the next line of the proof of the session.'''
+    return HintEngine(session).hints(input_theorem, limit)
+
+def apply_hint(session, hint):
+    '''Adds the hint to the session and returns the errors of its line.'''
+    if hint.rule == 'hip':
+        return session.open_box(hint.variable, hint.formula)
+    if hint.rule == '}':
+        return session.close_box()
+    return session.add_line(hint.formula, hint.rule, hint.references)
@@ -0,0 +1,155 @@
+from rply.errors import LexingError
+from rply.token import Token, SourcePosition
+from nadia.nadia_pt_fo import ParserNadia, CopiedDef, ExistsEliminationtionDef, ForAllIntroductiontionDef, get_warm_lexer, derived_rule_names
+
+REFERENCES = ('reference1', 'reference2', 'reference3', 'reference4', 'reference5')
+
+class IncrementalChecker():
+    '''Checks the successive versions of a proof (e.g. after each edit in the editor) with
+    the work of the previous check: only the lines that changed are lexed again, and a rule
+    is evaluated again only if its lines, the lines it references (directly or through the
+    copied lines), the boxes it closes or the variables before them changed. The result is
+    the same of ParserNadia.getProof.'''
+    def __init__(self):
+        # Tokens of each line of the last check, by its text
+        self.line_tokens = {}
+        # Errors of each rule of the last check, by the key of its dependencies
+        self.verdicts = {}
+        self.new_verdicts = {}
+        self.index = None
+        self.evaluated = 0
+        self.reused = 0
+
+    def tokens(self, input_text):
+        # The lines are lexed one by one, except when a block comment (## ... ##) may span them
+        lexer = get_warm_lexer()
+        if '##' in input_text:
+            return lexer.lex(input_text)
+        tokens = []
+        line_tokens = {}
+        offset = 0
+        try:
+            for lineno, line in enumerate(input_text.split('\n'), 1):
+                cached = self.line_tokens.get(line)
+                if cached is None:
+                    cached = [(t.name, t.value, t.source_pos.idx, t.source_pos.colno) for t in lexer.lexer.lex(line)]
+                line_tokens[line] = cached
+                # The parser changes the tokens, so they are created again at each check
+                for name, value, idx, colno in cached:
+                    tokens.append(Token(name, value, SourcePosition(offset + idx, lineno, colno)))
+                offset += len(line) + 1
+        except LexingError:
+            return lexer.lex(input_text)
+        self.line_tokens = line_tokens
+        # The names of the derived rules depend on the tokens before them, on other lines
+        return derived_rule_names(tokens)
+
+    def check(self, input_text):
+        '''Same as ParserNadia.getProof(input_text).'''
+        lexer, pg, parser = ParserNadia.getWarmParser()
+        tokens = self.tokens(input_text)
+        pg.reset(input_text, evaluator=self)
+        self.index = None
+        self.new_verdicts = {}
+        try:
+            result = parser.parse(tokens)
+        finally:
+            pg.reset('')
+        self.verdicts = self.new_verdicts
+        self.new_verdicts = {}
+        self.index = None
+        return result
+
+    def evaluate(self, parser, rule, deduction_result):
+        if self.index is None:
+            self.index = ProofIndex(parser.symbol_table, parser.state)
+        key = self.index.rule_key(rule) if not self.index.duplicated else None
+        verdict = self.verdicts.get(key) if key is not None else None
+        if verdict is None:
+            start = len(deduction_result.errors)
+            has_error = parser.has_error
+            parser.has_error = False
+            rule.evaluation(parser, deduction_result)
+            verdict = (deduction_result.errors[start:], deduction_result.error_codes[start:], parser.has_error)
+            parser.has_error = has_error
+            self.evaluated += 1
+        else:
+            for error, code in zip(verdict[0], verdict[1]):
+                deduction_result.add_error(error, code)
+            self.reused += 1
+        parser.has_error = parser.has_error or verdict[2]
+        if key is not None:
+            self.new_verdicts[key] = verdict
+
+class ProofIndex():
+    # Lines, scopes and source of the rules of a checked proof, used to build the keys of the
+    # rules. The key has everything that the evaluation of the rule reads.
+    def __init__(self, symbol_table, input_text):
+        self.symbol_table = symbol_table
+        self.source = input_text.splitlines()
+        self.rules = {}
+        self.scopes = {}
+        self.numbers = {}
+        self.starts = {}
+        self.duplicated = False
+        self.line_keys = {}
+        self.scope_keys = {}
+        for name, scope in symbol_table.symbol_table.items():
+            self.starts.setdefault(scope['start_line'], []).append(name)
+            for rule, number in zip(scope['rules'], scope['lines']):
+                if rule.line in self.rules:
+                    self.duplicated = True
+                self.rules[rule.line] = rule
+                self.scopes[rule.line] = name
+                self.numbers[rule.line] = number
+
+    def scope_key(self, name):
+        key = self.scope_keys.get(name)
+        if key is None:
+            scope = self.symbol_table.symbol_table[name]
+            parent = self.scope_key(scope['parent']) if scope['parent'] is not None else ()
+            key = ((name, scope['start_line'], scope['end_line'], scope['variable']),) + parent
+            self.scope_keys[name] = key
+        return key
+
+    def line_key(self, line):
+        key = self.line_keys.get(line)
+        if key is None:
+            rule = self.rules.get(line)
+            if rule is None:
+                key = (line, None)
+            else:
+                original = self.line_key(rule.original.line) if isinstance(rule, CopiedDef) else None
+                key = (line, self.rule_source(rule), self.scope_key(self.scopes[line]), original)
+            self.line_keys[line] = key
+        return key
+
+    def rule_source(self, rule):
+        # The source lines of the rule, from its number to its last reference
+        tokens = self.symbol_table.reference_tokens.get(rule.line, ())
+        first = self.numbers[rule.line].getsourcepos().lineno
+        last = max([first] + [token.getsourcepos().lineno for token in tokens])
+        return first, tuple(self.source[first - 1:last])
+
+    def box_key(self, line):
+        # The box of the line and the boxes that start at it, with their first and last rules
+        boxes = []
+        names = list(self.starts.get(line, ()))
+        if line in self.scopes:
+            names.append(self.scopes[line])
+        for name in names:
+            rules = self.symbol_table.symbol_table[name]['rules']
+            boxes.append((self.scope_key(name),) + ((self.line_key(rules[0].line), self.line_key(rules[-1].line)) if rules else ()))
+        return tuple(boxes)
+
+    def rule_key(self, rule):
+        references = tuple(getattr(rule, name) for name in REFERENCES if hasattr(rule, name))
+        key = (self.line_key(rule.line), references,
+               tuple(self.line_key(line) for line in references),
+               tuple(self.box_key(line) for line in references))
+        # The variable of the box must not be free in the formulas before it
+        if isinstance(rule, ExistsEliminationtionDef):
+            key += (tuple(sorted(self.symbol_table.get_free_variables_before_scope(rule.reference2))),)
+        elif isinstance(rule, ForAllIntroductiontionDef):
+            key += (tuple(sorted(self.symbol_table.get_free_variables_before_scope(rule.reference1))),)
+        return key
@@ -0,0 +1,106 @@
+import hashlib
+import json
+import sqlite3
+import time
+from nadia.nadia_pt_fo import constants
+from nadia.nadia_pt_cache import CACHE_VERSION
+
+# Submissions with these statuses are checked again when the run is resumed
+RETRY_STATUS = ('pending', 'timeout', 'memory_limit', 'crashed', 'unreadable')
+
+# Results written to the file in a single transaction
+COMMIT_SIZE = 512
+# Seconds between the transactions, so that a slow run does not lose many results
+COMMIT_INTERVAL = 2.0
+
+CODE_NAMES = {value: name for name, value in vars(constants).items() if not name.startswith('_')}
+
+def proof_hash(input_proof):
+    return hashlib.sha256(input_proof.encode('utf-8')).hexdigest() if input_proof is not None else None
+
+class GradingRun():
+    '''Table of the submissions of a grading run in a SQLite file, with the status and the
+    result of each one. A submission is identified by its id and its file, and is checked
+    again only if its last status is in RETRY_STATUS or if its proof, its theorem or the
+    checker have changed, so an interrupted run is resumed by running it again. The results
+    are written in transactions of COMMIT_SIZE results (or every COMMIT_INTERVAL seconds).'''
+    def __init__(self, path):
+        self.db = sqlite3.connect(path)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.execute('''CREATE TABLE IF NOT EXISTS jobs (id TEXT, file TEXT, theorem TEXT, proof_hash TEXT,
+                           status TEXT, sequent TEXT, errors TEXT, time REAL, version TEXT, updated REAL,
+                           PRIMARY KEY (id, file))''')
+        self.db.execute('CREATE TABLE IF NOT EXISTS job_codes (id TEXT, file TEXT, code INTEGER)')
+        self.db.execute('CREATE INDEX IF NOT EXISTS job_codes_job ON job_codes (id, file)')
+        self.db.commit()
+        self.jobs = []
+        self.codes = []
+        self.last_commit = time.monotonic()
+        self.skipped = 0
+
+    @staticmethod
+    def job_key(info):
+        return str(info.get('id', '')), str(info.get('file', ''))
+
+    def is_done(self, info, input_proof, input_theorem):
+        # A submission is done if it was checked with the same proof, theorem and checker
+        row = self.db.execute('SELECT status, theorem, proof_hash, version FROM jobs WHERE id = ? AND file = ?', self.job_key(info)).fetchone()
+        if row is None:
+            return False
+        status, theorem, last_hash, version = row
+        return (status not in RETRY_STATUS and theorem == input_theorem and last_hash == proof_hash(input_proof)
+                and version == CACHE_VERSION)
+
+    def add(self, info, input_proof, input_theorem):
+        self.save(info, input_proof, input_theorem, {'status': 'pending'})
+
+    def save(self, info, input_proof, input_theorem, record):
+        key = self.job_key(info)
+        errors = record.get('errors')
+        self.jobs.append(key + (input_theorem, proof_hash(input_proof), record['status'], record.get('sequent'),
+                                json.dumps(errors if errors is not None else [info.get('error')] if info.get('error') else [], ensure_ascii=False),
+                                record.get('time'), CACHE_VERSION, time.time()))
+        self.codes.append((key, record.get('codes', [])))
+        if len(self.jobs) >= COMMIT_SIZE or time.monotonic() - self.last_commit >= COMMIT_INTERVAL:
+            self.commit()
+
+    def commit(self):
+        with self.db:
+            self.db.executemany('INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', self.jobs)
+            self.db.executemany('DELETE FROM job_codes WHERE id = ? AND file = ?', [key for key, codes in self.codes])
+            self.db.executemany('INSERT INTO job_codes VALUES (?, ?, ?)', [key + (code,) for key, codes in self.codes for code in codes])
+        self.jobs = []
+        self.codes = []
+        self.last_commit = time.monotonic()
+
+    def report(self):
+        '''Returns the number of submissions by theorem and status, and the number of
+        submissions (and of errors) by theorem and error code.'''
+        self.commit()
+        by_theorem = {}
+        for theorem, status, count in self.db.execute('SELECT theorem, status, COUNT(*) FROM jobs GROUP BY theorem, status ORDER BY theorem, status'):
+            by_theorem.setdefault(theorem, {})[status] = count
+        by_code = []
+        for theorem, code, submissions, errors in self.db.execute(
+                '''SELECT jobs.theorem, job_codes.code, COUNT(DISTINCT jobs.id || char(0) || jobs.file), COUNT(*)
+                   FROM job_codes JOIN jobs ON jobs.id = job_codes.id AND jobs.file = job_codes.file
+                   GROUP BY jobs.theorem, job_codes.code ORDER BY jobs.theorem, 3 DESC, job_codes.code'''):
+            by_code.append({'theorem': theorem, 'code': code, 'name': CODE_NAMES.get(code, str(code)),
+                            'submissions': submissions, 'errors': errors})
+        return {'theorems': by_theorem, 'codes': by_code}
+
+    def close(self):
+        if self.db is not None:
+            self.commit()
+            self.db.close()
+            self.db = None
+
+def print_report(report, output):
+    for theorem, statuses in report['theorems'].items():
+        total = sum(statuses.values())
+        output.write('{}: {} submissões ({})\n'.format(theorem if theorem is not None else '(sem teorema)', total,
+                     ', '.join('{} {}'.format(count, status) for status, count in statuses.items())))
+        for row in report['codes']:
+            if row['theorem'] == theorem:
+                output.write('    {:>3} {:<40} {} submissões, {} erros\n'.format(row['code'], row['name'], row['submissions'], row['errors']))
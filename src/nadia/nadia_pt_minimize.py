@@ -0,0 +1,112 @@
+from collections import namedtuple
+from nadia.nadia_pt_fo import ParserNadia
+from nadia.nadia_pt_session import ProofSession, RULES
+from nadia.nadia_pt_repair import parse_steps
+
+# Result of minimize_proof: the text of the smaller proof, the lines of the proof removed
+# (their numbers in the proof given) and the new number of each line kept.
+MinimizedProof = namedtuple('MinimizedProof', ['proof', 'removed', 'numbers'])
+
+def reference_groups(rule, references):
+    # The references of the rule as lines (one number) and boxes (two numbers), e.g.
+    # [(1,), (4, 5), (6, 7)] for |e 1,4-5,6-7
+    groups = []
+    position = 0
+    for part in RULES[rule][1].split(','):
+        size = part.count('{}')
+        if size == 0:
+            continue
+        groups.append(tuple(references[position:position + size]))
+        position += size
+    return groups
+
+class ProofGraph():
+    '''Dependency graph of a proof: each line depends on the lines of its references, and
+    a box (its first line) depends on its last line and on the rule after it, which must
+    dispose it. The lines needed are the ones reachable from the conclusion and from the
+    premisses (one line for each formula, so the theorem is the same), and they are found
+    in time linear in the size of the graph.'''
+    def __init__(self, steps):
+        self.steps = steps
+        # Line -> lines and boxes (first lines) it depends on
+        self.edges = {}
+        self.premisses = {}
+        self.conclusion = None
+        open_boxes = []
+        # Boxes closed in each box open whose next rule was not found yet
+        waiting = [[]]
+        for step in steps:
+            if step[0] == 'box':
+                number = step[1]
+                self.edges[number] = []
+                open_boxes.append((number, None))
+                waiting.append([])
+            elif step[0] == 'close':
+                start, last = open_boxes.pop()
+                waiting.pop()
+                if last is not None:
+                    self.edges[start].append(last)
+                    waiting[-1].append(start)
+            else:
+                kind, number, formula, rule, references = step
+                self.edges[number] = [group[0] for group in reference_groups(rule, references)]
+                for start in waiting[-1]:
+                    self.edges[start].append(number)
+                waiting[-1] = []
+                if open_boxes:
+                    open_boxes[-1] = (open_boxes[-1][0], number)
+                else:
+                    self.conclusion = number
+                if rule == 'pre':
+                    self.premisses.setdefault(formula, number)
+
+    def needed(self):
+        roots = list(self.premisses.values())
+        if self.conclusion is not None:
+            roots.append(self.conclusion)
+        seen = set(roots)
+        stack = roots
+        while stack:
+            for line in self.edges.get(stack.pop(), ()):
+                if line not in seen:
+                    seen.add(line)
+                    stack.append(line)
+        return seen
+
+def minimize_proof(input_proof):
+    '''Removes the lines and the boxes of a correct proof that the conclusion does not depend
+    on, renumbers the lines that remain (and their references) and returns a
+    MinimizedProof. The new proof is checked again; if it is not correct, the proof is
+    returned as it was. Raises ValueError if the proof has errors.'''
+    result = ParserNadia.getProof(input_proof)
+    if result.errors:
+        raise ValueError('A demonstração tem erros e não pode ser reduzida.')
+    steps = parse_steps(input_proof)
+    needed = ProofGraph(steps).needed()
+    session = ProofSession()
+    numbers = {}
+    kept_boxes = []
+    errors = []
+    for step in steps:
+        if step[0] == 'close':
+            if kept_boxes.pop():
+                errors += session.close_box()
+            continue
+        number = step[1]
+        if number not in needed:
+            if step[0] == 'box':
+                kept_boxes.append(False)
+            continue
+        numbers[number] = session.next_line
+        if step[0] == 'box':
+            kept_boxes.append(True)
+            errors += session.open_box(step[2], step[3])
+        else:
+            kind, number, formula, rule, references = step
+            errors += session.add_line(formula, rule, tuple(numbers[reference] for reference in references))
+    proof = session.text()
+    if errors or ParserNadia.getProof(proof).errors:
+        all_numbers = [step[1] for step in steps if step[0] != 'close']
+        return MinimizedProof(input_proof, [], {number: number for number in all_numbers})
+    removed = sorted(step[1] for step in steps if step[0] != 'close' and step[1] not in needed)
+    return MinimizedProof(proof, removed, numbers)
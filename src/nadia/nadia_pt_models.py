@@ -0,0 +1,213 @@
+import time
+from collections import namedtuple
+from itertools import combinations_with_replacement
+from nadia.nadia_pt_fo import ParserTheorem, AtomFormula, NegationFormula, AndFormula, OrFormula, ImplicationFormula, PredicateFormula, QuantifierFormula
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Interpretations evaluated at once
+BATCH = 1 << 14
+# Bits of the interpretations of a domain (besides the unary predicates) above which the
+# domain is not searched
+MAX_BITS = 40
+
+# Countermodel of a first-order sequent: the domain is {0, ..., size-1}, constants are the
+# elements of the free variables of the sequent, atoms the values of the propositional
+# atoms and predicates the sets of tuples (of elements) of each predicate.
+FiniteModel = namedtuple('FiniteModel', ['size', 'constants', 'atoms', 'predicates'])
+
+# Result of the search: the smallest countermodel found (None if there is none up to
+# searched), searched is the largest domain size searched entirely and complete is False
+# when the search stopped by the timeout, by max_interpretations or by MAX_BITS.
+ModelSearch = namedtuple('ModelSearch', ['countermodel', 'searched', 'complete'])
+
+class Signature():
+    # Atoms, predicates (name -> arity) and constants (free variables) of the sequent
+    def __init__(self, formulas):
+        self.atoms = set()
+        self.predicates = {}
+        self.constants = set()
+        for formula in formulas:
+            self.constants |= formula.free_variables()
+            self.collect(formula)
+        self.atoms = sorted(self.atoms)
+        self.constants = sorted(self.constants)
+        self.unary = sorted(name for name, arity in self.predicates.items() if arity == 1)
+        self.others = sorted(name for name, arity in self.predicates.items() if arity != 1)
+
+    def collect(self, formula):
+        if isinstance(formula, AtomFormula):
+            if formula.key != '@':
+                self.atoms.add(formula.key)
+        elif isinstance(formula, PredicateFormula):
+            arity = self.predicates.setdefault(formula.name, len(formula.variables))
+            if arity != len(formula.variables):
+                raise ValueError('O predicado {} é usado com aridades diferentes.'.format(formula.name))
+        elif isinstance(formula, NegationFormula):
+            self.collect(formula.formula)
+        elif isinstance(formula, QuantifierFormula):
+            self.collect(formula.formula)
+        else:
+            self.collect(formula.left)
+            self.collect(formula.right)
+
+def constant_assignments(constants, size):
+    # Elements of the constants up to the permutations of the domain: each constant is an
+    # element already used or the next unused one
+    assignments = [((), 0)]
+    for constant in constants:
+        assignments = [(elements + (e,), max(used, e + 1)) for elements, used in assignments for e in range(min(used + 1, size))]
+    return assignments
+
+def unary_signatures(count, size, used):
+    # Extensions of the unary predicates as the bits of the signature of each element. The
+    # elements not used by the constants are interchangeable, so their signatures are
+    # non-increasing
+    values = range(1 << count)
+    fixed = [()]
+    for e in range(used):
+        fixed = [s + (v,) for s in fixed for v in values]
+    free = [tuple(reversed(c)) for c in combinations_with_replacement(values, size - used)]
+    return numpy.array([a + b for a in fixed for b in free], dtype=numpy.int64).reshape(-1, size)
+
+class Evaluator():
+    # Values of the formulas on a batch of interpretations of a domain: arrays with one axis
+    # for the interpretations and one for each variable in scope (of size 1 when not used)
+    def __init__(self, batch, size, constants, atoms, predicates):
+        self.batch = batch
+        self.size = size
+        self.constants = constants
+        self.atoms = atoms
+        self.predicates = predicates
+
+    def evaluate(self, formula, scope):
+        shape = (self.batch,) + (1,) * len(scope)
+        if isinstance(formula, AtomFormula):
+            if formula.key == '@':
+                return numpy.zeros(shape, dtype=bool)
+            return self.atoms[formula.key].reshape(shape)
+        if isinstance(formula, PredicateFormula):
+            extension = self.predicates[formula.name]
+            index = [numpy.arange(self.batch).reshape(shape)]
+            for variable in formula.variables:
+                if variable in scope:
+                    axis = len(scope) - scope[::-1].index(variable)
+                    index.append(numpy.arange(self.size).reshape((1,) * axis + (self.size,) + (1,) * (len(scope) - axis)))
+                else:
+                    index.append(self.constants[variable])
+            return extension[tuple(index)]
+        if isinstance(formula, NegationFormula):
+            return ~self.evaluate(formula.formula, scope)
+        if isinstance(formula, QuantifierFormula):
+            value = self.evaluate(formula.formula, scope + (formula.variable,))
+            return value.all(axis=-1) if formula.forAll else value.any(axis=-1)
+        left = self.evaluate(formula.left, scope)
+        right = self.evaluate(formula.right, scope)
+        if isinstance(formula, AndFormula):
+            return left & right
+        if isinstance(formula, OrFormula):
+            return left | right
+        if isinstance(formula, ImplicationFormula):
+            return ~left | right
+        return left == right
+
+class SearchLimit():
+    # Stops the search after the timeout (seconds) or after evaluating max_interpretations
+    # interpretations; None is no limit
+    def __init__(self, timeout, max_interpretations):
+        self.deadline = time.perf_counter() + timeout if timeout is not None else None
+        self.remaining = max_interpretations
+
+    def spend(self, interpretations):
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            return False
+        if self.remaining is not None:
+            if interpretations > self.remaining:
+                return False
+            self.remaining -= interpretations
+        return True
+
+def search_size(premisses, conclusion, signature, size, limit):
+    # Countermodel with the domain of size elements, None if there is none, or False if the
+    # search was stopped
+    other_bits = len(signature.atoms) + sum(size ** signature.predicates[name] for name in signature.others)
+    if other_bits > MAX_BITS:
+        return False
+    for elements, used in constant_assignments(signature.constants, size):
+        constants = dict(zip(signature.constants, elements))
+        signatures = unary_signatures(len(signature.unary), size, used)
+        total = len(signatures) << other_bits
+        for start in range(0, total, BATCH):
+            end = min(start + BATCH, total)
+            if not limit.spend(end - start):
+                return False
+            index = numpy.arange(start, end, dtype=numpy.int64)
+            unary = signatures[index >> other_bits]
+            bits = index & ((1 << other_bits) - 1)
+            predicates = {}
+            for i, name in enumerate(signature.unary):
+                predicates[name] = (unary >> i) & 1 == 1
+            atoms = {}
+            position = 0
+            for name in signature.atoms:
+                atoms[name] = (bits >> position) & 1 == 1
+                position += 1
+            for name in signature.others:
+                arity = signature.predicates[name]
+                shifts = numpy.arange(position, position + size ** arity, dtype=numpy.int64)
+                predicates[name] = ((bits[:, None] >> shifts) & 1 == 1).reshape((len(index),) + (size,) * arity)
+                position += size ** arity
+            evaluator = Evaluator(len(index), size, constants, atoms, predicates)
+            falsified = ~evaluator.evaluate(conclusion, ())
+            for premisse in premisses:
+                falsified &= evaluator.evaluate(premisse, ())
+            found = numpy.flatnonzero(falsified)
+            if len(found):
+                k = found[0]
+                return FiniteModel(size, constants,
+                                   {name: bool(value[k]) for name, value in atoms.items()},
+                                   {name: set(tuple(int(e) for e in t) for t in numpy.argwhere(value[k].reshape((size,) * signature.predicates[name])))
+                                    for name, value in predicates.items()})
+    return None
+
+def search_countermodel(premisses, conclusion, max_size=4, timeout=1.0, max_interpretations=None):
+    '''Searches the smallest countermodel of the sequent premisses |- conclusion (formulas of
+    ParserTheorem.getTheorem) with domains of 1 to max_size elements, for at most timeout
+    seconds and max_interpretations interpretations (None: no limit), and returns a
+    ModelSearch. Without a timeout the result does not depend on the load of the machine.
+    The interpretations of each domain are evaluated in batches (the predicates are numpy
+    boolean arrays and the quantifiers are reductions all/any of their axes), up to the
+    permutations of the domain.'''
+    if numpy is None:
+        raise ValueError('A busca de contraexemplos de primeira ordem precisa do numpy.')
+    signature = Signature(list(premisses) + [conclusion])
+    limit = SearchLimit(timeout, max_interpretations)
+    searched = 0
+    for size in range(1, max_size + 1):
+        model = search_size(premisses, conclusion, signature, size, limit)
+        if model is False:
+            return ModelSearch(None, searched, False)
+        if model is not None:
+            return ModelSearch(model, searched, True)
+        searched = size
+    return ModelSearch(None, searched, True)
+
+def find_first_order_countermodel(input_theorem, max_size=4, timeout=1.0):
+    '''Returns the smallest countermodel (FiniteModel) of the theorem (e.g. '|- Ex P(x)->Ax P(x)')
+    with at most max_size elements found in timeout seconds, or None.'''
+    premisses, conclusion = ParserTheorem.getTheorem(input_theorem)
+    if conclusion is None:
+        raise ValueError('{} não é um teorema válido!'.format(input_theorem))
+    return search_countermodel(premisses, conclusion, max_size, timeout).countermodel
+
+def model_to_string(model):
+    parts = ['Domínio: {{{}}}'.format(', '.join(str(e) for e in range(model.size)))]
+    parts += ['{} = {}'.format(name, e) for name, e in sorted(model.constants.items())]
+    parts += ['{} = {}'.format(name, 'V' if value else 'F') for name, value in sorted(model.atoms.items())]
+    for name, extension in sorted(model.predicates.items()):
+        tuples = sorted(extension)
+        elements = [str(t[0]) if len(t) == 1 else '({})'.format(', '.join(str(e) for e in t)) for t in tuples]
+        parts.append('{} = {{{}}}'.format(name, ', '.join(elements)))
+    return '; '.join(parts)
@@ -0,0 +1,380 @@
+import time
+from functools import lru_cache
+from itertools import count
+from nadia.nadia_pt_fo import ParserTheorem, AtomFormula, NegationFormula, AndFormula, OrFormula, ImplicationFormula, PredicateFormula, QuantifierFormula
+from nadia.nadia_pt_session import ProofSession
+from nadia.nadia_pt_semantics import decide
+from nadia.nadia_pt_models import search_countermodel
+
+# Largest number of steps that are not invertible (|i, ->e, ~e, Ei and raa) in a branch of
+# the search, and seconds of the search of a proof
+MAX_DEPTH = 12
+TIMEOUT = 5.0
+# Largest domain and seconds of the search of a countermodel of a first-order sequent
+# before the search of its proof
+MODEL_SIZE = 3
+MODEL_TIMEOUT = 0.2
+BOTTOM = '@'
+BINARY = ('&', '|', '->')
+QUANTIFIERS = ('A', 'E')
+
+class SearchTimeout(Exception):
+    pass
+
+def to_tuple(formula):
+    # The formulas of the search are hashable: the atoms are their names, ('~', F),
+    # (connective, left, right), ('A' or 'E', variable, F) and ('P', name, variables)
+    if isinstance(formula, AtomFormula):
+        return formula.key
+    if isinstance(formula, NegationFormula):
+        return ('~', to_tuple(formula.formula))
+    if isinstance(formula, (AndFormula, OrFormula, ImplicationFormula)):
+        return (formula.key, to_tuple(formula.left), to_tuple(formula.right))
+    if isinstance(formula, PredicateFormula):
+        return ('P', formula.name, tuple(formula.variables))
+    if isinstance(formula, QuantifierFormula):
+        return ('A' if formula.forAll else 'E', formula.variable, to_tuple(formula.formula))
+    raise ValueError('A fórmula {} usa <->, que não tem regras de introdução e eliminação.'.format(formula.toString()))
+
+def to_text(formula):
+    # The same text of toString, so the formula of each line is the formula of the search
+    if isinstance(formula, str):
+        return formula
+    if formula[0] == 'P':
+        return '{}({})'.format(formula[1], ','.join(formula[2]))
+    if formula[0] == '~':
+        return '~({})'.format(to_text(formula[1])) if is_binary(formula[1]) else '~' + to_text(formula[1])
+    if formula[0] in QUANTIFIERS:
+        return ('{}{} ({})' if is_binary(formula[2]) else '{}{} {}').format(formula[0], formula[1], to_text(formula[2]))
+    return formula[0].join('({})'.format(to_text(f)) if is_binary(f) else to_text(f) for f in formula[1:])
+
+def is_binary(formula):
+    return not isinstance(formula, str) and formula[0] in BINARY
+
+@lru_cache(maxsize=None)
+def free_variables(formula):
+    if isinstance(formula, str):
+        return frozenset()
+    if formula[0] == 'P':
+        return frozenset(formula[2])
+    if formula[0] == '~':
+        return free_variables(formula[1])
+    if formula[0] in QUANTIFIERS:
+        return free_variables(formula[2]) - {formula[1]}
+    return free_variables(formula[1]) | free_variables(formula[2])
+
+def all_variables(formula):
+    if isinstance(formula, str):
+        return set()
+    if formula[0] == 'P':
+        return set(formula[2])
+    if formula[0] in QUANTIFIERS:
+        return all_variables(formula[2]) | {formula[1]}
+    return set().union(*(all_variables(f) for f in formula[1:]))
+
+@lru_cache(maxsize=None)
+def substitution(formula, variable, term):
+    # The same substitution of the formulas of nadia_pt_fo (the free occurrences of variable)
+    if isinstance(formula, str):
+        return formula
+    if formula[0] == 'P':
+        return ('P', formula[1], tuple(term if v == variable else v for v in formula[2]))
+    if formula[0] == '~':
+        return ('~', substitution(formula[1], variable, term))
+    if formula[0] in QUANTIFIERS:
+        return formula if formula[1] == variable else (formula[0], formula[1], substitution(formula[2], variable, term))
+    return (formula[0], substitution(formula[1], variable, term), substitution(formula[2], variable, term))
+
+def is_substitutable(formula, variable, term):
+    # False if a free occurrence of variable is in the scope of a quantifier of term
+    if isinstance(formula, str) or formula[0] == 'P':
+        return True
+    if formula[0] in QUANTIFIERS:
+        if formula[1] == variable:
+            return True
+        if formula[1] == term and variable in free_variables(formula[2]):
+            return False
+        return is_substitutable(formula[2], variable, term)
+    return all(is_substitutable(f, variable, term) for f in formula[1:])
+
+def term_index(context):
+    # Terms of each argument (predicate, position) of the predicates of the context
+    index = {}
+    stack = [(formula, frozenset()) for formula in context]
+    while stack:
+        formula, bound = stack.pop()
+        if isinstance(formula, str):
+            continue
+        if formula[0] == 'P':
+            for position, v in enumerate(formula[2]):
+                if v not in bound:
+                    index.setdefault((formula[1], position), set()).add(v)
+        elif formula[0] in QUANTIFIERS:
+            stack.append((formula[2], bound | {formula[1]}))
+        else:
+            stack += [(f, bound) for f in formula[1:]]
+    return index
+
+def argument_positions(formula, variable):
+    # (predicate, position) of the free occurrences of variable in the formula
+    if isinstance(formula, str):
+        return []
+    if formula[0] == 'P':
+        return [(formula[1], position) for position, v in enumerate(formula[2]) if v == variable]
+    if formula[0] in QUANTIFIERS:
+        return [] if formula[1] == variable else argument_positions(formula[2], variable)
+    return [p for f in formula[1:] for p in argument_positions(f, variable)]
+
+def is_first_order(formula):
+    if isinstance(formula, str):
+        return False
+    return formula[0] in ('P',) + QUANTIFIERS or any(is_first_order(f) for f in formula[1:])
+
+def variable_names():
+    # a, ..., z, a1, ..., z1, a2, ...
+    for suffix in count():
+        for letter in 'abcdefghijklmnopqrstuvwxyz':
+            yield letter + (str(suffix) if suffix else '')
+
+class Prover():
+    '''Searches a proof of a sequent with the rules of NADIA, backwards from the conclusion:
+    the steps that can always be applied first (&i, ->i, ~i and Ai on the goal, |e and Ee on
+    the context, the last two with a fresh variable), then |i, ->e, ~e, Ei and raa, up to a
+    number of these steps that grows by iterative deepening. The context is saturated by
+    &e, ->e, ~e and Ae (forward) before each step; Ae and Ei use only the terms free in the
+    context or in the goal, Ei trying first the terms of the predicates of the context that
+    match its formula. The failed (context, goal) are memoized with the depth of the failure.'''
+    def __init__(self, sequent, timeout=TIMEOUT):
+        self.deadline = time.perf_counter() + timeout
+        self.failed = {}
+        self.steps = 0
+        # The fresh variables are not in the sequent, so the substitutions never capture them
+        self.names = set().union(*(all_variables(formula) for formula in sequent))
+        self.first_order = any(is_first_order(formula) for formula in sequent)
+        self.default = self.fresh(frozenset())
+        self.names.add(self.default)
+
+    def fresh(self, reserved):
+        return next(name for name in variable_names() if name not in self.names and name not in reserved)
+
+    def terms(self, context, goal):
+        # Terms of Ae and Ei: the free variables of the context and of the goal (a variable
+        # not in the sequent when there is none, as the domain is not empty)
+        terms = free_variables(goal).union(*(free_variables(formula) for formula in context))
+        return terms or frozenset([self.default])
+
+    def saturate(self, context, terms=frozenset()):
+        # Adds to the context (formula -> derivation) the eliminations &e, ->e, ~e and Ae (of
+        # the terms) of its formulas, until nothing new is derived. A derivation is (rule,
+        # formula, premisses...) and a box is (rule, formula, ..., (variable, hypothesis, derivation))
+        context = dict(context)
+        changed = True
+        while changed and BOTTOM not in context:
+            changed = False
+            if self.first_order:
+                terms = terms | self.terms(context, BOTTOM)
+            for formula, derivation in list(context.items()):
+                if isinstance(formula, str):
+                    continue
+                new = []
+                if formula[0] == '&':
+                    new = [(formula[1], ('&e', formula[1], derivation)), (formula[2], ('&e', formula[2], derivation))]
+                elif formula[0] == '->' and formula[1] in context:
+                    new = [(formula[2], ('->e', formula[2], context[formula[1]], derivation))]
+                elif formula[0] == '~' and formula[1] in context:
+                    new = [(BOTTOM, ('~e', BOTTOM, context[formula[1]], derivation))]
+                elif formula[0] == 'A':
+                    instances = [substitution(formula[2], formula[1], t) for t in sorted(terms) if is_substitutable(formula[2], formula[1], t)]
+                    new = [(instance, ('Ae', instance, derivation)) for instance in instances]
+                for f, d in new:
+                    if f not in context:
+                        context[f] = d
+                        changed = True
+        return context
+
+    def assume(self, context, hypothesis):
+        return self.saturate(context if hypothesis in context else {**context, hypothesis: ('hip', hypothesis)})
+
+    def search(self, context, goal, depth, reserved=frozenset()):
+        if self.first_order and not free_variables(goal) <= self.terms(context, BOTTOM):
+            context = self.saturate(context, free_variables(goal))
+        if goal in context:
+            return context[goal]
+        if BOTTOM in context:
+            return ('@e', goal, context[BOTTOM])
+        self.steps += 1
+        if self.steps & 1023 == 0 and time.perf_counter() > self.deadline:
+            raise SearchTimeout()
+        key = (frozenset(context), goal)
+        if self.failed.get(key, -1) >= depth:
+            return None
+        # The variables of the lines before a box must not be its variable
+        reserved = reserved | self.terms(context, goal)
+        derivation = self.expand(context, goal, depth, reserved)
+        if derivation is None:
+            self.failed[key] = depth
+        return derivation
+
+    def expand(self, context, goal, depth, reserved):
+        # Invertible steps: if they fail, the goal is not provable in this depth
+        if not isinstance(goal, str):
+            if goal[0] == '&':
+                left = self.search(context, goal[1], depth, reserved)
+                right = self.search(context, goal[2], depth, reserved) if left is not None else None
+                return ('&i', goal, left, right) if right is not None else None
+            if goal[0] == '->':
+                body = self.search(self.assume(context, goal[1]), goal[2], depth, reserved)
+                return ('->i', goal, (None, goal[1], body)) if body is not None else None
+            if goal[0] == '~':
+                body = self.search(self.assume(context, goal[1]), BOTTOM, depth, reserved)
+                return ('~i', goal, (None, goal[1], body)) if body is not None else None
+            if goal[0] == 'A':
+                variable = self.fresh(reserved)
+                body = self.search(context, substitution(goal[2], goal[1], variable), depth, reserved | {variable})
+                return ('Ai', goal, (variable, None, body)) if body is not None else None
+        terms = self.terms(context, goal)
+        for formula, derivation in context.items():
+            if isinstance(formula, str):
+                continue
+            if formula[0] == '|' and formula[1] not in context and formula[2] not in context:
+                left = self.search(self.assume(context, formula[1]), goal, depth, reserved)
+                right = self.search(self.assume(context, formula[2]), goal, depth, reserved) if left is not None else None
+                return ('|e', goal, derivation, (None, formula[1], left), (None, formula[2], right)) if right is not None else None
+            if formula[0] == 'E' and not any(substitution(formula[2], formula[1], t) in context for t in terms):
+                variable = self.fresh(reserved)
+                hypothesis = substitution(formula[2], formula[1], variable)
+                body = self.search(self.assume(context, hypothesis), goal, depth, reserved | {variable})
+                return ('Ee', goal, derivation, (variable, hypothesis, body)) if body is not None else None
+        if depth == 0:
+            return None
+        depth -= 1
+        if not isinstance(goal, str) and goal[0] == '|':
+            for side in (goal[1], goal[2]):
+                derivation = self.search(context, side, depth, reserved)
+                if derivation is not None:
+                    return ('|i', goal, derivation)
+        if not isinstance(goal, str) and goal[0] == 'E':
+            index = term_index(context)
+            positions = argument_positions(goal[2], goal[1])
+            candidates = sorted(terms, key=lambda t: (-sum(t in index.get(p, ()) for p in positions), t))
+            for term in candidates:
+                if is_substitutable(goal[2], goal[1], term):
+                    derivation = self.search(context, substitution(goal[2], goal[1], term), depth, reserved)
+                    if derivation is not None:
+                        return ('Ei', goal, derivation)
+        for formula, derivation in list(context.items()):
+            if isinstance(formula, str):
+                continue
+            if formula[0] == '->' and formula[2] not in context:
+                antecedent = self.search(context, formula[1], depth, reserved)
+                if antecedent is not None:
+                    extended = self.saturate({**context, formula[1]: antecedent, formula[2]: ('->e', formula[2], antecedent, derivation)})
+                    result = self.search(extended, goal, depth, reserved)
+                    if result is not None:
+                        return result
+            elif formula[0] == '~' and formula[1] != goal:
+                positive = self.search(context, formula[1], depth, reserved)
+                if positive is not None:
+                    bottom = ('~e', BOTTOM, positive, derivation)
+                    return bottom if goal == BOTTOM else ('@e', goal, bottom)
+        if goal != BOTTOM and ('~', goal) not in context:
+            body = self.search(self.assume(context, ('~', goal)), BOTTOM, depth, reserved)
+            if body is not None:
+                return ('raa', goal, (None, ('~', goal), body))
+        return None
+
+class ProofWriter():
+    # Writes the derivation in a ProofSession: each formula is written once in the lines
+    # visible in the box, the boxes end with their formula (copied, if it was in an outer
+    # box) and are disposed by the line after them
+    def __init__(self, premisses):
+        self.session = ProofSession()
+        self.scopes = [{}]
+        for premisse in premisses:
+            self.add(premisse, 'pre')
+
+    def visible(self, formula):
+        for scope in reversed(self.scopes):
+            if formula in scope:
+                return scope[formula]
+        return None
+
+    def add(self, formula, rule, references=()):
+        line = self.session.next_line
+        self.session.add_line(to_text(formula), rule, references)
+        self.scopes[-1].setdefault(formula, line)
+        return line
+
+    def box(self, variable, hypothesis, derivation):
+        start = self.session.next_line
+        self.session.open_box(variable, to_text(hypothesis) if hypothesis is not None else None)
+        self.scopes.append({hypothesis: start} if hypothesis is not None else {})
+        line = self.write(derivation)
+        if line != self.session.next_line - 1:
+            line = self.add(derivation[1], 'copie', (line,))
+        self.scopes.pop()
+        self.session.close_box()
+        return start, line
+
+    def write(self, derivation):
+        # Line of the formula of the derivation
+        rule, formula = derivation[0], derivation[1]
+        line = self.visible(formula)
+        if line is not None:
+            return line
+        if rule in ('&e', '|i', '@e', 'Ae', 'Ei'):
+            return self.add(formula, rule, (self.write(derivation[2]),))
+        if rule in ('->e', '~e', '&i'):
+            left = self.write(derivation[2])
+            return self.add(formula, rule, (left, self.write(derivation[3])))
+        if rule in ('->i', '~i', 'raa', 'Ai'):
+            return self.add(formula, rule, self.box(*derivation[2]))
+        if rule == 'Ee':
+            return self.add(formula, rule, (self.write(derivation[2]),) + self.box(*derivation[3]))
+        if rule == '|e':
+            disjunction = self.write(derivation[2])
+            left = self.box(*derivation[3])
+            return self.add(formula, rule, (disjunction,) + left + self.box(*derivation[4]))
+        raise ValueError('A fórmula {} não está nas linhas visíveis.'.format(to_text(formula)))
+
+def prove_sequent(premisses, conclusion, max_depth=MAX_DEPTH, timeout=TIMEOUT):
+    '''Returns the text of a proof in NADIA of the sequent premisses |- conclusion (formulas of
+    ParserTheorem.getTheorem), or None if the sequent is not valid or no proof was found
+    with up to max_depth steps that are not invertible in timeout seconds. Raises
+    ValueError if a formula has <->.'''
+    goal = to_tuple(conclusion)
+    hypotheses = [to_tuple(premisse) for premisse in premisses]
+    try:
+        if not decide(premisses, conclusion).valid:
+            return None
+    except ValueError:
+        # First-order: only a small countermodel is searched
+        try:
+            if search_countermodel(premisses, conclusion, MODEL_SIZE, MODEL_TIMEOUT).countermodel is not None:
+                return None
+        except ValueError:
+            pass
+    prover = Prover(hypotheses + [goal], timeout)
+    context = prover.saturate({premisse: ('pre', premisse) for premisse in hypotheses})
+    derivation = None
+    try:
+        for depth in range(max_depth + 1):
+            derivation = prover.search(context, goal, depth)
+            if derivation is not None:
+                break
+    except SearchTimeout:
+        return None
+    if derivation is None:
+        return None
+    writer = ProofWriter(hypotheses)
+    line = writer.write(derivation)
+    if line != writer.session.next_line - 1 or writer.session.depth:
+        writer.add(goal, 'copie', (line,))
+    return writer.session.text()
+
+def prove_theorem(input_theorem, max_depth=MAX_DEPTH, timeout=TIMEOUT):
+    '''Returns the text of a proof in NADIA of the theorem (e.g. 'A->B, ~B |- ~A'), or None.'''
+    premisses, conclusion = ParserTheorem.getTheorem(input_theorem)
+    if conclusion is None:
+        raise ValueError('{} não é um teorema válido!'.format(input_theorem))
+    return prove_sequent(premisses, conclusion, max_depth, timeout)
@@ -0,0 +1,351 @@
+import re
+from collections import namedtuple
+from nadia.nadia_pt_fo import OrFormula, NegationFormula, QuantifierFormula
+from nadia.nadia_pt_session import ProofSession, RULES
+from nadia.nadia_pt_hints import is_binary, hypothesis_of
+
+# Costs of a fix: the rule written, a rule the name written may be (a misspelling), a rule
+# when the name is missing and another rule
+SAME_RULE = 0
+SPELLING = 1
+MISSING_RULE = 2
+OTHER_RULE = 3
+
+# Names and symbols used for the rules (in lower case)
+RULE_ALIASES = {
+    '^i': '&i', '^e': '&e', '∧i': '&i', '∧e': '&e',
+    'vi': '|i', 've': '|e', '∨i': '|i', '∨e': '|e',
+    '=>i': '->i', '=>e': '->e', '>i': '->i', '>e': '->e', '→i': '->i', '→e': '->e',
+    '-i': '~i', '-e': '~e', '¬i': '~i', '¬e': '~e',
+    '⊥e': '@e', 'falsoe': '@e',
+    '∀i': 'Ai', '∀e': 'Ae', '∃i': 'Ei', '∃e': 'Ee',
+    'copy': 'copie', 'copia': 'copie', 'cp': 'copie', 'r': 'copie',
+    'premissa': 'pre', 'premise': 'pre', 'pr': 'pre',
+}
+LOWER_RULES = {rule.lower(): rule for rule in RULES}
+
+LINE = re.compile(r'^\s*(\d+)\s*\.\s*(.*?)\s*$')
+REFERENCES = re.compile(r'^(.*?)\s+(\d[\d\s,\-]*)$')
+JUSTIFICATION = re.compile(r'^(.*\S)\s+(\S+)$')
+BOX_VARIABLE = re.compile(r'^([a-z][a-z0-9]*)(?:\s+(.*))?$')
+HYPOTHESIS = re.compile(r'^(.*?)\s+([a-z]+)$')
+VARIABLE = re.compile(r'(?<![A-Za-z0-9])[a-z][a-z0-9]*')
+
+# A line of a proof with errors and its fix: the number of the line, the rule and the
+# references written (rule is None when it is missing), the errors of the line and the
+# rule and references that make the line valid (None when no fix was found).
+LineRepair = namedtuple('LineRepair', ['line', 'rule', 'references', 'errors', 'fixed_rule', 'fixed_references'])
+
+# Result of repair_proof: the repairs of the lines with errors, in order, and the text of
+# the proof with the fixes.
+ProofRepair = namedtuple('ProofRepair', ['repairs', 'proof'])
+
+def rule_candidates(name):
+    # Rules that the name written may be: the rule itself, an alias or a rule at one edit
+    if name in RULES:
+        return (name,)
+    key = name.lower()
+    if key in RULE_ALIASES:
+        return (RULE_ALIASES[key],)
+    if key in LOWER_RULES:
+        return (LOWER_RULES[key],)
+    return tuple(rule for lower, rule in LOWER_RULES.items() if one_edit(key, lower))
+
+def one_edit(a, b):
+    # True if b is a with one character inserted, removed, replaced or two swapped
+    if abs(len(a) - len(b)) > 1 or a == b:
+        return False
+    if len(a) == len(b):
+        diff = [i for i in range(len(a)) if a[i] != b[i]]
+        return len(diff) == 1 or (len(diff) == 2 and diff[1] == diff[0] + 1 and a[diff[0]] == b[diff[1]] and a[diff[1]] == b[diff[0]])
+    short, long = (a, b) if len(a) < len(b) else (b, a)
+    return any(long[:i] + long[i + 1:] == short for i in range(len(long)))
+
+def skeleton(text):
+    # The text of a formula with its variables erased: an instance of Ax F (or of Ex F) has
+    # the skeleton of F
+    return VARIABLE.sub('_', text)
+
+def parse_steps(input_proof):
+    # The lines of the proof as written, even with errors: ('line', number, formula, rule,
+    # references), ('box', number, variable, hypothesis) and ('close',)
+    text = re.sub(r'##.*?##', '', input_proof, flags=re.S)
+    steps = []
+    for source in text.splitlines():
+        source = source.split('#')[0].strip()
+        closes = 0
+        while source.endswith('}'):
+            source = source[:-1].rstrip()
+            closes += 1
+        match = LINE.match(source)
+        if match is not None:
+            number, body = int(match.group(1)), match.group(2)
+            if body.startswith('{'):
+                steps.append(('box', number) + parse_box(body[1:].strip()))
+            else:
+                steps.append(('line', number) + parse_justification(body))
+        elif source:
+            raise ValueError('A linha {} não é válida.'.format(source))
+        steps += [('close',)] * closes
+    return steps
+
+def parse_box(body):
+    variable, hypothesis = None, body
+    match = BOX_VARIABLE.match(body)
+    if match is not None and match.group(1) not in ('hip', 'pre'):
+        variable, hypothesis = match.group(1), match.group(2)
+    if hypothesis is not None:
+        match = HYPOTHESIS.match(hypothesis)
+        if match is not None:
+            hypothesis = match.group(1)
+    return variable, hypothesis or None
+
+def parse_justification(body):
+    # The formula, the rule (None when it is missing or not recognized) and the references
+    match = REFERENCES.match(body)
+    rest, references = (match.group(1), match.group(2)) if match is not None else (body, '')
+    references = tuple(int(reference) for reference in re.findall(r'\d+', references))
+    match = JUSTIFICATION.match(rest)
+    if match is not None and (rule_candidates(match.group(2)) or match.group(2) == 'hip'):
+        return match.group(1), match.group(2), references
+    return rest, None, references
+
+class ProofRepairer():
+    '''Checks a proof line by line in a ProofSession and, for each line with errors, searches
+    the rule and the references that make it valid. The lines visible at each line are
+    indexed by their formulas and by the parts that the eliminations use (the conjunctions
+    by their parts, the implications by their consequents, the universal and existential
+    formulas by the skeleton of their instances), as are the boxes closed by their last
+    lines, so the justifications of a formula are found by lookups and not by trying all
+    the pairs of lines. The fixes are checked by the session, on a snapshot, and the one
+    that changes less of the line is kept.'''
+    def __init__(self):
+        self.session = ProofSession()
+        # Number of each line in the text -> line of the session (they differ when the
+        # numbering of the proof is not sequential)
+        self.numbers = {}
+        self.written = {}
+        # Formula text -> lines, and key -> formula texts, of the visible lines
+        self.lines = {}
+        self.texts = {}
+        self.index = {}
+        # Closed boxes of each box open, by the text and the skeleton of their last lines
+        self.boxes = [{}]
+        # What was added to the indexes in each box open, to be removed when it closes
+        self.frames = [[]]
+
+    def register(self, mapping, key, value):
+        mapping.setdefault(key, []).append(value)
+        self.frames[-1].append((mapping, key))
+
+    def add_visible(self, formula, line):
+        text = formula.toString()
+        repeated = text in self.lines
+        self.register(self.lines, text, (formula, line))
+        self.register(self.texts, line, text)
+        if repeated:
+            # The formula is already indexed, by a line visible at least as long as this one
+            return
+        if is_binary(formula, '&'):
+            self.register(self.index, ('&', formula.left.toString()), text)
+            self.register(self.index, ('&', formula.right.toString()), text)
+        elif is_binary(formula, '->'):
+            self.register(self.index, ('->', formula.right.toString()), text)
+        elif isinstance(formula, NegationFormula):
+            self.register(self.index, ('~',), text)
+        elif isinstance(formula, QuantifierFormula):
+            self.register(self.index, ('A' if formula.forAll else 'E', skeleton(formula.formula.toString())), text)
+        self.register(self.index, ('instance', skeleton(text)), text)
+
+    def line(self, text, original=()):
+        # The visible line of the formula, the one written if it is one of them
+        lines = self.lines.get(text)
+        if lines is None:
+            return None
+        return next((line for line in original if text in self.texts.get(line, ())), lines[-1][1])
+
+    def formula(self, text):
+        return self.lines[text][-1][0]
+
+    def justifications(self, formula, original):
+        # The rules and references that may justify the formula: (rule, references)
+        text = formula.toString()
+        line = lambda t: self.line(t, original)
+        candidates = []
+        if line(text) is not None:
+            candidates.append(('copie', (line(text),)))
+        if line('@') is not None:
+            candidates.append(('@e', (line('@'),)))
+        if is_binary(formula, '&') and line(formula.left.toString()) is not None and line(formula.right.toString()) is not None:
+            candidates.append(('&i', (line(formula.left.toString()), line(formula.right.toString()))))
+        if is_binary(formula, '|'):
+            for side in (formula.left, formula.right):
+                if line(side.toString()) is not None:
+                    candidates.append(('|i', (line(side.toString()),)))
+        for conjunction in self.index.get(('&', text), ()):
+            candidates.append(('&e', (line(conjunction),)))
+        for implication in self.index.get(('->', text), ()):
+            antecedent = self.formula(implication).left.toString()
+            if line(antecedent) is not None:
+                candidates.append(('->e', (line(antecedent), line(implication))))
+        if text == '@':
+            for negation in self.index.get(('~',), ()):
+                positive = self.formula(negation).formula.toString()
+                if line(positive) is not None:
+                    candidates.append(('~e', (line(positive), line(negation))))
+        for universal in self.index.get(('A', skeleton(text)), ()):
+            candidates.append(('Ae', (line(universal),)))
+        if isinstance(formula, QuantifierFormula) and not formula.forAll:
+            for instance in self.index.get(('instance', skeleton(formula.formula.toString())), ()):
+                if formula.valid_substitution(self.formula(instance)):
+                    candidates.append(('Ei', (line(instance),)))
+        candidates += self.box_justifications(formula, text)
+        return candidates
+
+    def box_justifications(self, formula, text):
+        boxes = self.boxes[-1]
+        candidates = []
+        delimiters = lambda box: (box.start_line, box.end_line)
+        if is_binary(formula, '->'):
+            for box in boxes.get(formula.right.toString(), ()):
+                if box.variable is None and hypothesis_of(box) == formula.left:
+                    candidates.append(('->i', delimiters(box)))
+        for box in boxes.get('@', ()):
+            if box.variable is not None:
+                continue
+            hypothesis = hypothesis_of(box)
+            if isinstance(formula, NegationFormula) and hypothesis == formula.formula:
+                candidates.append(('~i', delimiters(box)))
+            if hypothesis == NegationFormula(formula):
+                candidates.append(('raa', delimiters(box)))
+        if isinstance(formula, QuantifierFormula) and formula.forAll:
+            for box in boxes.get(('instance', skeleton(formula.formula.toString())), ()):
+                if hypothesis_of(box) is None:
+                    candidates.append(('Ai', delimiters(box)))
+        ending = [box for box in boxes.get(text, ()) if hypothesis_of(box) is not None]
+        for first in ending:
+            if first.variable is not None:
+                for existential in self.index.get(('E', skeleton(hypothesis_of(first).toString())), ()):
+                    candidates.append(('Ee', (self.line(existential),) + delimiters(first)))
+                continue
+            for second in ending:
+                if second.variable is None and second.start_line > first.start_line:
+                    disjunction = self.line(OrFormula(hypothesis_of(first), hypothesis_of(second)).toString())
+                    if disjunction is not None:
+                        candidates.append(('|e', (disjunction,) + delimiters(first) + delimiters(second)))
+        return candidates
+
+    def cost(self, rule, references, written, original):
+        # How much the fix changes the line: the rule, then the references changed, then how
+        # far they are from the ones written
+        if rule == written:
+            rule_cost = SAME_RULE
+        elif written is not None and rule in rule_candidates(written):
+            rule_cost = SPELLING
+        else:
+            rule_cost = MISSING_RULE if written is None else OTHER_RULE
+        if len(references) == len(original):
+            changed = sum(1 for a, b in zip(references, original) if a != b)
+            distance = sum(abs(a - b) for a, b in zip(references, original))
+        else:
+            changed = len(set(references) - set(original))
+            distance = 0
+        return (rule_cost, changed, distance)
+
+    def add_line(self, number, formula_text, written, original):
+        # Adds the line, fixed if it has errors, and returns its LineRepair (None if valid)
+        session = self.session
+        line = session.next_line
+        references = tuple(self.numbers.get(reference, reference) for reference in original)
+        text, tokens, formula = session.parse_formula(formula_text)
+        valid = written in RULES and len(references) == RULES[written][1].count('{}')
+        if valid:
+            snapshot = session.snapshot()
+            errors = session.add_line(formula, written, references)
+            if not errors:
+                self.added(number, line, formula)
+                return None
+            session.rollback(snapshot)
+        elif written is None:
+            errors = ['A linha {} não tem regra.'.format(number)]
+        elif written == 'hip':
+            errors = ['A hipótese da linha {} deve iniciar uma caixa.'.format(number)]
+        elif written in RULES:
+            errors = ['A regra {} deve ter {} referências.'.format(written, RULES[written][1].count('{}'))]
+        else:
+            errors = ['A regra {} não existe.'.format(written)]
+        candidates = sorted(set(self.justifications(formula, references)),
+                            key=lambda candidate: (self.cost(candidate[0], candidate[1], written, references), candidate))
+        for rule, fixed in candidates:
+            snapshot = session.snapshot()
+            if not session.add_line(formula, rule, fixed):
+                self.added(number, line, formula)
+                return LineRepair(number, written, original, errors, rule, tuple(self.written.get(reference, reference) for reference in fixed))
+            session.rollback(snapshot)
+        # No fix: the line is kept (as a premisse, if its rule is not known) so that the next
+        # lines can use it
+        if valid:
+            session.add_line(formula, written, references)
+        else:
+            session.add_line(formula, 'pre')
+        self.added(number, line, formula)
+        return LineRepair(number, written, original, errors, None, None)
+
+    def added(self, number, line, formula):
+        self.numbers[number] = line
+        self.written[line] = number
+        self.add_visible(formula, line)
+
+    def open_box(self, number, variable, hypothesis):
+        line = self.session.next_line
+        self.session.open_box(variable, hypothesis)
+        self.numbers[number] = line
+        self.written[line] = number
+        self.boxes.append({})
+        self.frames.append([])
+        if hypothesis is not None:
+            self.add_visible(self.session.state.table.get_rule(line).formula, line)
+
+    def close_box(self):
+        table = self.session.state.table
+        number = table.current_scope
+        depth = self.session.depth
+        self.session.close_box()
+        if self.session.depth == depth:
+            return
+        for mapping, key in reversed(self.frames.pop()):
+            mapping[key].pop()
+            if not mapping[key]:
+                del mapping[key]
+        self.boxes.pop()
+        box = self.session.state.table.get_scope(number)
+        if box.last is not None:
+            last = box.last.rule.formula.toString()
+            self.boxes[-1].setdefault(last, []).append(box)
+            self.boxes[-1].setdefault(('instance', skeleton(last)), []).append(box)
+
+    def repair(self, input_proof):
+        repairs = []
+        for step in parse_steps(input_proof):
+            if step[0] == 'line':
+                repair = self.add_line(*step[1:])
+                if repair is not None:
+                    repairs.append(repair)
+            elif step[0] == 'box':
+                self.open_box(*step[1:])
+            else:
+                self.close_box()
+        return ProofRepair(repairs, self.session.text())
+
+def repair_proof(input_proof):
+    '''Finds the lines of the proof with errors (e.g. a reference to a wrong line, or a rule
+    missing or misspelled) and, for each one, the rule and the references that make it
+    valid. Returns a ProofRepair with a LineRepair for each line with errors and the text of
+    the proof with the fixes. Raises ValueError if a formula of the proof is not valid.'''
+    return ProofRepairer().repair(input_proof)
+
+def repair_to_string(repair):
+    if repair.fixed_rule is None:
+        return 'Linha {}: não foi encontrada uma correção.'.format(repair.line)
+    references = RULES[repair.fixed_rule][1].format(*repair.fixed_references)
+    return 'Linha {}: use {} {}.'.format(repair.line, repair.fixed_rule, references).replace(' .', '.')
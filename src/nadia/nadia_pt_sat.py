@@ -0,0 +1,322 @@
+import heapq
+from collections import namedtuple
+from nadia.nadia_pt_fo import AtomFormula, NegationFormula, AndFormula, OrFormula, ImplicationFormula, BiImplicationFormula
+
+# Conflicts before the first restart; the next ones follow the Luby sequence
+RESTART_BASE = 100
+VARIABLE_DECAY = 0.95
+
+# Result of the check of a sequent by the SAT solver: valid is True when the premisses
+# and the negation of the conclusion are unsatisfiable, otherwise valuation is a
+# countermodel (atom -> bool). The atoms are sorted.
+SatResult = namedtuple('SatResult', ['valid', 'valuation', 'atoms', 'conflicts'])
+
+def luby(i):
+    # i-th term (from 1) of the Luby sequence 1, 1, 2, 1, 1, 2, 4, 1, ...
+    k = 1
+    while (1 << k) - 1 < i:
+        k += 1
+    while (1 << k) - 1 != i:
+        i -= (1 << (k - 1)) - 1
+        k = 1
+        while (1 << k) - 1 < i:
+            k += 1
+    return 1 << (k - 1)
+
+class SatSolver():
+    '''CDCL SAT solver: two watched literals, 1-UIP clause learning, VSIDS, phase saving
+    and Luby restarts. The clauses are lists of literals in the DIMACS convention
+    (v or -v for the variable v >= 1).'''
+    def __init__(self):
+        # Internally, the literals of the variable v are 2v (true) and 2v+1 (false)
+        self.variables = 0
+        self.values = [0, 0]  # literal -> 1 (true), -1 (false) or 0
+        self.watches = [[], []]
+        self.levels = [0]
+        self.reasons = [None]
+        self.activity = [0.0]
+        self.phases = [False]
+        self.trail = []
+        self.trail_limits = []
+        self.head = 0
+        self.heap = []
+        self.increment = 1.0
+        self.learnts = []
+        self.max_learnts = 1000
+        self.conflicts = 0
+        self.unsatisfiable = False
+
+    def new_variable(self):
+        self.variables += 1
+        self.values += [0, 0]
+        self.watches += [[], []]
+        self.levels.append(0)
+        self.reasons.append(None)
+        self.activity.append(0.0)
+        self.phases.append(False)
+        heapq.heappush(self.heap, (0.0, self.variables))
+        return self.variables
+
+    def add_clause(self, literals):
+        # Must be called before solve, at the level 0
+        clause = []
+        for literal in literals:
+            literal = 2 * literal if literal > 0 else -2 * literal + 1
+            if literal ^ 1 in clause or self.values[literal] == 1:
+                return
+            if literal not in clause and self.values[literal] == 0:
+                clause.append(literal)
+        if not clause:
+            self.unsatisfiable = True
+        elif len(clause) == 1:
+            self.assign(clause[0], None)
+            if self.propagate() is not None:
+                self.unsatisfiable = True
+        else:
+            self.watches[clause[0]].append(clause)
+            self.watches[clause[1]].append(clause)
+
+    def assign(self, literal, reason):
+        self.values[literal] = 1
+        self.values[literal ^ 1] = -1
+        variable = literal >> 1
+        self.levels[variable] = len(self.trail_limits)
+        self.reasons[variable] = reason
+        self.trail.append(literal)
+
+    def propagate(self):
+        # Returns the conflicting clause, or None
+        values = self.values
+        watches = self.watches
+        trail = self.trail
+        while self.head < len(trail):
+            false_literal = trail[self.head] ^ 1
+            self.head += 1
+            watching = watches[false_literal]
+            kept = []
+            i = 0
+            n = len(watching)
+            while i < n:
+                clause = watching[i]
+                i += 1
+                if clause[0] == false_literal:
+                    clause[0], clause[1] = clause[1], false_literal
+                first = clause[0]
+                if values[first] == 1:
+                    kept.append(clause)
+                    continue
+                for k in range(2, len(clause)):
+                    if values[clause[k]] != -1:
+                        clause[1], clause[k] = clause[k], false_literal
+                        watches[clause[1]].append(clause)
+                        break
+                else:
+                    kept.append(clause)
+                    if values[first] == -1:
+                        kept.extend(watching[i:])
+                        watches[false_literal] = kept
+                        self.head = len(trail)
+                        return clause
+                    self.assign(first, clause)
+            watches[false_literal] = kept
+        return None
+
+    def bump(self, variable):
+        self.activity[variable] += self.increment
+        if self.activity[variable] > 1e100:
+            self.activity = [a * 1e-100 for a in self.activity]
+            self.increment *= 1e-100
+            self.heap = [(-self.activity[v], v) for v in range(1, self.variables + 1) if self.values[2 * v] == 0]
+            heapq.heapify(self.heap)
+        elif self.values[2 * variable] == 0:
+            heapq.heappush(self.heap, (-self.activity[variable], variable))
+
+    def analyze(self, conflict):
+        # 1-UIP learnt clause (its first literal is asserted after the backjump) and level
+        levels = self.levels
+        level = len(self.trail_limits)
+        seen = set()
+        learnt = [None]
+        counter = 0
+        clause = conflict
+        start = 0
+        index = len(self.trail) - 1
+        while True:
+            for literal in clause[start:]:
+                variable = literal >> 1
+                if variable not in seen and levels[variable] > 0:
+                    seen.add(variable)
+                    self.bump(variable)
+                    if levels[variable] == level:
+                        counter += 1
+                    else:
+                        learnt.append(literal)
+            while self.trail[index] >> 1 not in seen:
+                index -= 1
+            literal = self.trail[index]
+            index -= 1
+            counter -= 1
+            if counter == 0:
+                break
+            clause = self.reasons[literal >> 1]
+            start = 1
+        learnt[0] = literal ^ 1
+        # A literal is redundant if the other literals of its reason are in the clause
+        marked = set(l >> 1 for l in learnt)
+        minimized = [learnt[0]]
+        for literal in learnt[1:]:
+            reason = self.reasons[literal >> 1]
+            if reason is None or any(l >> 1 not in marked and levels[l >> 1] > 0 for l in reason[1:]):
+                minimized.append(literal)
+        learnt = minimized
+        back_level = 0
+        if len(learnt) > 1:
+            highest = max(range(1, len(learnt)), key=lambda i: levels[learnt[i] >> 1])
+            learnt[1], learnt[highest] = learnt[highest], learnt[1]
+            back_level = levels[learnt[1] >> 1]
+        self.increment /= VARIABLE_DECAY
+        return learnt, back_level
+
+    def backtrack(self, level):
+        if len(self.trail_limits) <= level:
+            return
+        limit = self.trail_limits[level]
+        for literal in self.trail[limit:]:
+            variable = literal >> 1
+            self.phases[variable] = literal & 1 == 0
+            self.values[literal] = self.values[literal ^ 1] = 0
+            self.reasons[variable] = None
+            heapq.heappush(self.heap, (-self.activity[variable], variable))
+        del self.trail[limit:]
+        del self.trail_limits[level:]
+        self.head = limit
+
+    def decide(self):
+        # Unassigned variable with the highest activity, or None
+        while self.heap:
+            activity, variable = heapq.heappop(self.heap)
+            if self.values[2 * variable] == 0 and -activity == self.activity[variable]:
+                return variable
+        for variable in range(1, self.variables + 1):
+            if self.values[2 * variable] == 0:
+                return variable
+        return None
+
+    def reduce_learnts(self):
+        # Forgets the longest half of the learnt clauses that are not reasons
+        locked = set(id(self.reasons[l >> 1]) for l in self.trail if self.reasons[l >> 1] is not None)
+        self.learnts.sort(key=len)
+        half = len(self.learnts) // 2
+        removed = set(id(c) for c in self.learnts[half:] if len(c) > 2 and id(c) not in locked)
+        self.learnts = [c for c in self.learnts if id(c) not in removed]
+        self.watches = [[c for c in watching if id(c) not in removed] for watching in self.watches]
+
+    def solve(self):
+        '''Returns True if the clauses are satisfiable (see value) and False otherwise.'''
+        if self.unsatisfiable:
+            return False
+        restarts = 1
+        budget = RESTART_BASE * luby(restarts)
+        while True:
+            conflict = self.propagate()
+            if conflict is not None:
+                self.conflicts += 1
+                if not self.trail_limits:
+                    self.unsatisfiable = True
+                    return False
+                learnt, back_level = self.analyze(conflict)
+                self.backtrack(back_level)
+                if len(learnt) == 1:
+                    self.assign(learnt[0], None)
+                else:
+                    self.watches[learnt[0]].append(learnt)
+                    self.watches[learnt[1]].append(learnt)
+                    self.learnts.append(learnt)
+                    self.assign(learnt[0], learnt)
+                budget -= 1
+                continue
+            if budget <= 0:
+                restarts += 1
+                budget = RESTART_BASE * luby(restarts)
+                self.backtrack(0)
+            if len(self.learnts) - len(self.trail) >= self.max_learnts:
+                self.reduce_learnts()
+                self.max_learnts = int(self.max_learnts * 1.1)
+            variable = self.decide()
+            if variable is None:
+                return True
+            self.trail_limits.append(len(self.trail))
+            self.assign(2 * variable + (0 if self.phases[variable] else 1), None)
+
+    def value(self, variable):
+        # Value of the variable in the model found by solve (None if unassigned)
+        value = self.values[2 * variable]
+        return None if value == 0 else value == 1
+
+class TseitinEncoder():
+    '''Adds to the solver the Tseitin clauses of formulas (AtomFormula, NegationFormula and
+    the binary formulas): each distinct subformula gets one variable, defined once, so the
+    subformulas shared by the premisses and the conclusion are encoded once. The negation
+    is the negated literal of its formula.'''
+    def __init__(self, solver):
+        self.solver = solver
+        self.atoms = {}
+        self.gates = {}
+        self.false = None
+
+    def literal(self, formula):
+        if isinstance(formula, AtomFormula):
+            if formula.key == '@':
+                if self.false is None:
+                    self.false = self.solver.new_variable()
+                    self.solver.add_clause([-self.false])
+                return self.false
+            if formula.key not in self.atoms:
+                self.atoms[formula.key] = self.solver.new_variable()
+            return self.atoms[formula.key]
+        if isinstance(formula, NegationFormula):
+            return -self.literal(formula.formula)
+        if not isinstance(formula, (AndFormula, OrFormula, ImplicationFormula, BiImplicationFormula)):
+            raise ValueError('A fórmula {} não é proposicional.'.format(formula.toString()))
+        left = self.literal(formula.left)
+        right = self.literal(formula.right)
+        if isinstance(formula, AndFormula):
+            return self.gate('&', left, right)
+        if isinstance(formula, OrFormula):
+            return -self.gate('&', -left, -right)
+        if isinstance(formula, ImplicationFormula):
+            return -self.gate('&', left, -right)
+        return self.gate('<->', left, right)
+
+    def gate(self, key, left, right):
+        left, right = min(left, right), max(left, right)
+        gate = self.gates.get((key, left, right))
+        if gate is None:
+            gate = self.solver.new_variable()
+            add_clause = self.solver.add_clause
+            if key == '&':
+                add_clause([-gate, left])
+                add_clause([-gate, right])
+                add_clause([gate, -left, -right])
+            else:
+                add_clause([-gate, -left, right])
+                add_clause([-gate, left, -right])
+                add_clause([gate, left, right])
+                add_clause([gate, -left, -right])
+            self.gates[(key, left, right)] = gate
+        return gate
+
+def decide_sequent(premisses, conclusion):
+    '''Checks the sequent premisses |- conclusion (formulas of ParserTheorem.getTheorem) with
+    the SAT solver and returns a SatResult with a countermodel when it is not valid. Raises
+    ValueError if a formula is not propositional.'''
+    solver = SatSolver()
+    encoder = TseitinEncoder(solver)
+    for premisse in premisses:
+        solver.add_clause([encoder.literal(premisse)])
+    solver.add_clause([-encoder.literal(conclusion)])
+    atoms = sorted(encoder.atoms)
+    if not solver.solve():
+        return SatResult(True, None, atoms, solver.conflicts)
+    valuation = {atom: solver.value(encoder.atoms[atom]) is True for atom in atoms}
+    return SatResult(False, valuation, atoms, solver.conflicts)
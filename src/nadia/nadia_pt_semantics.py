@@ -0,0 +1,192 @@
+from collections import namedtuple
+from functools import lru_cache
+from nadia.nadia_pt_fo import ParserTheorem, ParserNadia, AtomFormula, NegationFormula, AndFormula, OrFormula, ImplicationFormula, BiImplicationFormula
+from nadia.nadia_pt_sat import decide_sequent
+from nadia.nadia_pt_models import search_countermodel, model_to_string
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Valuations evaluated at once: 2^CHUNK_BITS (4M valuations, 512 KB per bit-packed array)
+CHUNK_BITS = 22
+WORD_BITS = 64
+# Sequents with more atoms are checked by the SAT solver
+TRUTH_TABLE_ATOMS = 20
+# Largest domain and interpretations (under a second) of the search of the first-order
+# countermodels of the messages. The search is limited by a number of interpretations and
+# not by time, so the message is the same on every run and can be cached.
+MODEL_SIZE = 3
+MODEL_INTERPRETATIONS = 1 << 18
+
+# Result of the evaluation of a sequent on all the valuations of its atoms. The atoms are
+# sorted, valid is True when no valuation makes the premisses true and the conclusion
+# false and valuation is the first one that does (atom -> bool, None when valid), in the
+# order of the truth table (F before V, the first atom varies slowest).
+TruthTableResult = namedtuple('TruthTableResult', ['valid', 'valuation', 'atoms'])
+
+def sequent_atoms(premisses, conclusion):
+    # Sorted atoms of the sequent; raises ValueError if a formula is not propositional
+    atoms = set()
+    stack = list(premisses) + [conclusion]
+    while stack:
+        formula = stack.pop()
+        if isinstance(formula, AtomFormula):
+            if formula.key != '@':
+                atoms.add(formula.key)
+        elif isinstance(formula, NegationFormula):
+            stack.append(formula.formula)
+        elif isinstance(formula, (AndFormula, OrFormula, ImplicationFormula, BiImplicationFormula)):
+            stack.append(formula.left)
+            stack.append(formula.right)
+        else:
+            raise ValueError('A fórmula {} não é proposicional.'.format(formula.toString()))
+    return sorted(atoms)
+
+def evaluate(formula, values, ones, cache):
+    # Truth values of the formula on the valuations of the chunk, one bit per valuation.
+    # ones has all bits of the chunk set, so ones ^ x is the negation of x.
+    key = formula.toString()
+    result = cache.get(key)
+    if result is not None:
+        return result
+    if isinstance(formula, AtomFormula):
+        result = ones ^ ones if formula.key == '@' else values[formula.key]
+    elif isinstance(formula, NegationFormula):
+        result = ones ^ evaluate(formula.formula, values, ones, cache)
+    else:
+        left = evaluate(formula.left, values, ones, cache)
+        right = evaluate(formula.right, values, ones, cache)
+        if isinstance(formula, AndFormula):
+            result = left & right
+        elif isinstance(formula, OrFormula):
+            result = left | right
+        elif isinstance(formula, ImplicationFormula):
+            result = (ones ^ left) | right
+        else:
+            result = ones ^ left ^ right
+    cache[key] = result
+    return result
+
+def word_patterns(bits):
+    # Bits of the valuations of a word (64 valuations) in which the atom of each bit is true
+    patterns = []
+    for bit in range(bits):
+        pattern = 0
+        for i in range(WORD_BITS):
+            if (i >> bit) & 1:
+                pattern |= 1 << i
+        patterns.append(pattern)
+    return patterns
+
+class NumpyChunks():
+    # The valuations of a chunk as numpy arrays of 64-bit words
+    def __init__(self, chunk_bits):
+        self.words = max(1, (1 << chunk_bits) // WORD_BITS)
+        self.ones = numpy.uint64((1 << min(1 << chunk_bits, WORD_BITS)) - 1)
+        self.zero = numpy.uint64(0)
+        index = numpy.arange(self.words, dtype=numpy.uint64)
+        self.patterns = [numpy.uint64(pattern) & self.ones for pattern in word_patterns(min(chunk_bits, 6))]
+        for bit in range(6, chunk_bits):
+            self.patterns.append(numpy.where((index >> numpy.uint64(bit - 6)) & numpy.uint64(1), self.ones, self.zero))
+
+    def first(self, result):
+        # Position of the first valuation set in result, or None
+        words = numpy.flatnonzero(numpy.atleast_1d(result))
+        if len(words) == 0:
+            return None
+        word = int(numpy.atleast_1d(result)[words[0]])
+        return int(words[0]) * WORD_BITS + (word & -word).bit_length() - 1
+
+class IntChunks():
+    # The valuations of a chunk as the bits of a Python int (when numpy is not installed)
+    def __init__(self, chunk_bits):
+        size = 1 << chunk_bits
+        self.ones = (1 << size) - 1
+        self.zero = 0
+        self.patterns = []
+        for bit in range(chunk_bits):
+            # Blocks of 2^bit false valuations followed by 2^bit true ones
+            block = ((1 << (1 << bit)) - 1) << (1 << bit)
+            period = 1 << (bit + 1)
+            pattern = block
+            while period < size:
+                pattern |= pattern << period
+                period *= 2
+            self.patterns.append(pattern & self.ones)
+
+    def first(self, result):
+        if result == 0:
+            return None
+        return (result & -result).bit_length() - 1
+
+def evaluate_sequent(premisses, conclusion, chunk_bits=CHUNK_BITS):
+    '''Evaluates the sequent premisses |- conclusion (formulas of ParserTheorem.getTheorem) on
+    all the valuations of its atoms, 2^chunk_bits valuations at a time, and returns a
+    TruthTableResult with the first valuation that falsifies it. The valuations are
+    bit-packed in numpy arrays (or Python ints when numpy is not installed).'''
+    atoms = sequent_atoms(premisses, conclusion)
+    n = len(atoms)
+    chunk_bits = min(n, chunk_bits)
+    chunks = NumpyChunks(chunk_bits) if numpy is not None else IntChunks(chunk_bits)
+    for chunk in range(1 << (n - chunk_bits)):
+        # The atom i is the bit n-1-i of the valuation: the last atoms vary inside the chunk
+        values = {}
+        for i, atom in enumerate(atoms):
+            bit = n - 1 - i
+            if bit < chunk_bits:
+                values[atom] = chunks.patterns[bit]
+            else:
+                values[atom] = chunks.ones if (chunk >> (bit - chunk_bits)) & 1 else chunks.zero
+        cache = {}
+        falsified = chunks.ones ^ evaluate(conclusion, values, chunks.ones, cache)
+        for premisse in premisses:
+            falsified = falsified & evaluate(premisse, values, chunks.ones, cache)
+        position = chunks.first(falsified)
+        if position is not None:
+            index = (chunk << chunk_bits) + position
+            valuation = {atom: bool((index >> (n - 1 - i)) & 1) for i, atom in enumerate(atoms)}
+            return TruthTableResult(False, valuation, atoms)
+    return TruthTableResult(True, None, atoms)
+
+def decide(premisses, conclusion):
+    # By the truth table (the first countermodel) up to TRUTH_TABLE_ATOMS atoms, by the SAT
+    # solver (any countermodel) beyond it
+    if len(sequent_atoms(premisses, conclusion)) <= TRUTH_TABLE_ATOMS:
+        return evaluate_sequent(premisses, conclusion)
+    return decide_sequent(premisses, conclusion)
+
+def find_countermodel(input_theorem):
+    '''Returns a valuation (atom -> bool) that makes the premisses of the theorem (e.g.
+    'A|B, A->C |- C') true and its conclusion false, or None if the theorem is valid. Up to
+    TRUTH_TABLE_ATOMS atoms, it is the first one in the order of the truth table.
+    Raises ValueError if the theorem is not a propositional sequent.'''
+    premisses, conclusion = ParserTheorem.getTheorem(input_theorem)
+    if conclusion is None:
+        raise ValueError('{} não é um teorema válido!'.format(input_theorem))
+    return decide(premisses, conclusion).valuation
+
+def valuation_to_string(valuation):
+    return ', '.join('{} = {}'.format(atom, 'V' if value else 'F') for atom, value in sorted(valuation.items()))
+
+@lru_cache(maxsize=256)
+def countermodel_message(input_theorem):
+    # Message shown with the errors of a proof of a theorem that is not valid. The first-order
+    # countermodels are searched in at most MODEL_INTERPRETATIONS interpretations, once per
+    # theorem
+    premisses, conclusion = ParserTheorem.getTheorem(input_theorem)
+    if conclusion is None:
+        return ''
+    try:
+        result = decide(premisses, conclusion)
+        countermodel = valuation_to_string(result.valuation) if not result.valid else None
+    except ValueError:
+        # Not propositional
+        try:
+            model = search_countermodel(premisses, conclusion, MODEL_SIZE, None, MODEL_INTERPRETATIONS).countermodel
+        except ValueError:
+            return ''
+        countermodel = model_to_string(model) if model is not None else None
+    if countermodel is None:
+        return ''
+    return '\nO teorema {} não é válido. Contraexemplo: {}.'.format(ParserNadia.toString(premisses, conclusion), countermodel)
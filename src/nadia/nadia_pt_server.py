@@ -0,0 +1,192 @@
+import asyncio
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from nadia.nadia_pt_fo import verify_proof, warm_up
+
+MAX_BODY_SIZE = 1024 * 1024
+# Connections waiting to be accepted, so that a burst is answered with 503 instead of reset
+BACKLOG = 1024
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           413: 'Payload Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable',
+           504: 'Gateway Timeout'}
+
+def worker_context():
+    # The workers are started by a fork server (a new process): a fork of this process would
+    # keep its open connections, which the clients would not see closed, in the workers
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('forkserver')
+    return None
+
+def check_request(input_proof, input_theorem, display_theorem, display_fitch, display_gentzen):
+    # Runs in a worker process
+    status, sequent, errors, message, codes = verify_proof(input_proof, input_theorem, display_theorem, display_fitch, display_gentzen)
+    return {'status': status, 'sequent': sequent, 'errors': errors, 'codes': codes, 'message': message}
+
+class ProofServer():
+    '''Checks proofs sent as JSON by HTTP POST to /check, e.g.
+    {"proof": "1. A pre\\n2. A copie 1", "theorem": "A |- A"}. The connections are handled
+    by asyncio and the proofs are checked by a pool of worker processes that are warmed up
+    when the server starts. At most max_queue checks may be pending: the next requests are
+    answered with 503 until the queue drains, and a check that takes more than timeout
+    seconds is answered with 504 (it stays pending until its worker finishes it). A check
+    that fails in its worker is answered with 500; if the worker was killed, the pool is
+    started again.'''
+    def __init__(self, workers=None, max_queue=64, timeout=10.0):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.pending = 0
+        self.last_request = 0
+        self.executor = None
+
+    async def start_workers(self):
+        self.executor = ProcessPoolExecutor(self.workers, mp_context=worker_context(), initializer=warm_up)
+        loop = asyncio.get_running_loop()
+        # Starts every worker before accepting connections
+        await asyncio.gather(*[loop.run_in_executor(self.executor, warm_up) for i in range(self.workers)])
+
+    def stop_workers(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    async def check(self, request):
+        if not isinstance(request, dict) or not isinstance(request.get('proof'), str):
+            return 400, {'error': 'O campo "proof" com a demonstração é obrigatório.'}
+        input_theorem = request.get('theorem')
+        if input_theorem is not None and not isinstance(input_theorem, str):
+            return 400, {'error': 'O campo "theorem" deve ser um texto.'}
+        if self.pending >= self.max_queue:
+            return 503, {'error': 'Servidor ocupado, tente novamente.'}
+        loop = asyncio.get_running_loop()
+        executor = self.executor
+        try:
+            job = executor.submit(check_request, request['proof'], input_theorem,
+                                  bool(request.get('display_theorem', True)),
+                                  bool(request.get('display_fitch', False)),
+                                  bool(request.get('display_gentzen', False)))
+        except BrokenProcessPool:
+            await self.restart_workers(executor)
+            return 500, {'error': 'Um processo de verificação terminou inesperadamente, tente novamente.'}
+        # A check that timed out keeps its worker busy, so it is pending until the job finishes
+        self.pending += 1
+        job.add_done_callback(lambda job: loop.call_soon_threadsafe(self.job_done))
+        try:
+            return 200, await asyncio.wait_for(asyncio.wrap_future(job), self.timeout)
+        except asyncio.TimeoutError:
+            return 504, {'error': 'A verificação da demonstração excedeu o tempo limite.'}
+        except BrokenProcessPool:
+            # A worker was killed (e.g. by the operating system): the pool can not be used again
+            await self.restart_workers(executor)
+            return 500, {'error': 'Um processo de verificação terminou inesperadamente, tente novamente.'}
+        except Exception:
+            return 500, {'error': 'A verificação da demonstração terminou com um erro inesperado.'}
+
+    def job_done(self):
+        self.pending -= 1
+
+    async def restart_workers(self, executor):
+        # Only the first request that finds the pool broken starts a new one
+        if self.executor is executor:
+            self.stop_workers()
+            await self.start_workers()
+
+    async def handle(self, method, path, body):
+        self.last_request = asyncio.get_running_loop().time()
+        if path == '/health':
+            return 200, {'workers': self.workers, 'pending': self.pending, 'max_queue': self.max_queue}
+        if path != '/check':
+            return 404, {'error': 'Recurso não encontrado.'}
+        if method != 'POST':
+            return 405, {'error': 'Use o método POST.'}
+        try:
+            request = json.loads(body)
+        except ValueError:
+            return 400, {'error': 'A requisição não é um JSON válido.'}
+        return await self.check(request)
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, path, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    await self.write_response(writer, 400, {'error': 'Requisição inválida.'}, False)
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+                try:
+                    length = int(headers.get('content-length', 0))
+                except ValueError:
+                    length = -1
+                if length < 0 or length > MAX_BODY_SIZE:
+                    await self.write_response(writer, 413 if length > 0 else 400, {'error': 'Tamanho da requisição inválido.'}, False)
+                    break
+                body = await reader.readexactly(length)
+                code, response = await self.handle(method, path.split('?')[0], body)
+                await self.write_response(writer, code, response, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def write_response(self, writer, code, response, keep_alive):
+        body = json.dumps(response, ensure_ascii=False).encode('utf-8')
+        head = 'HTTP/1.1 {} {}\r\nContent-Type: application/json; charset=utf-8\r\nContent-Length: {}\r\nConnection: {}\r\n\r\n'.format(
+            code, REASONS[code], len(body), 'keep-alive' if keep_alive else 'close')
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+    async def close_when_idle(self, server, idle_timeout):
+        loop = asyncio.get_running_loop()
+        self.last_request = loop.time()
+        while True:
+            await asyncio.sleep(min(idle_timeout, 60))
+            if self.pending == 0 and loop.time() - self.last_request >= idle_timeout:
+                server.close()
+                return
+
+    async def serve(self, host='127.0.0.1', port=8000, unix_socket=None, ready=None, idle_timeout=None):
+        # If idle_timeout is given, the server stops after that many seconds without requests
+        await self.start_workers()
+        try:
+            if unix_socket is not None:
+                server = await asyncio.start_unix_server(self.handle_connection, path=unix_socket, backlog=BACKLOG)
+                os.chmod(unix_socket, 0o600)
+            else:
+                server = await asyncio.start_server(self.handle_connection, host, port, backlog=BACKLOG)
+            async with server:
+                if ready is not None:
+                    ready(server)
+                if idle_timeout is not None:
+                    asyncio.ensure_future(self.close_when_idle(server, idle_timeout))
+                try:
+                    await server.serve_forever()
+                except asyncio.CancelledError:
+                    pass
+        finally:
+            self.stop_workers()
+
+def serve(host='127.0.0.1', port=8000, unix_socket=None, workers=None, max_queue=64, timeout=10.0):
+    server = ProofServer(workers=workers, max_queue=max_queue, timeout=timeout)
+    address = unix_socket if unix_socket is not None else f'http://{host}:{port}/check'
+    ready = lambda s: print(f'NADIA verificando demonstrações em {address} com {server.workers} processos.', flush=True)
+    try:
+        asyncio.run(server.serve(host, port, unix_socket, ready))
+    except KeyboardInterrupt:
+        pass
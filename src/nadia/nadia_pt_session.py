@@ -0,0 +1,488 @@
+import re
+from rply.errors import LexingError
+from rply.token import Token, SourcePosition
+from nadia.nadia_pt_fo import (ParserNadia, ParserFormula, get_warm_lexer, constants,
+                               natural_deduction_return, PremisseDef, HypothesisDef, HypothesisFirstOrderDef, CopiedDef,
+                               ImplicationEliminationDef, ImplicationIntroductionDef, DisjunctionIntroductionDef,
+                               DisjunctionEliminationDef, AndIntroductionDef, AndEliminationDef,
+                               NegationIntroductionDef, NegationEliminationDef, BottomDef, RaaDef,
+                               ForAllEliminationDef, ExistsIntroductionDef, ExistsEliminationtionDef,
+                               ForAllIntroductiontionDef, ModusTollensDef, DoubleNegationDef, ExcludedMiddleDef)
+
+# Rule of each justification and the format of its references
+RULES = {
+    'pre': (PremisseDef, ''),
+    '->e': (ImplicationEliminationDef, '{},{}'),
+    '->i': (ImplicationIntroductionDef, '{}-{}'),
+    '|i': (DisjunctionIntroductionDef, '{}'),
+    '|e': (DisjunctionEliminationDef, '{},{}-{},{}-{}'),
+    '&i': (AndIntroductionDef, '{},{}'),
+    '&e': (AndEliminationDef, '{}'),
+    '~i': (NegationIntroductionDef, '{}-{}'),
+    '~e': (NegationEliminationDef, '{},{}'),
+    '@e': (BottomDef, '{}'),
+    'raa': (RaaDef, '{}-{}'),
+    'Ae': (ForAllEliminationDef, '{}'),
+    'Ei': (ExistsIntroductionDef, '{}'),
+    'Ee': (ExistsEliminationtionDef, '{},{}-{}'),
+    'Ai': (ForAllIntroductiontionDef, '{}-{}'),
+    'copie': (CopiedDef, '{}'),
+    # Derived rules
+    'mt': (ModusTollensDef, '{},{}'),
+    'dn': (DoubleNegationDef, '{}'),
+    'lem': (ExcludedMiddleDef, ''),
+    'pbc': (RaaDef, '{}-{}'),
+}
+
+# Rules that dispose the boxes closed right before them
+DISPOSING_RULES = (NegationIntroductionDef, RaaDef, ImplicationIntroductionDef, DisjunctionEliminationDef,
+                   ExistsEliminationtionDef, ForAllIntroductiontionDef)
+
+FORMULA_TOKENS = ('OPEN_PAREN', 'CLOSE_PAREN', 'COMMA', 'NOT', 'AND', 'OR', 'IMPLIE', 'BOTTOM', 'EXT', 'ALL', 'VAR', 'ATOM')
+
+INDENT = '    '
+
+class PersistentArray():
+    # Array of values by integer index that is never changed: set returns a new array, which
+    # shares with this one everything but the path to the index (a trie of 32 slots per node),
+    # so keeping a version of the array is free and changing it costs O(log32 n).
+    __slots__ = ('root', 'shift')
+
+    def __init__(self, root=None, shift=0):
+        self.root = root
+        self.shift = shift
+
+    def get(self, index, default=None):
+        node, shift = self.root, self.shift
+        if node is None or index >> shift >= 32:
+            return default
+        while shift:
+            node = node[(index >> shift) & 31]
+            if node is None:
+                return default
+            shift -= 5
+        value = node[index & 31]
+        return default if value is None else value
+
+    def set(self, index, value):
+        root, shift = self.root, self.shift
+        if root is None:
+            root = (None,) * 32
+        while index >> shift >= 32:
+            root = (root,) + (None,) * 31
+            shift += 5
+        return PersistentArray(self._set(root, shift, index, value), shift)
+
+    def _set(self, node, shift, index, value):
+        slots = list(node) if node is not None else [None] * 32
+        if shift:
+            slots[(index >> shift) & 31] = self._set(slots[(index >> shift) & 31], shift - 5, index, value)
+        else:
+            slots[index & 31] = value
+        return tuple(slots)
+
+EMPTY = PersistentArray()
+
+class LineEntry():
+    # A rule of the symbol table, with the previous rule of its scope and the free variables of
+    # the rules of its scope up to it
+    __slots__ = ('rule', 'token', 'scope', 'references', 'previous', 'free_variables')
+
+    def __init__(self, rule, token, scope, references, previous):
+        self.rule = rule
+        self.token = token
+        self.scope = scope
+        self.references = references
+        self.previous = previous
+        variables = rule.formula.free_variables()
+        self.free_variables = previous.free_variables | variables if previous is not None else frozenset(variables)
+
+class ScopeRecord():
+    # A scope (box) of the symbol table; the end of a box is None until it is closed
+    __slots__ = ('number', 'parent', 'variable', 'start_line', 'end_line', 'first', 'last')
+
+    def __init__(self, number, parent, variable, start_line, end_line=None, first=None, last=None):
+        self.number = number
+        self.parent = parent
+        self.variable = variable
+        self.start_line = start_line
+        self.end_line = end_line
+        self.first = first
+        self.last = last
+
+class PersistentSymbolTable():
+    '''Symbol table that is never changed: insert, add_scope and end_scope return a new
+    table that shares with this one all the lines and scopes that they do not change. So
+    keeping a version of the table (e.g. before a line, to check other lines in its place)
+    costs nothing, and each version answers the queries of the rules as the SymbolTable
+    of the same lines.'''
+    __slots__ = ('lines', 'scopes', 'starts', 'current_scope', 'scope_count')
+
+    def __init__(self, lines=EMPTY, scopes=None, starts=None, current_scope=0, scope_count=1):
+        self.lines = lines
+        self.scopes = scopes if scopes is not None else EMPTY.set(0, ScopeRecord(0, None, None, 1, 1))
+        self.starts = starts if starts is not None else EMPTY.set(1, (0,))
+        self.current_scope = current_scope
+        self.scope_count = scope_count
+
+    def insert(self, symbol, line, references=()):
+        scope = self.scopes.get(self.current_scope)
+        entry = LineEntry(symbol, line, self.current_scope, references, scope.last)
+        scope = ScopeRecord(scope.number, scope.parent, scope.variable, scope.start_line, scope.end_line,
+                            scope.first if scope.first is not None else entry, entry)
+        return PersistentSymbolTable(self.lines.set(symbol.line, entry), self.scopes.set(scope.number, scope),
+                                     self.starts, self.current_scope, self.scope_count)
+
+    def add_scope(self, start_line, variable=None):
+        number = self.scope_count
+        scope = ScopeRecord(number, self.current_scope, variable, start_line)
+        return PersistentSymbolTable(self.lines, self.scopes.set(number, scope),
+                                     self.starts.set(start_line, self.starts.get(start_line, ()) + (number,)),
+                                     number, number + 1)
+
+    def end_scope(self, end_line):
+        scope = self.scopes.get(self.current_scope)
+        scope = ScopeRecord(scope.number, scope.parent, scope.variable, scope.start_line, end_line, scope.first, scope.last)
+        return PersistentSymbolTable(self.lines, self.scopes.set(scope.number, scope), self.starts,
+                                     scope.parent if scope.parent is not None else scope.number, self.scope_count)
+
+    def get_scope(self, scope):
+        return self.scopes.get(scope) if scope is not None else None
+
+    def find_token(self, line):
+        entry = self.lines.get(line)
+        return entry.token if entry is not None else None
+
+    def get_rule(self, rule_line):
+        entry = self.lines.get(rule_line)
+        return entry.rule if entry is not None else None
+
+    def find_reference_token(self, line, reference):
+        return self.lines.get(line).references[reference-1]
+
+    def find_scope(self, line):
+        entry = self.lines.get(line)
+        if entry is not None:
+            return entry.scope
+        #Verifica se a linha não tem fórmula (introdução do universal)
+        scopes = self.starts.get(line)
+        # The box of the line, not the proof (scope_0 also starts at the line 1)
+        return scopes[-1] if scopes else None
+
+    def find_scope_variable(self, line):
+        scope = self.get_scope(self.find_scope(line))
+        return scope.variable if scope is not None else None
+
+    def check_scope_is_valid(self, scope):
+        current_scope = self.current_scope
+        while current_scope != None:
+            if current_scope == scope:
+                return True
+            current_scope = self.scopes.get(current_scope).parent
+        return False
+
+    def lookup_formula_by_line(self, symbol_line, line):
+        entry = self.lines.get(line)
+        if entry is None:
+            return None
+        scope = self.find_scope(symbol_line)
+        while scope != None:
+            if scope == entry.scope:
+                return entry.rule.formula
+            scope = self.scopes.get(scope).parent
+        return None
+
+    def check_scope_delimiter(self, line1, line2):
+        for number in self.starts.get(line1, ()):
+            scope = self.scopes.get(number)
+            if number != 0 and scope.end_line == line2 and scope.first is not None:
+                return scope.first.rule.formula, scope.last.rule.formula
+        return None, None
+
+    def is_fresh_variable(self, line):
+        scope = self.get_scope(self.find_scope(line))
+        variable = scope.variable if scope is not None else None
+        return not variable in self.get_free_variables_before_scope(line)
+
+    def get_free_variables_before_scope(self, line):
+        free_variables = set()
+        scope = self.get_scope(self.find_scope(line))
+        scope = self.get_scope(scope.parent) if scope is not None else None
+        while scope != None:
+            # The last rule of the scope before the line
+            entry = scope.last
+            while entry is not None and entry.rule.line >= line:
+                entry = entry.previous
+            if entry is not None:
+                free_variables.update(entry.free_variables)
+            if (scope.start_line<line and scope.variable):
+                free_variables = free_variables.union(set(scope.variable))
+            scope = self.get_scope(scope.parent)
+        return free_variables
+
+    def get_first_rule_from_scope(self, line):
+        scope = self.get_scope(self.find_scope(line))
+        return scope.first.rule if scope is not None and scope.first is not None else None
+
+    def get_last_rule_from_scope(self):
+        last = self.scopes.get(self.current_scope).last
+        return last.rule if last is not None else None
+
+    def get_box_start(self):
+        if self.current_scope != 0:
+            return self.scopes.get(self.current_scope).start_line
+        return None
+
+class SessionState():
+    # A version of a session: its symbol table, its source and the errors of each line of the
+    # source, which are shared with the versions before it
+    __slots__ = ('table', 'source', 'size', 'verdicts', 'next_line', 'depth', 'pending', 'history', 'all_errors')
+
+    def __init__(self, table, source, size, verdicts, next_line, depth, pending, history):
+        self.table = table
+        self.source = source
+        self.size = size
+        self.verdicts = verdicts
+        self.next_line = next_line
+        self.depth = depth
+        # Boxes closed whose next rule in the parent box was not added yet
+        self.pending = pending
+        # The version before each line of the proof
+        self.history = history
+        self.all_errors = None
+
+    def errors(self):
+        if self.all_errors is None:
+            errors, codes = [], []
+            for position in range(1, self.size + 1):
+                verdict = self.verdicts.get(position)
+                if verdict is not None:
+                    errors.extend(verdict[0])
+                    codes.extend(verdict[1])
+            self.all_errors = (errors, codes)
+        return self.all_errors
+
+class SessionParser(ParserNadia):
+    # Evaluates the rules of a session, whose source is kept line by line
+    def __init__(self):
+        ParserNadia.__init__(self, '')
+        self.source = EMPTY
+
+    def source_line(self, lineno):
+        return self.source.get(lineno)
+
+class ProofSession():
+    '''Builds a proof line by line (e.g. by a prover or a proof generator) and checks each
+    line when it is added, against the symbol table of the lines before it, so the whole
+    proof is checked in time linear in its size instead of checking it again after each
+    line. The errors are the same of ParserNadia.getProof for the text of the session
+    (text()), except for the boxes still open and the boxes not disposed at the end of the
+    proof, which are reported only by check().
+
+    The versions of the session share their lines, so snapshot() and rollback() take O(1),
+    and branch(line) returns in O(1) a new session with the lines before the line, e.g. to
+    check what happens if the line were other. A branch does not change this session.'''
+    def __init__(self, state=None, formulas=None):
+        self.parser = SessionParser()
+        if state is None:
+            state = SessionState(PersistentSymbolTable(), EMPTY, 0, EMPTY, 1, 0, (), EMPTY)
+        self.state = state
+        # Tokens and formula of each formula text, as the provers use the same formulas many times
+        self.formulas = formulas if formulas is not None else {}
+
+    @property
+    def symbol_table(self):
+        return self.state.table
+
+    @property
+    def errors(self):
+        return self.state.errors()[0]
+
+    @property
+    def error_codes(self):
+        return self.state.errors()[1]
+
+    @property
+    def next_line(self):
+        return self.state.next_line
+
+    @property
+    def depth(self):
+        return self.state.depth
+
+    def line_errors(self, line):
+        '''Errors of the line of the proof.'''
+        before = self.state.history.get(line)
+        verdict = self.state.verdicts.get(before.size + 1) if before is not None else None
+        return list(verdict[0]) if verdict is not None else []
+
+    def text(self):
+        return '\n'.join(self.state.source.get(position) for position in range(1, self.state.size + 1))
+
+    def check(self):
+        '''Checks the whole text of the session, including the boxes not closed or not disposed.'''
+        return ParserNadia.getProof(self.text())
+
+    def parse_formula(self, formula):
+        # The text, the tokens (name, value and column) and the formula of a formula object or text
+        text = formula if isinstance(formula, str) else formula.toString()
+        cached = self.formulas.get(text)
+        if cached is None:
+            try:
+                tokens = list(get_warm_lexer().lex(text)) if '#' not in text and '\n' not in text else []
+            except LexingError:
+                tokens = []
+            if not tokens or any(token.gettokentype() not in FORMULA_TOKENS for token in tokens):
+                raise ValueError('A fórmula {} não é válida.'.format(text))
+            lexer, pg, parser = ParserFormula.getWarmParser()
+            pg.state = text
+            try:
+                result = parser.parse(iter(tokens))
+            except ValueError:
+                raise ValueError('A fórmula {} não é válida.'.format(text))
+            cached = (text, [(t.name, t.value, t.source_pos.colno) for t in tokens], result)
+            self.formulas[text] = cached
+        return cached
+
+    def token(self, name, value, colno):
+        # A token of the next line of the source, as the lexer would return it
+        return Token(name, value, SourcePosition(colno - 1, self.state.size + 1, colno))
+
+    def start_line(self, text):
+        # The source with the new line, for the errors of the line
+        self.parser.source = self.state.source.set(self.state.size + 1, text)
+        return natural_deduction_return()
+
+    def add_error(self, result, code, token, rule):
+        result.add_error(self.parser.get_error(code, token, rule), code)
+
+    def end_line(self, result, table, pending, next_line=None, depth=None):
+        # Keeps the new version of the session and returns the errors of the line
+        state = self.state
+        verdicts = state.verdicts
+        if result.errors:
+            verdicts = verdicts.set(state.size + 1, (tuple(result.errors), tuple(result.error_codes)))
+        history = state.history
+        if next_line is not None:
+            history = history.set(state.next_line, state)
+        self.state = SessionState(table, self.parser.source, state.size + 1, verdicts,
+                                  next_line if next_line is not None else state.next_line,
+                                  depth if depth is not None else state.depth, pending, history)
+        return list(result.errors)
+
+    def dispose_boxes(self, result, table, pending, rule):
+        # The rule is the next rule of the boxes closed in its box, so it must dispose them
+        kept = []
+        for number in pending:
+            box = table.get_scope(number)
+            if box.parent != table.current_scope:
+                kept.append(number)
+            elif not isinstance(rule, DISPOSING_RULES):
+                self.add_error(result, constants.BOX_MUST_BE_DISPOSED, box.first.token, box.first.rule)
+        return tuple(kept)
+
+    def add_line(self, formula, rule, references=()):
+        '''Adds the line "formula rule references" (e.g. add_line('A&B', '&i', (1, 2))) and
+        returns its errors. The formula may be a formula object or a text.'''
+        if rule not in RULES:
+            raise ValueError('A regra {} não existe.'.format(rule))
+        definition, references_format = RULES[rule]
+        references = tuple(int(reference) for reference in references)
+        if len(references) != references_format.count('{}'):
+            raise ValueError('A regra {} deve ter {} referências.'.format(rule, references_format.count('{}')))
+        text, formula_tokens, formula = self.parse_formula(formula)
+        state = self.state
+        line = state.next_line
+        prefix = '{}. {}'.format(line, INDENT * state.depth)
+        references_text = references_format.format(*references)
+        result = self.start_line('{}{} {} {}'.format(prefix, text, rule, references_text).rstrip())
+        number = self.token('NUM', str(line), 1)
+        name, value, colno = formula_tokens[0]
+        formula_token = self.token(name, value, len(prefix) + colno)
+        column = len(prefix) + len(text) + len(rule) + 3
+        reference_tokens = tuple(self.token('NUM', match.group(), column + match.start()) for match in re.finditer(r'\d+', references_text))
+        table, pending = state.table, state.pending
+        self.parser.symbol_table = table
+        if definition is CopiedDef:
+            # The same checks of the copy when the proof is parsed
+            if table.check_scope_is_valid(table.find_scope(references[0])):
+                original = table.get_rule(references[0])
+                if original is not None:
+                    new_rule = CopiedDef(line, original)
+                    if new_rule.formula != formula:
+                        self.add_error(result, constants.COPY_DIFFERENT_FORMULE, formula_token, new_rule)
+                    pending = self.dispose_boxes(result, table, pending, new_rule)
+                    table = table.insert(new_rule, number, reference_tokens)
+                else:
+                    self.add_error(result, constants.NONE_COPY, reference_tokens[0], original)
+            else:
+                self.add_error(result, constants.USING_DESCARTED_RULE, reference_tokens[0], None)
+        else:
+            new_rule = definition(line, formula, *references)
+            pending = self.dispose_boxes(result, table, pending, new_rule)
+            table = table.insert(new_rule, number, reference_tokens)
+            self.parser.symbol_table = table
+            new_rule.evaluation(self.parser, result)
+        return self.end_line(result, table, pending, line + 1)
+
+    def open_box(self, var=None, hyp=None):
+        '''Opens a box with the hypothesis hyp (e.g. open_box(hyp='A')), the variable var
+        (e.g. open_box('a') for the introduction of the universal) or both, and returns the
+        errors of its line.'''
+        if var is None and hyp is None:
+            raise ValueError('A caixa deve ter uma hipótese ou uma variável.')
+        if var is not None:
+            try:
+                names = [token.gettokentype() for token in get_warm_lexer().lex(var)]
+            except LexingError:
+                names = []
+            if names != ['VAR'] or var != var.strip():
+                raise ValueError('A variável {} não é válida.'.format(var))
+        text, formula_tokens, formula = self.parse_formula(hyp) if hyp is not None else (None, None, None)
+        state = self.state
+        line = state.next_line
+        box = ' '.join(part for part in ('{', var, text, 'hip' if text is not None else None) if part is not None)
+        result = self.start_line('{}. {}{}'.format(line, INDENT * state.depth, box))
+        number = self.token('NUM', str(line), 1)
+        table = state.table.add_scope(line, variable=var)
+        if formula is not None:
+            if var is not None:
+                table = table.insert(HypothesisFirstOrderDef(line, var, formula), number)
+            else:
+                table = table.insert(HypothesisDef(line, formula), number)
+        return self.end_line(result, table, state.pending, line + 1, state.depth + 1)
+
+    def close_box(self):
+        '''Closes the last box opened and returns the errors of the closing.'''
+        state = self.state
+        line_text = '   ' + INDENT * max(state.depth - 1, 0) + '}'
+        result = self.start_line(line_text)
+        token = self.token('CLOSE_BRACKET', '}', len(line_text))
+        table, pending, depth = state.table, state.pending, state.depth
+        rule = table.get_last_rule_from_scope()
+        if rule is None:
+            self.add_error(result, constants.BOX_MUST_BE_DISPOSED_BY_RULE, token, rule)
+        elif table.get_box_start() is not None:
+            # The boxes closed in this box have no next rule
+            pending = self.dispose_boxes(result, table, pending, None)
+            pending += (table.current_scope,)
+            table = table.end_scope(rule.line)
+            depth -= 1
+        else:
+            self.add_error(result, constants.CLOSE_BRACKET_WITHOUT_BOX, token, rule)
+        return self.end_line(result, table, pending, depth=depth)
+
+    def snapshot(self):
+        '''Returns the current version of the session, to be restored by rollback.'''
+        return self.state
+
+    def rollback(self, snapshot):
+        '''Returns to the version of the snapshot.'''
+        self.state = snapshot
+
+    def branch(self, line=None):
+        '''Returns a new session with the lines before the line (or with all the lines).'''
+        state = self.state if line is None else self.state.history.get(line)
+        if state is None:
+            raise ValueError('A linha {} não existe.'.format(line))
+        return ProofSession(state, self.formulas)
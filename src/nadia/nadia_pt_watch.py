@@ -0,0 +1,107 @@
+import hashlib
+import os
+import sys
+import time
+from collections import Counter
+from nadia.nadia_pt_fo import verify_proof, warm_up, check_status
+from nadia.nadia_pt_batch import find_files
+
+# Seconds between the checks of the files
+INTERVAL = 0.5
+
+class ProofWatcher():
+    '''Checks the proof files of paths (files, directories or glob patterns) whenever they
+    change, and writes to output what changed in their diagnostics: the errors found and
+    the errors fixed since the last check. The files are polled, so no other service is
+    needed, and only the files whose text changed are checked again, by the parsers of
+    this process.'''
+    def __init__(self, paths, input_theorem=None, output=None):
+        self.paths = paths
+        self.input_theorem = input_theorem
+        self.output = output or sys.stdout
+        # File name -> (mtime, size), hash of the text and result of its last check
+        self.stats = {}
+        self.hashes = {}
+        self.results = {}
+
+    def poll(self):
+        # Checks the files that changed since the last poll and returns their number
+        changed = 0
+        seen = set()
+        for file_name in find_files(self.paths):
+            seen.add(file_name)
+            try:
+                stat = os.stat(file_name)
+            except OSError:
+                continue
+            key = (stat.st_mtime_ns, stat.st_size)
+            if self.stats.get(file_name) == key:
+                continue
+            self.stats[file_name] = key
+            try:
+                with open(file_name, 'r', encoding='utf-8', errors='replace') as f:
+                    input_proof = f.read()
+            except OSError:
+                continue
+            digest = hashlib.sha256(input_proof.encode('utf-8')).digest()
+            if self.hashes.get(file_name) == digest:
+                continue
+            self.hashes[file_name] = digest
+            self.check(file_name, input_proof)
+            changed += 1
+        for file_name in list(self.stats):
+            if file_name not in seen:
+                del self.stats[file_name]
+                self.hashes.pop(file_name, None)
+                self.results.pop(file_name, None)
+                self.write(file_name, 'arquivo removido.')
+        return changed
+
+    def check(self, file_name, input_proof):
+        start = time.perf_counter()
+        status, sequent, errors, message, codes = verify_proof(input_proof, self.input_theorem, False, False, False)
+        elapsed = time.perf_counter() - start
+        previous = self.results.get(file_name)
+        self.results[file_name] = (status, errors)
+        if status != check_status.INVALID_PROOF:
+            if previous is None or previous[0] != status:
+                self.write(file_name, '{} ({:.0f} ms)'.format(message, elapsed * 1000))
+            else:
+                self.write(file_name, 'sem alterações ({:.0f} ms).'.format(elapsed * 1000))
+            for error in (previous[1] if previous is not None else []):
+                self.write_error('-', error)
+            self.output.flush()
+            return
+        old = Counter(previous[1]) if previous is not None else Counter()
+        new = Counter(errors)
+        found = list((new - old).elements())
+        fixed = list((old - new).elements())
+        kept = sum((new & old).values())
+        summary = '{} erros'.format(len(errors)) + (', {} novos, {} corrigidos'.format(len(found), len(fixed)) if previous is not None else '')
+        self.write(file_name, '{} ({:.0f} ms).'.format(summary, elapsed * 1000))
+        for error in fixed:
+            self.write_error('-', error)
+        for error in found:
+            self.write_error('+', error)
+        if kept and previous is not None:
+            self.output.write('  {} erros não mudaram.\n'.format(kept))
+        self.output.flush()
+
+    def write(self, file_name, text):
+        self.output.write('[{}] {}: {}\n'.format(time.strftime('%H:%M:%S'), file_name, text))
+        self.output.flush()
+
+    def write_error(self, sign, error):
+        lines = error.splitlines()
+        self.output.write('  {} {}\n'.format(sign, lines[0]))
+        for line in lines[1:]:
+            self.output.write('    {}\n'.format(line))
+
+    def run(self, interval=INTERVAL):
+        warm_up()
+        if self.poll() == 0:
+            self.output.write('Nenhuma demonstração encontrada; aguardando os arquivos.\n')
+            self.output.flush()
+        while True:
+            time.sleep(interval)
+            self.poll()
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The tests use the package from the source tree when it is not installed
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
@@ -0,0 +1,20 @@
+from nadia.nadia_pt_batch import check_proofs
+from nadia.nadia_pt_fo import check_status
+
+PROOFS = [
+    ('1. A pre\n2. A copie 1', 'A |- A'),
+    # Too deep for the recursion of the checker
+    ('1. ' + '~' * 3000 + 'A pre', None),
+    ('1. A&B pre\n2. B &e 1', 'A&B |- B'),
+]
+
+def check_statuses(**options):
+    results = list(check_proofs(PROOFS, **options))
+    assert [result.index for result in results] == [0, 1, 2]
+    return [result.status for result in results]
+
+def test_crash_is_recorded_in_the_main_process():
+    assert check_statuses(processes=1) == [check_status.CORRECT, check_status.CRASHED, check_status.CORRECT]
+
+def test_crash_is_recorded_in_the_workers():
+    assert check_statuses(processes=2, timeout=10) == [check_status.CORRECT, check_status.CRASHED, check_status.CORRECT]
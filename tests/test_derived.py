@@ -0,0 +1,59 @@
+import re
+import pytest
+from nadia.nadia_pt_derived import expand_derived_rules
+from nadia.nadia_pt_fo import verify_proof, check_status
+
+def check(input_proof, input_theorem=None, display_fitch=False):
+    status, sequent, errors, message, codes = verify_proof(input_proof, input_theorem, display_theorem=False, display_fitch=display_fitch, display_gentzen=True)
+    return status, message
+
+# (proof, theorem) of each derived rule
+DERIVED_PROOFS = [
+    ('1. P->Q pre\n2. ~Q pre\n3. ~P mt 1,2', 'P->Q, ~Q |- ~P'),
+    ('1. P&Q pre\n2. ~~(P&Q) dn 1', 'P&Q |- ~~(P&Q)'),
+    ('1. ~~P pre\n2. P dn 1', '~~P |- P'),
+    ('1. P|~P lem', '|- P|~P'),
+    ('1. ~~P pre\n2. { ~P hip\n3. @ ~e 2,1\n}\n4. P pbc 2-3', '~~P |- P'),
+    ('1. Ax (P(x)->Q(x)) pre\n2. ~Q(a) pre\n3. P(a)->Q(a) Ae 1\n4. ~P(a) mt 3,2', 'Ax (P(x)->Q(x)), ~Q(a) |- ~P(a)'),
+]
+
+INVALID_PROOFS = [
+    '1. P->Q pre\n2. ~P pre\n3. ~Q mt 1,2',
+    '1. P pre\n2. ~P dn 1',
+    '1. P|~Q lem',
+    '1. P pre\n2. { ~Q hip\n3. @ ~e 1,2\n}\n4. P pbc 2-3',
+]
+
+@pytest.mark.parametrize('input_proof, input_theorem', DERIVED_PROOFS)
+def test_derived_rule_is_correct(input_proof, input_theorem):
+    status, message = check(input_proof, input_theorem)
+    assert status == check_status.CORRECT
+
+@pytest.mark.parametrize('input_proof', INVALID_PROOFS)
+def test_derived_rule_is_not_correct(input_proof):
+    status, message = check(input_proof)
+    assert status == check_status.INVALID_PROOF
+
+@pytest.mark.parametrize('input_proof, input_theorem', DERIVED_PROOFS)
+def test_expansion_is_correct_without_derived_rules(input_proof, input_theorem):
+    expanded = expand_derived_rules(input_proof)
+    assert not re.search(r'\s(mt|dn|lem|pbc)(\s|$)', expanded, re.MULTILINE)
+    status, message = check(expanded, input_theorem)
+    assert status == check_status.CORRECT
+
+def test_expansion_of_an_incorrect_line_raises():
+    with pytest.raises(ValueError):
+        expand_derived_rules(INVALID_PROOFS[0])
+
+def test_pbc_is_shown_as_pbc():
+    status, message = check(DERIVED_PROOFS[4][0], display_fitch=True)
+    assert status == check_status.CORRECT
+    assert 'PBC 2-3' in message
+
+@pytest.mark.parametrize('name', ['mt', 'dn', 'lem', 'pbc'])
+def test_derived_rule_names_are_variables(name):
+    # As the variable of a box and as a term
+    input_proof = ('1. Ax P(x) pre\n2. { {0}\n3. P({0}) Ae 1\n}\n4. Ax P(x) Ai 2-3\n5. P({0}) Ae 1\n'
+                   '6. Ex P(x) Ei 5').replace('{0}', name)
+    status, message = check(input_proof, 'Ax P(x) |- Ex P(x)')
+    assert status == check_status.CORRECT
@@ -0,0 +1,38 @@
+import pytest
+
+widgets = pytest.importorskip('ipywidgets')
+from nadia import nadia_pt_gui
+
+class PlainOutput():
+    # An Output widget that does not hide the exceptions of the handler
+    def clear_output(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        return False
+
+def run_verify_formula(monkeypatch, *arguments):
+    # Runs the handler of "Verificar" and returns the text of what it displays
+    shown = []
+    monkeypatch.setattr(nadia_pt_gui, 'display', lambda *objects: shown.extend(objects))
+    monkeypatch.setattr(widgets, 'Output', PlainOutput)
+    nadia_pt_gui.verify_formula(*arguments)
+    buttons = next(box for box in shown if isinstance(box, widgets.HBox))
+    start = len(shown)
+    # Button.click would log the exceptions of the handler instead of raising them
+    for handler in buttons.children[0]._click_handlers.callbacks:
+        handler(buttons.children[0])
+    return ' '.join(str(getattr(item, 'data', item)) for item in shown[start:])
+
+def test_verify_formula_without_reference(monkeypatch):
+    text = run_verify_formula(monkeypatch, 'A->B')
+    assert 'Parabéns essa é uma fórmula da lógica' in text
+    assert 'equivalente' not in text
+
+def test_verify_formula_with_reference(monkeypatch):
+    assert 'Sua fórmula é equivalente à fórmula esperada' in run_verify_formula(monkeypatch, '~A|B', 'A->B')
+    text = run_verify_formula(monkeypatch, 'B->A', 'A->B')
+    assert 'não é equivalente à fórmula esperada' in text and 'A = F' in text
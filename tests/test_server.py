@@ -0,0 +1,122 @@
+import asyncio
+import json
+import os
+import signal
+import threading
+import time
+from nadia.nadia_pt_fo import check_proof
+from nadia.nadia_pt_server import ProofServer
+
+PROOFS = [('1. A pre\n2. A copie 1', 'A |- A'),
+          ('1. A&B pre\n2. A &e 1\n3. B &e 1\n4. B&A &i 3,2', 'A&B |- B&A'),
+          ('1. A->B pre\n2. ~B pre\n3. { A hip\n4. B ->e 3,1\n5. @ ~e 4,2\n}\n6. ~A ~i 3-5', 'A->B, ~B |- ~A'),
+          ('1. A pre\n2. B pre\n3. A&C &i 1,2', 'A, B |- A&C'),
+          ('1. Ax (P(x)&Q(x)) pre\n2. { a\n3. P(a)&Q(a) Ae 1\n4. P(a) &e 3\n}\n5. Ax P(x) Ai 2-4', 'Ax (P(x)&Q(x)) |- Ax P(x)')]
+# Takes about a second to check
+SLOW_PROOF = '\n'.join('{}. P{} pre'.format(i, i) for i in range(1, 4001))
+# Raises RecursionError in the worker
+DEEP_PROOF = '1. ' + '~' * 3000 + 'A pre'
+
+class RunningServer():
+    # A ProofServer on a Unix socket, served by an event loop in another thread
+    def __init__(self, path, **options):
+        self.path = str(path)
+        self.proof_server = ProofServer(**options)
+        self.ready = threading.Event()
+        self.thread = threading.Thread(target=asyncio.run, args=(self.proof_server.serve(unix_socket=self.path, ready=self.started),))
+
+    def started(self, server):
+        self.loop = asyncio.get_running_loop()
+        self.server = server
+        self.ready.set()
+
+    def __enter__(self):
+        self.thread.start()
+        assert self.ready.wait(60)
+        return self
+
+    def __exit__(self, *args):
+        self.loop.call_soon_threadsafe(self.server.close)
+        self.thread.join(60)
+
+    async def request(self, method, path, body=None):
+        # One HTTP request in its own connection, as a load generator would send it
+        reader, writer = await asyncio.open_unix_connection(self.path)
+        data = json.dumps(body).encode('utf-8') if body is not None else b''
+        writer.write('{} {} HTTP/1.1\r\nConnection: close\r\nContent-Length: {}\r\n\r\n'.format(method, path, len(data)).encode('latin-1') + data)
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        head, _, payload = response.partition(b'\r\n\r\n')
+        return int(head.split()[1]), json.loads(payload)
+
+    def check(self, requests):
+        async def run():
+            return await asyncio.gather(*[self.request('POST', '/check', request) for request in requests])
+        return asyncio.run(run())
+
+    def health(self):
+        return asyncio.run(self.request('GET', '/health'))[1]
+
+def expected(proof, theorem):
+    return check_proof(proof, theorem, True, False, False)
+
+def test_burst_is_answered_with_200_or_503(tmp_path):
+    requests = [{'proof': proof, 'theorem': theorem} for proof, theorem in PROOFS] * 40
+    with RunningServer(tmp_path / 'nadia.sock', workers=2, max_queue=8) as server:
+        responses = server.check(requests)
+        codes = [code for code, response in responses]
+        assert set(codes) == {200, 503}
+        for request, (code, response) in zip(requests, responses):
+            if code == 200:
+                assert response['message'] == expected(request['proof'], request['theorem'])
+        # Within the queue limit every request is checked
+        for i in range(0, len(requests), 8):
+            responses = server.check(requests[i:i + 8])
+            assert [code for code, response in responses] == [200] * len(responses)
+        assert server.health()['pending'] == 0
+
+def test_timeout_keeps_the_job_pending_until_it_finishes(tmp_path):
+    with RunningServer(tmp_path / 'nadia.sock', workers=2, max_queue=4, timeout=0.3) as server:
+        codes = [code for code, response in server.check([{'proof': SLOW_PROOF}] * 16)]
+        assert set(codes) <= {503, 504} and 504 in codes
+        # The workers are still checking the slow proofs
+        assert server.health()['pending'] > 0
+        deadline = time.monotonic() + 60
+        while server.health()['pending'] > 0:
+            assert time.monotonic() < deadline
+            time.sleep(0.05)
+        proof, theorem = PROOFS[0]
+        code, response = server.check([{'proof': proof, 'theorem': theorem}])[0]
+        assert code == 200 and response['message'] == expected(proof, theorem)
+
+def test_invalid_requests(tmp_path):
+    with RunningServer(tmp_path / 'nadia.sock', workers=1) as server:
+        assert server.check([{'theorem': 'A |- A'}, [1], {'proof': 'A', 'theorem': 1}]) == [
+            (400, {'error': 'O campo "proof" com a demonstração é obrigatório.'}),
+            (400, {'error': 'O campo "proof" com a demonstração é obrigatório.'}),
+            (400, {'error': 'O campo "theorem" deve ser um texto.'})]
+        assert asyncio.run(server.request('GET', '/check'))[0] == 405
+        assert asyncio.run(server.request('GET', '/other'))[0] == 404
+
+def test_worker_error_is_answered_with_500(tmp_path):
+    with RunningServer(tmp_path / 'nadia.sock', workers=1) as server:
+        code, response = server.check([{'proof': DEEP_PROOF}])[0]
+        assert code == 500 and 'erro inesperado' in response['error']
+        proof, theorem = PROOFS[1]
+        code, response = server.check([{'proof': proof, 'theorem': theorem}])[0]
+        assert code == 200 and response['message'] == expected(proof, theorem)
+
+def test_killed_worker_restarts_the_pool(tmp_path):
+    with RunningServer(tmp_path / 'nadia.sock', workers=2) as server:
+        async def kill_during_check():
+            check = asyncio.ensure_future(server.request('POST', '/check', {'proof': SLOW_PROOF}))
+            await asyncio.sleep(0.3)
+            for pid in list(server.proof_server.executor._processes):
+                os.kill(pid, signal.SIGKILL)
+            return await check
+        code, response = asyncio.run(kill_during_check())
+        assert code == 500
+        for proof, theorem in PROOFS:
+            code, response = server.check([{'proof': proof, 'theorem': theorem}])[0]
+            assert code == 200 and response['message'] == expected(proof, theorem)
@@ -0,0 +1,52 @@
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from nadia.nadia_pt_fo import check_proof
+
+THREADS = 16
+# Each check is repeated, so the threads check the same proofs at the same time
+REPEAT = 20
+FLAGS = [(True, True, True), (False, False, True)]
+
+# (proof, theorem) with boxes of hypotheses nested in many ways, so that the Gentzen proofs
+# number many hypotheses, and proofs with errors
+PROOFS = [
+    ((Path(__file__).resolve().parent.parent / 'src' / 'nadia' / 'example_nadia.txt').read_text(), 'A|B, A->C, B->C |- C'),
+    ('1. { A hip\n2. A copie 1\n}\n3. A->A ->i 1-2', '|- A->A'),
+    ('1. A pre\n2. B pre\n3. { C hip\n4. A copie 1\n5. B copie 2\n6. A&B &i 4,5\n}\n7. C->A&B ->i 3-6', 'A, B |- C->A&B'),
+    ('1. { A hip\n2. { B hip\n3. A copie 1\n}\n4. B->A ->i 2-3\n}\n5. A->(B->A) ->i 1-4', '|- A->(B->A)'),
+    ('1. A->B pre\n2. ~B pre\n3. { A hip\n4. B ->e 3,1\n5. @ ~e 4,2\n}\n6. ~A ~i 3-5', 'A->B, ~B |- ~A'),
+    ('1. ~~A pre\n2. { ~A hip\n3. @ ~e 2,1\n}\n4. A raa 2-3', '~~A |- A'),
+    ('1. { ~(A|~A) hip\n2. { A hip\n3. A|~A |i 2\n4. @ ~e 3,1\n}\n5. ~A ~i 2-4\n6. A|~A |i 5\n7. @ ~e 6,1\n}\n8. A|~A raa 1-7', '|- A|~A'),
+    ('1. { A->(B->C) hip\n2. { A->B hip\n3. { A hip\n4. B->C ->e 3,1\n5. B ->e 3,2\n6. C ->e 5,4\n}\n7. A->C ->i 3-6\n}\n'
+     '8. (A->B)->(A->C) ->i 2-7\n}\n9. (A->(B->C))->((A->B)->(A->C)) ->i 1-8', '|- (A->(B->C))->((A->B)->(A->C))'),
+    ('1. { (A->B)->A hip\n2. { ~A hip\n3. { A hip\n4. @ ~e 3,2\n5. B @e 4\n}\n6. A->B ->i 3-5\n7. A ->e 6,1\n8. @ ~e 7,2\n}\n'
+     '9. A raa 2-8\n}\n10. ((A->B)->A)->A ->i 1-9', '|- ((A->B)->A)->A'),
+    ('1. Ax (P(x)&Q(x)) pre\n2. { a\n3. P(a)&Q(a) Ae 1\n4. P(a) &e 3\n}\n5. Ax P(x) Ai 2-4', 'Ax (P(x)&Q(x)) |- Ax P(x)'),
+    ('1. Ex P(x) pre\n2. Ax (P(x)->Q(x)) pre\n3. { a P(a) hip\n4. P(a)->Q(a) Ae 2\n5. Q(a) ->e 3,4\n6. Ex Q(x) Ei 5\n}\n'
+     '7. Ex Q(x) Ee 1,3-6', 'Ex P(x), Ax (P(x)->Q(x)) |- Ex Q(x)'),
+    # Errors in the references, the rules and the boxes
+    ('1. { A hip\n2. { B hip\n3. A copie 2\n}\n4. B->A ->i 2-3\n}\n5. A->(B->A) ->i 1-4', '|- A->(B->A)'),
+    ('1. A->B pre\n2. ~B pre\n3. { A hip\n4. B ->e 3,2\n5. @ ~e 4,1\n}\n6. ~A ~i 3-4', 'A->B, ~B |- ~A'),
+    ('1. A pre\n2. B pre\n3. A&C &i 1,2', 'A, B |- A&C'),
+    ('1. { A hip\n2. { B hip\n3. A copie 1\n4. B->A ->i 2-3\n}\n5. A->(B->A) ->i 1-4', '|- A->(B->A)'),
+]
+
+def test_threads_match_sequential():
+    checks = []
+    for i, (proof, theorem) in enumerate(PROOFS):
+        # The theorem of the proof, the theorem of another proof and no theorem
+        for input_theorem in (theorem, PROOFS[(i + 1) % len(PROOFS)][1], None):
+            for flags in FLAGS:
+                checks.append((proof, input_theorem) + flags)
+    checks *= REPEAT
+    interval = sys.getswitchinterval()
+    sequential = [check_proof(*check) for check in checks]
+    # Switches threads as often as possible to expose state shared between the checks
+    sys.setswitchinterval(1e-6)
+    try:
+        with ThreadPoolExecutor(THREADS) as executor:
+            threaded = list(executor.map(lambda check: check_proof(*check), checks))
+    finally:
+        sys.setswitchinterval(interval)
+    assert [i for i, (a, b) in enumerate(zip(sequential, threaded)) if a != b] == []